@@ -0,0 +1,135 @@
+import time
+import asyncio
+import threading
+import concurrent.futures
+
+from HandPipeline import HandPipeline
+
+
+# asyncio front end for the hand tracker, used through HandTrackingDynamic.stream:
+#
+#   async for result in detector.stream(0):
+#       result["timestamp"], result["frameIndex"], result["frame"], result["hands"], result["predicted"]
+#
+# Capture and the model run on a HandPipeline's threads (see HandPipeline.py) and the event loop only ever awaits the finished results,
+# so it never blocks on a camera read or a model call. Frames get dropped instead of queued whenever something can't keep up:
+# the model only sees the newest frame, and each subscriber keeps at most queueSize results, dropping the oldest.
+# Any number of subscribers can iterate over the same stream at once and they share one capture and one model. Streams from different
+# sources each have a tracker of their own.
+
+
+class _Subscriber:
+
+    def __init__(self, queueSize):
+        self.queue = asyncio.Queue(queueSize)
+        self.dropped = 0
+
+    def offer(self, item):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+
+class HandStream:
+
+    def __init__(self, tracker, source, includeFrame=True, registry=None):
+        # tracker: used by this stream only, from the pipeline's inference thread.
+        # source: anything HandPipeline accepts (camera index, video file, opened VideoCapture).
+        # includeFrame: False leaves the (flipped) frame out of the results, when only the numbers are needed.
+        # registry: dict of running streams by source that this stream removes itself from when it closes.
+        self.tracker = tracker
+        self.registry = registry
+        self.source = source
+        self.includeFrame = includeFrame
+        self.frameIndex = 0
+        self.closed = False
+        self.error = None
+
+        self._subscribers = []
+        self._task = None
+        self._pipeline = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="HandStream-read")
+            # Its own thread for waiting on the pipeline, so the loop's default executor stays free for everything else.
+
+    def _process(self, frame):
+        # Runs on the pipeline's inference thread.
+        timestamp = time.time()
+        tracker = self.tracker
+        frame, results = tracker.detectHands(frame)
+        tracker.loadResults(results)
+        hands = tracker.analyze(frame)
+        predicted = tracker.predicted
+        self.frameIndex += 1
+        return {"timestamp": timestamp, "frameIndex": self.frameIndex - 1, "frame": frame if self.includeFrame else None,
+                "hands": hands, "predicted": predicted}
+
+    async def subscribe(self, queueSize=2):
+        # Async iterator over the results. The capture starts with the first subscriber and stops when the last one leaves.
+        if self.closed:
+            raise RuntimeError("Stream is closed")
+        subscriber = _Subscriber(queueSize)
+        self._subscribers.append(subscriber)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        try:
+            while True:
+                item = await subscriber.queue.get()
+                if item is None:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                yield item
+        finally:
+            self._subscribers.remove(subscriber)
+            if not self._subscribers:
+                self.close()
+
+    def _openPipeline(self):
+        # Runs on the executor thread, like the reads: opening the source (seconds for some cameras and network streams) and the first
+        # import of cv2 would otherwise stall every other coroutine on the loop.
+        pipeline = HandPipeline(self.source, self._process)
+        self._pipeline = pipeline
+        if self.closed:
+            pipeline.stop()
+                # Closed while the source was opening, close() may have missed the pipeline.
+        else:
+            pipeline.start()
+        return pipeline
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._openPipeline)
+            while not self.closed:
+                item = await loop.run_in_executor(self._executor, self._pipeline.read)
+                if item is None:
+                    break
+                for subscriber in self._subscribers:
+                    subscriber.offer(item)
+        except Exception as error:
+            self.error = error
+        finally:
+            for subscriber in self._subscribers:
+                subscriber.offer(None)
+                    # End of stream for everyone still listening.
+            self.close()
+
+    def close(self):
+        # Stops the capture. Doesn't wait for the threads, so it's safe to call from the event loop.
+        if self.closed:
+            return
+        self.closed = True
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        if self._pipeline is not None:
+            threading.Thread(target=self._pipeline.stop, name="HandStream-stop", daemon=True).start()
+        self._executor.shutdown(wait=False)
+        if self.registry is not None and self.registry.get(self.source) is self:
+            del self.registry[self.source]
+
+    def stats(self):
+        stats = self._pipeline.stats() if self._pipeline is not None else {}
+        stats["subscribers"] = [{"queueDepth": subscriber.queue.qsize(), "dropped": subscriber.dropped} for subscriber in self._subscribers]
+        return stats
@@ -0,0 +1,174 @@
+import time
+import collections
+
+
+# Keeps the tracker at a target frame rate by turning its cost knobs at runtime instead of them being hand-tuned for every machine.
+#
+# The tuner times every detectHands call. Once a window of frames has gone by, it compares their mean latency with the budget
+# (1 / targetFps, or latencyBudget if that's given): over budget it steps one operating point down, comfortably under it (below headroom
+# times the budget) it tries one step back up. Operating points come from a ladder, built once from the bounds, going from the best
+# quality to the cheapest by degrading one knob per step, in this order:
+#   input size     the longer side the full frame gets downscaled to before the model (maxInputSize of the tracker)
+#   model          mediapipe's model complexity, 1 then 0
+#   maxHands       down to minHands
+#   stride         the model only runs every stride-th frame, the others reuse its results (inferenceStride of the tracker)
+#   capture size   the camera resolution, only if a capture and captureSizes were given
+# Going back up waits longer than going down, and that wait doubles every time a step up had to be taken back, so the tuner doesn't
+# keep bouncing between two points where one is just too slow.
+#
+#   tuner = AutoTuner(detector, targetFps=30, minInputSize=320, maxStride=3)
+#   pipeline = HandPipeline(cap, tuner.detectHands)
+#   ...
+#   print(tuner.operatingPoint, tuner.history[-1:])
+
+INPUT_SIZES = (None, 1280, 960, 640, 480, 320, 256)
+    # Longer side of the model's input, None = the frame as it comes.
+
+
+class AutoTuner:
+
+    def __init__(self, tracker, targetFps=30, latencyBudget=None, headroom=0.7, window=30,
+                 inputSizes=INPUT_SIZES, minInputSize=320, modelComplexities=(1, 0), minHands=1, maxStride=3,
+                 capture=None, captureSizes=None, verbose=True):
+        # tracker: the HandTrackingDynamic to tune. Its current maxHands is the most the tuner will use.
+        # latencyBudget: seconds per frame to stay under, instead of 1 / targetFps.
+        # headroom: a step up is only tried while the mean latency is below headroom times the budget.
+        # window: frames averaged before each decision. A change also clears the window, so every point gets measured on its own.
+        # inputSizes/minInputSize: the input sizes to go through, the ones smaller than minInputSize are left out.
+        # modelComplexities: from best to cheapest, (1,) keeps the full model.
+        # minHands/maxStride: the lower bound for maxHands and upper bound for the stride, minHands equal to the tracker's maxHands and
+        #          maxStride=1 keep them fixed.
+        # capture/captureSizes: a HandPipeline or cv2.VideoCapture and the (width, height) resolutions to go through, best first.
+        #          With a HandPipeline the change gets made by its capture thread, see HandPipeline.setCaptureSize.
+        # verbose: print every adjustment (they're always in history).
+        self.tracker = tracker
+        self.budget = latencyBudget if latencyBudget is not None else 1.0 / targetFps
+        self.headroom = headroom
+        self.window = window
+        self.capture = capture
+        self.verbose = verbose
+        self._captureSize = None
+
+        self.ladder = buildLadder([size for size in inputSizes if size is None or size >= minInputSize], modelComplexities,
+                                  tracker.maxHands, minHands, maxStride, captureSizes)
+        self.level = 0
+        self._latencies = collections.deque(maxlen=window)
+        self._upWait = window * 3
+            # Frames spent at a point before a step up gets considered.
+        self._framesAtLevel = 0
+        self._raisedFrom = None
+            # The level the last step up came from, to spot a step up that didn't hold.
+        self._rebuilt = False
+
+        self.frames = 0
+        self.history = []
+            # Every adjustment: {"time", "frame", "from", "to", "latencyMs", "budgetMs", "point"}.
+        self._apply(self.ladder[0])
+
+    @property
+    def operatingPoint(self):
+        # The settings in use right now, as a dict (inputSize, modelComplexity, maxHands, stride, captureSize).
+        return dict(self.ladder[self.level])
+
+    def detectHands(self, frame):
+        # Drop-in for the tracker's detectHands (e.g. as HandPipeline's process function), timed and fed to the controller.
+        start = time.perf_counter()
+        result = self.tracker.detectHands(frame)
+        self.observe(time.perf_counter() - start)
+        return result
+
+    def observe(self, seconds):
+        # Records one frame's latency and adjusts the operating point if it's time to. Returns True when it changed.
+        # For callers that run the tracker themselves instead of going through detectHands above.
+        self.frames += 1
+        self._framesAtLevel += 1
+        if self._rebuilt:
+            self._rebuilt = False
+            return False
+                # The first frame after a model rebuild pays for building it, that's not what the new point costs per frame.
+        self._latencies.append(seconds)
+        if len(self._latencies) < self.window:
+            return False
+
+        latency = sum(self._latencies) / len(self._latencies)
+        if latency > self.budget and self.level < len(self.ladder) - 1:
+            if self._raisedFrom == self.level + 1:
+                self._upWait *= 2
+                    # Just came up from there and it's too slow after all, wait longer before the next try.
+            self._raisedFrom = None
+            self._change(self.level + 1, latency)
+            return True
+        if latency < self.budget * self.headroom and self.level > 0 and self._framesAtLevel >= self._upWait:
+            self._raisedFrom = self.level
+            self._change(self.level - 1, latency)
+            return True
+        if self._raisedFrom is not None and self._framesAtLevel >= self._upWait:
+            self._raisedFrom = None
+            self._upWait = self.window * 3
+                # The step up held, back to the normal wait.
+        return False
+
+    def _change(self, level, latency):
+        previous = self.level
+        self.level = level
+        self._apply(self.ladder[level])
+        self._latencies.clear()
+        self._framesAtLevel = 0
+
+        entry = {"time": time.time(), "frame": self.frames, "from": previous, "to": level,
+                 "latencyMs": latency * 1000, "budgetMs": self.budget * 1000, "point": dict(self.ladder[level])}
+        self.history.append(entry)
+        if self.verbose:
+            print("AutoTuner: {} at {:.1f} ms per frame (budget {:.1f} ms), level {} -> {}: {}".format(
+                "down" if level > previous else "up", entry["latencyMs"], entry["budgetMs"], previous, level, describePoint(entry["point"])))
+
+    def _apply(self, point):
+        tracker = self.tracker
+        if point["maxHands"] != tracker.maxHands or point["modelComplexity"] != tracker.modelComplexity:
+            tracker.reconfigure(maxHands=point["maxHands"], modelComplexity=point["modelComplexity"])
+            self._rebuilt = True
+                # Rebuilds the model, the only change that isn't free.
+        tracker.maxInputSize = point["inputSize"]
+        tracker.inferenceStride = point["stride"]
+        if self.capture is not None and point["captureSize"] is not None and point["captureSize"] != self._captureSize:
+            setCaptureSize(self.capture, *point["captureSize"])
+            self._captureSize = point["captureSize"]
+
+    def stats(self):
+        return {"level": self.level, "levels": len(self.ladder), "point": self.operatingPoint, "frames": self.frames,
+                "adjustments": len(self.history), "budgetMs": self.budget * 1000,
+                "latencyMs": sum(self._latencies) / len(self._latencies) * 1000 if self._latencies else None}
+
+
+def buildLadder(inputSizes, modelComplexities, maxHands, minHands, maxStride, captureSizes=None):
+    # Operating points from the best to the cheapest, each one a single knob cheaper than the one before.
+    point = {"inputSize": inputSizes[0], "modelComplexity": modelComplexities[0], "maxHands": maxHands, "stride": 1,
+             "captureSize": captureSizes[0] if captureSizes else None}
+    ladder = [dict(point)]
+
+    def step(knob, values):
+        for value in values:
+            point[knob] = value
+            ladder.append(dict(point))
+
+    step("inputSize", inputSizes[1:])
+    step("modelComplexity", modelComplexities[1:])
+    step("maxHands", range(maxHands - 1, max(1, minHands) - 1, -1))
+    step("stride", range(2, maxStride + 1))
+    step("captureSize", captureSizes[1:] if captureSizes else ())
+    return ladder
+
+
+def setCaptureSize(capture, width, height):
+    if hasattr(capture, "setCaptureSize"):
+        capture.setCaptureSize(width, height)
+    else:
+        capture.set(3, width)
+        capture.set(4, height)
+            # cv2.CAP_PROP_FRAME_WIDTH and cv2.CAP_PROP_FRAME_HEIGHT, without importing cv2 for them.
+
+
+def describePoint(point):
+    return "input {}, model {}, maxHands {}, stride {}{}".format(
+        "full" if point["inputSize"] is None else point["inputSize"], point["modelComplexity"], point["maxHands"], point["stride"],
+        "" if point["captureSize"] is None else ", capture {}x{}".format(*point["captureSize"]))
@@ -0,0 +1,212 @@
+import os
+import argparse
+import multiprocessing
+import numpy as np
+import cv2
+
+from HandRecog import HandTrackingDynamic
+from HandGeometry import handednessCode
+
+
+# Offline mode: runs the hand tracker over recorded videos instead of a live camera, as fast as the machine allows.
+# Every video gets split into chunks of frames and the chunks are spread over a multiprocessing pool, with one HandTrackingDynamic
+# (so one mediapipe model) per worker process. The results come back in frame order and get saved as one .npz file per video.
+#
+# From the command line:
+#   python HandBatch.py session1.mp4 session2.mp4 --output results --workers 8
+#
+# Each .npz holds, for every frame (first axis) and every hand slot up to maxHands (second axis):
+#   frameIndex, handCount, handedness (0 = Left, 1 = Right, -1 = no hand), normalized (21x3 landmarks, NaN when no hand),
+#   rotation, forwardTilt, sidewaysTilt, fingers (5 per hand), handState (index into HAND_MESSAGES, -1 = no hand)
+# plus fps and the frame size of the video.
+
+_detector = None
+    # The worker process' own tracker, created once by _initWorker.
+
+
+def _initWorker(trackerOptions):
+    global _detector
+    _detector = HandTrackingDynamic(**trackerOptions)
+
+
+def planChunks(paths, chunkSize=300):
+    # Splits every video into (path, startFrame, endFrame) ranges. endFrame is None when the video doesn't report its length,
+    # in which case the whole video becomes one chunk.
+
+    chunks = []
+    for path in paths:
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise IOError("Cannot open video " + str(path))
+        frameCount = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        capture.release()
+
+        if frameCount <= 0:
+            chunks.append((path, 0, None))
+            continue
+        for start in range(0, frameCount, chunkSize):
+            chunks.append((path, start, min(start + chunkSize, frameCount)))
+
+    return chunks
+
+
+def _openAt(path, startFrame):
+    capture = cv2.VideoCapture(path)
+    if startFrame > 0:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, startFrame)
+        if int(capture.get(cv2.CAP_PROP_POS_FRAMES)) != startFrame:
+            # Some codecs can't seek exactly, so fall back to skipping frames from the start.
+            capture.release()
+            capture = cv2.VideoCapture(path)
+            for _ in range(startFrame):
+                capture.grab()
+    return capture
+
+
+def processChunk(chunk):
+    # Runs on a worker: detection + multi-hand analysis on every frame of one chunk. Returns (path, startFrame, per-frame arrays).
+
+    path, startFrame, endFrame = chunk
+    maxHands = _detector.__maxHands__
+
+    if hasattr(_detector.hands, "reset"):
+        _detector.hands.reset()
+            # Chunks from different parts of a video (or different videos) come one after another on the same worker,
+            # so don't let the model keep tracking a hand from the previous chunk.
+
+    capture = _openAt(path, startFrame)
+    columns = {"frameIndex": [], "handCount": [], "handedness": [], "normalized": [], "rotation": [],
+               "forwardTilt": [], "sidewaysTilt": [], "fingers": [], "handState": []}
+
+    frameIndex = startFrame
+    while endFrame is None or frameIndex < endFrame:
+        ret, frame = capture.read()
+        if not ret:
+            break
+
+        frame = _detector.processAndCorrectView(frame)
+        features = _detector.findAllHands(frame)
+        handCount = min(len(features["handedness"]), maxHands)
+
+        handedness = np.full(maxHands, -1, dtype=np.int8)
+        normalized = np.full((maxHands, 21, 3), np.nan, dtype=np.float32)
+        rotation, forwardTilt, sidewaysTilt = np.full((3, maxHands), np.nan, dtype=np.float32)
+        fingers = np.zeros((maxHands, 5), dtype=np.int8)
+        handState = np.full(maxHands, -1, dtype=np.int8)
+            # Fixed size slots per frame so every frame stacks into the same array shape, unused slots stay empty.
+
+        handedness[:handCount] = [handednessCode(label) for label in features["handedness"][:handCount]]
+        normalized[:handCount] = features["normalized"][:handCount]
+        rotation[:handCount] = features["rotation"][:handCount]
+        forwardTilt[:handCount] = features["forwardTilt"][:handCount]
+        sidewaysTilt[:handCount] = features["sidewaysTilt"][:handCount]
+        fingers[:handCount] = features["fingers"][:handCount]
+        handState[:handCount] = features["handState"][:handCount]
+
+        for name, value in (("frameIndex", frameIndex), ("handCount", handCount), ("handedness", handedness),
+                            ("normalized", normalized), ("rotation", rotation), ("forwardTilt", forwardTilt),
+                            ("sidewaysTilt", sidewaysTilt), ("fingers", fingers), ("handState", handState)):
+            columns[name].append(value)
+        frameIndex += 1
+
+    capture.release()
+
+    return path, startFrame, {name: np.asarray(values) for name, values in columns.items()}
+
+
+def _emptyColumns(maxHands):
+    return {"frameIndex": np.zeros(0, dtype=np.int64), "handCount": np.zeros(0, dtype=np.int64),
+            "handedness": np.zeros((0, maxHands), dtype=np.int8), "normalized": np.zeros((0, maxHands, 21, 3), dtype=np.float32),
+            "rotation": np.zeros((0, maxHands), dtype=np.float32), "forwardTilt": np.zeros((0, maxHands), dtype=np.float32),
+            "sidewaysTilt": np.zeros((0, maxHands), dtype=np.float32), "fingers": np.zeros((0, maxHands, 5), dtype=np.int8),
+            "handState": np.zeros((0, maxHands), dtype=np.int8)}
+
+
+def _videoKey(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _outputPaths(paths, outputDir):
+    # The .npz file for every video: <name>_hands.npz in outputDir (or next to the video). Videos whose names would collide, e.g. two
+    # take1.mp4 from different folders going to the same outputDir, get _2, _3... added instead of overwriting each other.
+    outputs = []
+    taken = set()
+    for path in paths:
+        folder = outputDir if outputDir is not None else os.path.dirname(os.path.abspath(path))
+        stem = os.path.splitext(os.path.basename(path))[0]
+        outputPath = os.path.join(folder, stem + "_hands.npz")
+        count = 1
+        while _videoKey(outputPath) in taken:
+            count += 1
+            outputPath = os.path.join(folder, stem + "_" + str(count) + "_hands.npz")
+        taken.add(_videoKey(outputPath))
+        outputs.append(outputPath)
+    return outputs
+
+
+def _saveVideo(path, parts, outputPath, maxHands):
+    parts = [part for part in parts if len(part["frameIndex"])]
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]} if parts else _emptyColumns(maxHands)
+
+    capture = cv2.VideoCapture(path)
+    columns["fps"] = np.float64(capture.get(cv2.CAP_PROP_FPS))
+    columns["frameSize"] = np.array([capture.get(cv2.CAP_PROP_FRAME_WIDTH), capture.get(cv2.CAP_PROP_FRAME_HEIGHT)], dtype=np.int64)
+    capture.release()
+
+    np.savez(outputPath, **columns)
+
+    return outputPath
+
+
+def processVideos(paths, outputDir=None, workers=None, chunkSize=300, maxHands=2, detectionCon=0.5, trackCon=0.5):
+    # Processes every video in paths on a pool of `workers` processes (defaults to one per CPU core).
+    # Returns the list of .npz files written, in the same order as paths. outputDir defaults to the folder of each video.
+    # A video given more than once is only processed once, its output path is repeated in the list.
+
+    if outputDir is not None:
+        os.makedirs(outputDir, exist_ok=True)
+
+    videos = {}
+    for path in paths:
+        videos.setdefault(_videoKey(path), path)
+            # Every video once, at its first appearance, even under another spelling ("a.mp4", "./a.mp4").
+    videos = list(videos.values())
+    outputPaths = {_videoKey(path): outputPath for path, outputPath in zip(videos, _outputPaths(videos, outputDir))}
+
+    chunks = planChunks(videos, chunkSize)
+    remaining = {path: 0 for path in videos}
+    for path, _, _ in chunks:
+        remaining[path] += 1
+    parts = {path: [] for path in videos}
+
+    trackerOptions = {"maxHands": maxHands, "detectionCon": detectionCon, "trackCon": trackCon}
+    with multiprocessing.Pool(workers, initializer=_initWorker, initargs=(trackerOptions,)) as pool:
+        for path, _, columns in pool.imap(processChunk, chunks):
+            # imap hands the chunks back in the order they were submitted, so each video's frames stay in order
+            # and a video can be written out as soon as its last chunk is done.
+            parts[path].append(columns)
+            remaining[path] -= 1
+            if remaining[path] == 0:
+                _saveVideo(path, parts.pop(path), outputPaths[_videoKey(path)], maxHands)
+
+    return [outputPaths[_videoKey(path)] for path in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run hand tracking over recorded videos on a process pool.")
+    parser.add_argument("videos", nargs="+", help="video files to process")
+    parser.add_argument("--output", default=None, help="folder for the .npz results (default: next to each video)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU core)")
+    parser.add_argument("--chunk-size", type=int, default=300, help="frames per chunk")
+    parser.add_argument("--max-hands", type=int, default=2)
+    parser.add_argument("--detection-con", type=float, default=0.5)
+    parser.add_argument("--track-con", type=float, default=0.5)
+    args = parser.parse_args()
+
+    for outputPath in processVideos(args.videos, args.output, args.workers, args.chunk_size,
+                                    args.max_hands, args.detection_con, args.track_con):
+        print(outputPath)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import time
+import json
+import argparse
+import tracemalloc
+import collections
+import contextlib
+import numpy as np
+import cv2
+
+from HandRecog import HandTrackingDynamic
+from HandRecording import LandmarkReplay
+
+
+# Benchmark for every stage of the hand tracking loop, without needing a webcam.
+# Each stage (landmark conversion, each analysis method, each drawing step) is timed on its own and reported as percentiles, plus how much
+# memory each stage allocates per frame. Frames go through the tracker's own detectHands, exactly as the main loop runs it, with its
+# instrumentation hooks (see HandMetrics.py) recording the stages inside it as "detectHands: flip", "detectHands: model" and so on.
+# The tracker options (--roi, --skip-frames, --motion-gate, --max-input-size...) are the constructor's, so whatever path a configuration
+# takes through detectHands is what gets measured. Frames can come from:
+#   --synthetic N        N generated frames, with a generated hand loaded into the tracker so the analysis stages have something to do
+#   --video FILE         a recorded video (analysis only runs on frames where the model finds a hand)
+#   --landmarks FILE     a landmark recording from HandRecording.py (analysis and drawing only, no model)
+#
+#   python HandBenchmark.py --synthetic 300 --width 1920 --height 1080 --json results.json
+#   python HandBenchmark.py --video session.mp4 --roi --roi-max-size 480 --skip-frames 2 --in-place
+
+PERCENTILES = (50, 90, 99)
+
+
+class StageTimer:
+    # Collects per-stage timings. With traceAllocations on, it records how many bytes each stage allocates instead
+    # (the peak traced by tracemalloc while the stage runs), since tracing slows everything down too much to time at the same time.
+
+    def __init__(self, traceAllocations=False):
+        self.traceAllocations = traceAllocations
+        self.samples = collections.OrderedDict()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.traceAllocations:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            yield
+            _, peak = tracemalloc.get_traced_memory()
+            self.samples.setdefault(name, []).append(max(peak - before, 0))
+        else:
+            samples = self.samples.setdefault(name, [])
+                # Added before the stage runs, so it's listed ahead of the stages recorded inside it.
+            start = time.perf_counter()
+            yield
+            samples.append(time.perf_counter() - start)
+
+
+class TrackerStages:
+    # Stands in for HandMetrics as the tracker's metrics while detectHands runs, so its instrumentation hooks (flip, motionGate, cvtColor,
+    # model, model.roi, predict) record straight into the StageTimer, one sample per frame the stage actually ran.
+
+    def __init__(self, timer, prefix="detectHands: "):
+        self.timer = timer
+        self.prefix = prefix
+
+    def __bool__(self):
+        return True
+
+    def observe(self, stage, start):
+        now = time.perf_counter()
+        self.recordLatency(stage, now - start)
+        return now
+
+    def recordLatency(self, stage, seconds):
+        if not self.timer.traceAllocations:
+            self.timer.samples.setdefault(self.prefix + stage, []).append(seconds)
+                # Allocations are only measured for detectHands as a whole.
+
+    def recordDetection(self, handCount):
+        pass
+
+
+def syntheticHand(rng):
+    # A rough open hand in mediapipe's normalized coordinates: wrist, then four joints along each finger fanning out upwards,
+    # moved around and jittered a little each frame.
+    center = rng.uniform(0.3, 0.7, size=2)
+    scale = rng.uniform(0.15, 0.3)
+    points = [(0.0, 0.0)]
+    for finger, angle in enumerate(np.linspace(-1.1, 0.6, 5)):
+        for joint in range(1, 5):
+            length = joint * (0.22 if finger else 0.18)
+            points.append((np.sin(angle) * length, -np.cos(angle) * length))
+    hand = np.zeros((21, 3))
+    hand[:, :2] = center + np.array(points) * scale + rng.normal(0, 0.004, size=(21, 2))
+    hand[:, 2] = rng.normal(-0.02, 0.01, size=21)
+    return hand[None]
+
+
+def benchmarkFrame(tracker, timer, frame=None, hand=None, frameShape=(1080, 1920)):
+    # Runs one frame through every stage. frame goes through the tracker's detectHands, hand (a (H, 21, 3) landmark array) gets loaded
+    # straight into the tracker afterwards (or instead, when there's no frame).
+
+    if frame is not None:
+        tracker.enableMetrics(TrackerStages(timer))
+        with timer.stage("detectHands"):
+            canvas, results = tracker.detectHands(frame)
+        tracker.disableMetrics()
+        tracker.loadResults(results)
+    else:
+        canvas = np.zeros(frameShape + (3,), dtype=np.uint8)
+
+    if hand is not None:
+        tracker.loadLandmarks(hand)
+
+    with timer.stage("findAndMark_Positions"):
+        lmsArray, _ = tracker.findAndMark_Positions(canvas, draw=False)
+    if len(lmsArray) == 0:
+        return
+            # No hand this frame, nothing else to measure.
+
+    with timer.stage("findOrientation"):
+        tracker.findOrientation()
+    with timer.stage("palmLength"):
+        tracker.context.palmLength
+    with timer.stage("findRotation"):
+        tracker.findRotation()
+    with timer.stage("findTilt"):
+        tracker.findTilt()
+    with timer.stage("findAndMarkCenterOfMass"):
+        tracker.findAndMarkCenterOfMass()
+    with timer.stage("findFingersOpen"):
+        fingers, handMsg, _ = tracker.findFingersOpen()
+            # Timed in dependency order, so each one only pays for its own work (what it needs from the others is already cached).
+
+    with timer.stage("analyze (all hands)"):
+        hands = tracker.analyze(canvas)
+
+    if tracker.results is not None:
+        with timer.stage("draw: drawHandLandmarks"):
+            tracker.drawHandLandmarks(canvas)
+                # Needs mediapipe's own results, which a loaded landmark array (--synthetic, --landmarks) doesn't have.
+    with timer.stage("draw: markOrientation"):
+        tracker.markOrientation(canvas)
+    with timer.stage("draw: findRotation"):
+        tracker.findRotation(canvas)
+    with timer.stage("draw: findTilt"):
+        tracker.findTilt(canvas)
+    with timer.stage("draw: findAndMarkCenterOfMass"):
+        tracker.findAndMarkCenterOfMass(canvas)
+    with timer.stage("draw: text"):
+        for row in range(7):
+            cv2.putText(canvas, "Fingers Open: " + str(fingers) + "  Hand is " + handMsg, (5, 30 + 30 * row), cv2.FONT_HERSHEY_PLAIN, 1.2, (0, 255, 0), 2)
+    with timer.stage("draw: annotate"):
+        tracker.annotate(canvas, hands)
+    with timer.stage("draw: findAndMark_Positions"):
+        tracker.findAndMark_Positions(canvas, draw=True)
+
+
+def iterateSource(args):
+    # Yields (frame, hand) pairs for the chosen source, see the top of the file.
+    frameShape = (args.height, args.width)
+
+    if args.video:
+        capture = cv2.VideoCapture(args.video)
+        count = 0
+        while args.frames is None or count < args.frames:
+            ret, frame = capture.read()
+            if not ret:
+                break
+            count += 1
+            yield frame, None
+        capture.release()
+
+    elif args.landmarks:
+        replay = LandmarkReplay(args.landmarks)
+        stop = len(replay) if args.frames is None else min(args.frames, len(replay))
+        for index in range(stop):
+            normalized, _, _ = replay.frame(index)
+            yield None, normalized
+
+    else:
+        rng = np.random.default_rng(args.seed)
+        frame = rng.integers(0, 256, size=frameShape + (3,), dtype=np.uint8)
+            # One noise frame reused every time, generating a new 1080p frame would cost more than some of the stages being measured.
+        for _ in range(args.synthetic if args.frames is None else args.frames):
+            yield frame.copy(), syntheticHand(rng)
+                # A copy, since detectHands (with --in-place) and the drawing stages write into the frame.
+
+
+def trackerOptions(args):
+    return {"roi": args.roi, "roiMaxSize": args.roi_max_size, "skipFrames": args.skip_frames, "motionGate": args.motion_gate,
+            "maxInputSize": args.max_input_size, "inferenceStride": args.inference_stride, "modelComplexity": args.model_complexity,
+            "inPlace": args.in_place}
+
+
+def runBenchmark(args):
+    tracker = HandTrackingDynamic(landmarkArray=True, **trackerOptions(args))
+    frameShape = (args.height, args.width)
+
+    for count, (frame, hand) in enumerate(iterateSource(args)):
+        if count >= args.warmup:
+            break
+        benchmarkFrame(tracker, StageTimer(), frame, hand, frameShape)
+            # The first model calls are much slower than the rest, keep them out of the numbers.
+
+    timings = StageTimer()
+    for frame, hand in iterateSource(args):
+        benchmarkFrame(tracker, timings, frame, hand, frameShape)
+
+    allocations = StageTimer(traceAllocations=True)
+    tracemalloc.start()
+    for count, (frame, hand) in enumerate(iterateSource(args)):
+        if count >= args.allocation_frames:
+            break
+        benchmarkFrame(tracker, allocations, frame, hand, frameShape)
+    tracemalloc.stop()
+
+    report = collections.OrderedDict()
+    for name in sorted(timings.samples, key=lambda name: not name.startswith("detectHands")):
+            # detectHands' own stages listed together right after it, even the ones that first ran a few frames in.
+        samples = timings.samples[name]
+        milliseconds = np.array(samples) * 1000
+        stats = {"frames": len(samples), "meanMs": float(milliseconds.mean()), "maxMs": float(milliseconds.max())}
+        for percentile in PERCENTILES:
+            stats["p" + str(percentile) + "Ms"] = float(np.percentile(milliseconds, percentile))
+        allocated = allocations.samples.get(name)
+        stats["allocatedKBPerFrame"] = float(np.mean(allocated)) / 1024 if allocated else None
+        report[name] = stats
+
+    return report
+
+
+def printReport(report):
+    header = "{:<34}{:>8}{:>10}{:>10}{:>10}{:>10}{:>10}{:>12}".format("stage", "frames", "mean ms", "p50 ms", "p90 ms", "p99 ms", "max ms", "alloc KB")
+    print(header)
+    print("-" * len(header))
+    for name, stats in report.items():
+        allocated = "-" if stats["allocatedKBPerFrame"] is None else "{:.1f}".format(stats["allocatedKBPerFrame"])
+        print("{:<34}{:>8}{:>10.3f}{:>10.3f}{:>10.3f}{:>10.3f}{:>10.3f}{:>12}".format(
+            name, stats["frames"], stats["meanMs"], stats["p50Ms"], stats["p90Ms"], stats["p99Ms"], stats["maxMs"], allocated))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage benchmark of the hand tracking loop.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--synthetic", type=int, default=300, help="number of generated frames (default source)")
+    source.add_argument("--video", help="recorded video to run through the tracker")
+    source.add_argument("--landmarks", help="landmark recording (HandRecording.py) to run through the analysis")
+    parser.add_argument("--frames", type=int, default=None, help="limit the number of frames used from the source")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--warmup", type=int, default=10, help="frames run before measuring")
+    parser.add_argument("--allocation-frames", type=int, default=50, help="frames used for the allocation pass")
+    parser.add_argument("--seed", type=int, default=0)
+    tracker = parser.add_argument_group("tracker options (see HandTrackingDynamic)")
+    tracker.add_argument("--roi", action="store_true", help="only run the model on the crop around the last hands")
+    tracker.add_argument("--roi-max-size", type=int, default=None)
+    tracker.add_argument("--skip-frames", type=int, default=0, help="frames in a row that can be predicted instead of run through the model")
+    tracker.add_argument("--motion-gate", action="store_true", help="reuse the last results on frames where nothing moved")
+    tracker.add_argument("--max-input-size", type=int, default=None, help="downscale full frames to this longer side before the model")
+    tracker.add_argument("--inference-stride", type=int, default=1)
+    tracker.add_argument("--model-complexity", type=int, default=1, choices=(0, 1))
+    tracker.add_argument("--in-place", action="store_true", help="mirror the frame in place instead of making a mirrored copy")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = runBenchmark(args)
+    printReport(report)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
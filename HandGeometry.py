@@ -0,0 +1,411 @@
+import numpy as np
+
+# Pure NumPy helpers for the hand tracking math. Nothing in here touches cv2 or mediapipe, it only works on arrays of landmarks.
+# Landmark rows follow the same layout as the lmsList entries in HandRecog.py: [id, cx, cy, cz, cyDraw]
+
+LANDMARK_COUNT = 21
+    # mediapipe always returns 21 landmarks per hand.
+LANDMARK_IDS = np.arange(LANDMARK_COUNT, dtype=np.float64)
+
+ID, X, Y, Z, Y_DRAW = range(5)
+    # Column indices of a landmark row, so the array code reads a little closer to the lmsList[p][1:4] code it replaces.
+
+
+def normalizedToPixels(normalized, frameWidth, frameHeight, out=None):
+    # Converts mediapipe's 0-1 landmark coordinates of shape (..., 21, 3) into pixel rows of shape (..., 21, 5).
+    # Same math as the old per-landmark loop in findAndMark_Positions, just done for every landmark (and every hand/frame) at once.
+
+    normalized = np.asarray(normalized, dtype=np.float64)
+    if out is None:
+        out = np.empty(normalized.shape[:-1] + (5,), dtype=np.float64)
+
+    out[..., ID] = LANDMARK_IDS
+
+    np.multiply(normalized[..., 0], frameWidth, out=out[..., X])
+    np.trunc(out[..., X], out=out[..., X])
+        # int() truncates towards zero, and so does trunc, so cx matches int(lm.x * w).
+
+    np.multiply(normalized[..., 1], frameHeight, out=out[..., Y_DRAW])
+    np.trunc(out[..., Y_DRAW], out=out[..., Y_DRAW])
+        # cyDraw keeps the image orientation for drawing.
+
+    np.subtract(1, normalized[..., 1], out=out[..., Y])
+    np.multiply(out[..., Y], frameHeight, out=out[..., Y])
+    np.trunc(out[..., Y], out=out[..., Y])
+        # Flips the y axis so (0,0) is at the bottom, same as cy = int((1 - lm.y) * h).
+
+    depthRange = 2 * frameWidth
+    np.multiply(normalized[..., 2], -10, out=out[..., Z])
+    np.clip(out[..., Z], 0, 1, out=out[..., Z])
+    np.multiply(out[..., Z], depthRange, out=out[..., Z])
+    np.subtract(depthRange, out[..., Z], out=out[..., Z])
+        # Scales z to roughly 0-1, clamps it and turns it into a pixel-ish distance that grows away from the camera.
+        # See the comments in findAndMark_Positions for the reasoning behind the constants.
+
+    return out
+
+
+def landmarkRows(normalized, frameWidth, frameHeight):
+    # Single hand counterpart of normalizedToPixels: the 21 (x, y, z) landmarks of one hand (any iterable, e.g. mediapipe's hand.landmark
+    # as tuples) as a list of [id, cx, cy, cz, cyDraw] rows. For 21 points plain Python is cheaper than setting up the NumPy calls,
+    # the array version pays off once there are several hands (or frames) to convert at once. Same values as normalizedToPixels.
+
+    depthRange = 2 * frameWidth
+    rows = []
+    for id, (x, y, z) in enumerate(normalized):
+        zScaled = z * -10
+        cz = depthRange - max(min(zScaled, 1), 0) * depthRange
+        rows.append([id, int(x * frameWidth), int((1 - y) * frameHeight), cz, int(y * frameHeight)])
+
+    return rows
+
+
+def boundingBox(pixels):
+    # Bounding box (xmin, ymin, xmax, ymax) of a (21, 5) landmark array in image (drawing) coordinates.
+
+    xmin, ymin = pixels[:, [X, Y_DRAW]].min(axis=0)
+    xmax, ymax = pixels[:, [X, Y_DRAW]].max(axis=0)
+
+    return int(xmin), int(ymin), int(xmax), int(ymax)
+
+
+def regionOfInterest(normalized, frameWidth, frameHeight, margin=0.5, minSize=96):
+    # Square crop (x0, y0, x1, y1) in pixels around every hand in a (H, 21, 3) array of normalized landmarks, for running the model on
+    # just that part of the next frame. The square's side is the larger side of the hands' bounding box plus margin times that side
+    # on each end (at least minSize), clipped to the frame. Returns None when there are no hands.
+
+    normalized = np.asarray(normalized, dtype=np.float64)
+    if normalized.size == 0:
+        return None
+
+    xy = normalized[..., :2].reshape(-1, 2) * (frameWidth, frameHeight)
+    (xmin, ymin), (xmax, ymax) = xy.min(axis=0), xy.max(axis=0)
+    side = max(max(xmax - xmin, ymax - ymin) * (1 + 2 * margin), minSize)
+    centerX, centerY = (xmin + xmax) / 2, (ymin + ymax) / 2
+
+    x0 = int(min(max(centerX - side / 2, 0), frameWidth))
+    y0 = int(min(max(centerY - side / 2, 0), frameHeight))
+    x1 = int(min(max(centerX + side / 2, 0), frameWidth))
+    y1 = int(min(max(centerY + side / 2, 0), frameHeight))
+    if x1 - x0 < 2 or y1 - y0 < 2:
+        return None
+            # Hands (almost) entirely outside the frame, not worth cropping around.
+
+    return x0, y0, x1, y1
+
+
+def pixelsToList(pixels):
+    # Builds the old list-of-lists view ([id, cx, cy, cz, cyDraw] per landmark) from a landmark array.
+
+    return [[int(id), int(cx), int(cy), cz, int(cyDraw)] for id, cx, cy, cz, cyDraw in pixels.tolist()]
+
+
+def pairGeometry(points, firstIds, secondIds):
+    # Vectorized version of defineDistanceAndOrientation for a whole set of landmark pairs at once.
+    # points is a (..., M, 5) landmark array, firstIds/secondIds are equal length sequences of landmark ids (one pair per position).
+    # Returns four arrays with the pairs along the second to last axis, in the same order as defineDistanceAndOrientation's four lists:
+    #   distances (..., P, 4):       XY, XZ, ZY and 3D distance
+    #   horizontalness (..., P, 3):  cos of the XY, XZ and ZY angles
+    #   uprightness (..., P, 3):     sin of the XY, XZ and ZY angles
+    #   details (..., P, 15):        x1, y1, z1, x2, y2, z2, xMid, yMid, zMid, xDist, yDist, zDist, angleXY, angleXZ, angleZY
+
+    points = np.asarray(points, dtype=np.float64)
+    first = points[..., firstIds, X:Y_DRAW]
+    second = points[..., secondIds, X:Y_DRAW]
+    delta = second - first
+    xDist, yDist, zDist = delta[..., 0], delta[..., 1], delta[..., 2]
+
+    xSquared, ySquared, zSquared = xDist * xDist, yDist * yDist, zDist * zDist
+    distances = np.sqrt(np.stack((xSquared + ySquared, xSquared + zSquared, zSquared + ySquared,
+                                  xSquared + ySquared + zSquared), axis=-1))
+        # x and y are whole pixels, so the sum of squares is exact and sqrt gives the same correctly rounded value as math.hypot did. 
+
+    angles = np.arctan2(np.stack((yDist, zDist, yDist), axis=-1), np.stack((xDist, xDist, zDist), axis=-1))
+        # Same atan2 argument order as before: XY = atan2(y, x), XZ = atan2(z, x), ZY = atan2(y, z).
+    horizontalness = np.cos(angles)
+    uprightness = np.sin(angles)
+
+    details = np.concatenate((first, second, np.floor_divide(first + second, 2), delta, angles), axis=-1)
+
+    return distances, horizontalness, uprightness, details
+
+
+def pairDistancesXY(points, firstIds, secondIds):
+    # Only the XY distance of each pair, for callers that don't need any of the angles. Shape (..., P).
+
+    points = np.asarray(points, dtype=np.float64)
+    delta = points[..., secondIds, X:Z] - points[..., firstIds, X:Z]
+
+    return np.sqrt(delta[..., 0] * delta[..., 0] + delta[..., 1] * delta[..., 1])
+
+
+HAND_MESSAGES = ("closed", "partially open", "open")
+    # handMsg values from findFingersOpen, indexed by the handState codes returned by handFeatures.
+HAND_CLOSED, HAND_PARTIALLY_OPEN, HAND_OPEN = range(3)
+
+HANDEDNESS_LABELS = ("Left", "Right")
+    # mediapipe's handedness labels. Anything stored as a number uses the index in here (-1 for an empty hand slot).
+
+
+def handednessCode(label):
+    return HANDEDNESS_LABELS.index(label) if label in HANDEDNESS_LABELS else -1
+
+
+def fingerMask(fingers):
+    # (..., 5) array of 0/1 finger states -> (...) bitmask, thumb in bit 0.
+    return (np.asarray(fingers, dtype=np.uint8) << np.arange(5, dtype=np.uint8)).sum(axis=-1, dtype=np.uint8)
+
+
+def unpackFingers(mask):
+    # Inverse of fingerMask: (...) bitmask -> (..., 5) array of 0/1.
+    return (np.asarray(mask, dtype=np.uint8)[..., None] >> np.arange(5, dtype=np.uint8)) & 1
+
+
+TIP_IDS = [4, 8, 12, 16, 20]
+    # Same as HandTrackingDynamic.tipIds.
+
+
+def roundLikePython(values, digits):
+    # np.round scales, rounds and scales back, which can land on the other side of a tie than Python's round() does.
+    # The two only disagree when the scaled value is (almost) exactly halfway, so those few values get redone with round() itself.
+
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** digits
+    rounded = np.round(values, digits)
+
+    scaled = values * scale
+    nearTie = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6
+    if np.any(nearTie):
+        rounded[nearTie] = [round(value, digits) for value in values[nearTie].tolist()]
+
+    return rounded
+
+
+def sequentialMean(values, axis):
+    # int(sum / count) like avgDimension in findAndMarkCenterOfMass, adding the values one by one in order (np.sum adds pairwise,
+    # which can change the last bit of a float sum and so, rarely, the truncated result).
+
+    values = np.moveaxis(values, axis, 0)
+    total = np.zeros(values.shape[1:])
+    for value in values:
+        total = total + value
+
+    return np.trunc(total / len(values))
+
+
+def handFeatures(pixels, frameHeight):
+    # Everything findOrientation, findRotation, findTilt, findAndMarkCenterOfMass and findFingersOpen compute, for many hands at once.
+    # pixels is a (..., 21, 5) landmark array from normalizedToPixels (e.g. (H, 21, 5) for every hand in a frame). Every leading axis
+    # is treated as a separate hand, so the results below have the leading shape of pixels (written as ... here):
+    #   handIsUpright, thumbOnLeft (...):                     same as findOrientation
+    #   rotation, maxPalmLength (...):                        same as findRotation
+    #   forwardTilt, sidewaysTilt (...):                      same as findTilt
+    #   centerOfMassWithFingers, centerOfMassNoFingers (..., 5): same rows as findAndMarkCenterOfMass ([id, x, y, z, yDraw])
+    #   fingers (..., 5), handState (...), handIsClosed (...): same as findFingersOpen, handState indexes HAND_MESSAGES
+    # The branches of the single hand methods become np.where, and every constant is the same one used in HandRecog.py,
+    # see the comments there for what each step does.
+
+    pixels = np.asarray(pixels, dtype=np.float64)
+    features = {}
+
+    # findOrientation
+    _, horizontalness, uprightness, _ = pairGeometry(pixels, [TIP_IDS[0] - 3, 0], [0, TIP_IDS[2] - 3])
+    thumbOnLeft = horizontalness[..., 0, 0] > 0
+    handIsUpright = uprightness[..., 1, 0] > 0
+    features["handIsUpright"] = handIsUpright
+    features["thumbOnLeft"] = thumbOnLeft
+
+    # findRotation
+    pointerBaseKnuckleZ, pinkieBaseKnuckleZ = pixels[..., TIP_IDS[1] - 3, Z], pixels[..., TIP_IDS[4] - 3, Z]
+    palmLengthXY = pairDistancesXY(pixels, [TIP_IDS[1] - 3], [TIP_IDS[4] - 3])[..., 0]
+    bufferAndScalingFactor = 0.05
+    maxPalmLength = np.maximum(palmLengthXY, 110)
+    unbufferedRotation = 1 - (palmLengthXY / maxPalmLength)
+    unsignedRotation = np.where(unbufferedRotation > bufferAndScalingFactor,
+                                (unbufferedRotation - bufferAndScalingFactor) / (1 - bufferAndScalingFactor), 0)
+    rotatesLeft = ((pointerBaseKnuckleZ > pinkieBaseKnuckleZ) & thumbOnLeft) | \
+                  ((pointerBaseKnuckleZ < pinkieBaseKnuckleZ) & ~thumbOnLeft)
+    rotation = np.where(rotatesLeft, unsignedRotation * 1.5, unsignedRotation * -1 * 1.75)
+    features["rotation"] = roundLikePython(np.clip(rotation, -1, 1), 2)
+    features["maxPalmLength"] = maxPalmLength
+
+    # findTilt
+    wristZ, middleFingerSecondKnuckleZ = pixels[..., 0, Z], pixels[..., TIP_IDS[2] - 2, Z]
+    distances, horizontalness, _, _ = pairGeometry(pixels, [0], [9])
+    wTMFBKDist_XY = distances[..., 0, 0]
+    forwardBufferAndScalingFactor = 0.3
+    max_wTMFBKDist = np.maximum(wTMFBKDist_XY, 200)
+    unbufferedForwardTilt = np.where(handIsUpright, 1 - (wTMFBKDist_XY / max_wTMFBKDist), wTMFBKDist_XY / max_wTMFBKDist)
+    unsignedForwardTilt = np.where(handIsUpright & (unbufferedForwardTilt > forwardBufferAndScalingFactor),
+                                   (unbufferedForwardTilt - forwardBufferAndScalingFactor) / (1 - forwardBufferAndScalingFactor),
+                                   np.where(~handIsUpright, unbufferedForwardTilt * 1.75, 0))
+    forwardTilt = np.where(middleFingerSecondKnuckleZ < wristZ, unsignedForwardTilt, unsignedForwardTilt * -1 * 1.5)
+    features["forwardTilt"] = roundLikePython(np.clip(forwardTilt, -1, 1), 2)
+
+    unbufferedSidewaysTilt = horizontalness[..., 0, 0]
+    sidewaysBufferAndScalingFactor = 0.45
+    sidewaysTilt = np.where(np.abs(unbufferedSidewaysTilt) > sidewaysBufferAndScalingFactor,
+                            ((np.abs(unbufferedSidewaysTilt) - sidewaysBufferAndScalingFactor) / (1 - sidewaysBufferAndScalingFactor)) * np.sign(unbufferedSidewaysTilt),
+                            0)
+    sidewaysTilt = np.where(sidewaysTilt > 0, sidewaysTilt * 2, sidewaysTilt)
+    features["sidewaysTilt"] = roundLikePython(np.clip(sidewaysTilt, -1, 1), 4)
+
+    # findAndMarkCenterOfMass
+    centersOfMass = np.empty(pixels.shape[:-2] + (2, 5))
+    centersOfMass[..., 0, ID] = LANDMARK_COUNT
+    centersOfMass[..., 1, ID] = LANDMARK_COUNT + 1
+    centersOfMass[..., 0, X:Y_DRAW] = sequentialMean(pixels[..., X:Y_DRAW], axis=-2)
+    centersOfMass[..., 1, X:Y_DRAW] = sequentialMean(pixels[..., [1, 5, 9, 13, 0], X:Y_DRAW], axis=-2)
+    centersOfMass[..., Y_DRAW] = frameHeight - centersOfMass[..., Y]
+    features["centerOfMassWithFingers"] = centersOfMass[..., 0, :]
+    features["centerOfMassNoFingers"] = centersOfMass[..., 1, :]
+
+    # findFingersOpen
+    points = np.concatenate((pixels, centersOfMass), axis=-2)
+        # Same layout as the tracker's landmark buffer, the centers of mass are ids 21 and 22.
+    middleFingerBaseKnuckleZ = pixels[..., TIP_IDS[2] - 3, Z]
+    useNoFingersCenter = np.empty(pixels.shape[:-2] + (5,), dtype=bool)
+    useNoFingersCenter[..., 0] = handIsUpright
+    useNoFingersCenter[..., 1:] = ((handIsUpright & (middleFingerBaseKnuckleZ > wristZ)) | ~handIsUpright)[..., None]
+        # True where the finger gets compared against center of mass 22 (and the second knuckle), False for 21 (and the base knuckle).
+
+    tipDistance = np.where(useNoFingersCenter,
+                           pairDistancesXY(points, [22] * 5, TIP_IDS),
+                           pairDistancesXY(points, [21] * 5, TIP_IDS))
+    comparisonDistance = np.where(useNoFingersCenter,
+                                  pairDistancesXY(points, [22] * 5, [TIP_IDS[0] - 2] + [tip - 2 for tip in TIP_IDS[1:]]),
+                                  pairDistancesXY(points, [21] * 5, [TIP_IDS[0] - 1] + [tip - 3 for tip in TIP_IDS[1:]]))
+    fingers = (~(comparisonDistance > tipDistance)).astype(int)
+    features["fingers"] = fingers
+
+    fourFingersOpen = fingers[..., 1:].sum(axis=-1)
+    allFingersOpen = fingers.sum(axis=-1)
+    handIsClosed = fourFingersOpen == 0
+    features["handState"] = np.where(handIsClosed, HAND_CLOSED,
+                                     np.where((0 < allFingersOpen) & (allFingersOpen < 5), HAND_PARTIALLY_OPEN, HAND_OPEN))
+    features["handIsClosed"] = handIsClosed
+
+    return features
+
+
+def landmarkFeatures(normalized, frameWidth, frameHeight, keepLandmarks=False, chunkSize=65536):
+    # Offline version of findAllHands for whole datasets, e.g. to train gesture classifiers on: the handFeatures of every hand in
+    # normalized, a (N, 21, 3) array of mediapipe's 0-1 landmarks (N hands/frames, in any order), as seen in a frameWidth x frameHeight
+    # frame. The values are exactly what findRotation, findTilt, findAndMarkCenterOfMass and findFingersOpen return for the same landmarks.
+    # Returns a dict of (N, ...) arrays with the keys of handFeatures plus handMsg (N strings), and with keepLandmarks also the
+    # landmarks as (N, 21, 5) pixel rows (840 bytes a hand, left out by default since a million hands would take 840 MB).
+    # The hands get processed chunkSize at a time, so the temporary arrays stay the same size however big N is.
+
+    normalized = np.asarray(normalized).reshape(-1, LANDMARK_COUNT, 3)
+    count = len(normalized)
+    features = {}
+    pixels = np.empty((min(count, chunkSize), LANDMARK_COUNT, 5))
+
+    for start in range(0, count, chunkSize):
+        stop = min(start + chunkSize, count)
+        chunkPixels = normalizedToPixels(normalized[start:stop], frameWidth, frameHeight, out=pixels[:stop - start])
+        chunk = handFeatures(chunkPixels, frameHeight)
+        if keepLandmarks:
+            chunk["landmarks"] = chunkPixels
+        for key, values in chunk.items():
+            if key not in features:
+                features[key] = np.empty((count,) + values.shape[1:], dtype=values.dtype)
+            features[key][start:stop] = values
+
+    if count == 0:
+        features = handFeatures(np.empty((0, LANDMARK_COUNT, 5)), frameHeight)
+        if keepLandmarks:
+            features["landmarks"] = np.empty((0, LANDMARK_COUNT, 5))
+    features["handMsg"] = np.asarray(HAND_MESSAGES)[features["handState"]]
+
+    return features
+
+
+PALM_IDS = [0, 1, 5, 9, 13]
+    # Wrist and the knuckles at the base of the palm, the landmarks the center of mass without fingers is taken over.
+
+
+def worldFeatures(world, handedness=None):
+    # Metric counterpart of handFeatures, from mediapipe's world landmarks (multi_hand_world_landmarks) instead of pixel rows.
+    # world is a (..., 21, 3) array in meters (x right, y down, z away from the camera, centered on the hand), handedness the matching
+    # (...) "Left"/"Right" labels or HANDEDNESS_LABELS codes (assumed "Right" when not given; only palmNormal depends on it).
+    #
+    # Everything is worked out from 3D angles between the hand's own vectors, so unlike handFeatures nothing depends on the frame's
+    # resolution or on how far the hand is from the camera, and no tuned pixel maxima (the 110 and 200 in findRotation/findTilt) are needed.
+    # Same keys and value ranges as handFeatures, with the angles mapped to -1..1 as a fraction of 90 degrees:
+    #   handIsUpright, thumbOnLeft (...):      middle finger base knuckle above the wrist, thumb on the image's left of the wrist
+    #   rotation (...):                        turn of the palm around the hand's long axis, out of the image plane. Positive when the side of the
+    #                                          hand on the left of the image turns away from the camera (findRotation's "rotates left")
+    #   forwardTilt (...):                     wrist -> middle finger base knuckle tipping towards the camera (positive) or away (negative)
+    #   sidewaysTilt (...):                    the same vector leaning right (positive) or left (negative) in the image plane
+    #   centerOfMassWithFingers, centerOfMassNoFingers (..., 3): in meters, same landmarks as findAndMarkCenterOfMass
+    #   fingers (..., 5), handState (...), handIsClosed (...): same meaning as findFingersOpen
+    #   palmNormal (..., 3):                   unit vector out of the palm (z < 0 when the palm faces the camera)
+    # plus rotationAngle, forwardTiltAngle and sidewaysTiltAngle, the unscaled angles in radians.
+
+    world = np.asarray(world, dtype=np.float64)
+    features = {}
+    wrist = world[..., 0, :]
+
+    # Orientation
+    wristToMiddle = world[..., TIP_IDS[2] - 3, :] - wrist
+    handIsUpright = wristToMiddle[..., 1] < 0
+        # y points down.
+    thumbOnLeft = wrist[..., 0] - world[..., TIP_IDS[0] - 3, 0] > 0
+    features["handIsUpright"] = handIsUpright
+    features["thumbOnLeft"] = thumbOnLeft
+
+    # Palm normal, from the wrist -> pointer and wrist -> pinkie base knuckle vectors. Their cross product points into the palm of a
+    # right hand and out of the palm of a left one, so it gets flipped for right hands.
+    normal = np.cross(world[..., TIP_IDS[1] - 3, :] - wrist, world[..., TIP_IDS[4] - 3, :] - wrist)
+    if handedness is None:
+        isRight = np.ones(world.shape[:-2], dtype=bool)
+    else:
+        handedness = np.asarray(handedness)
+        isRight = handedness == (HANDEDNESS_LABELS[1] if handedness.dtype.kind in "US" else 1)
+    normal = np.where(isRight[..., None], -normal, normal)
+    features["palmNormal"] = normal / np.maximum(np.linalg.norm(normal, axis=-1, keepdims=True), 1e-12)
+
+    # Rotation: how far the knuckle line (pointer to pinkie) turns out of the image plane, signed by which end moved away.
+    knuckleLine = world[..., TIP_IDS[1] - 3, :] - world[..., TIP_IDS[4] - 3, :]
+    rotationAngle = np.arctan2(np.abs(knuckleLine[..., 2]), np.hypot(knuckleLine[..., 0], knuckleLine[..., 1]))
+    leftEndFurther = np.where(thumbOnLeft, knuckleLine[..., 2] > 0, knuckleLine[..., 2] < 0)
+        # With the thumb on the left the pointer knuckle is the left end of the line, otherwise the pinkie knuckle is.
+    rotationAngle = np.where(leftEndFurther, rotationAngle, -rotationAngle)
+    features["rotationAngle"] = rotationAngle
+    features["rotation"] = roundLikePython(np.clip(rotationAngle / (np.pi / 2), -1, 1), 2)
+
+    # Tilt: the wrist -> middle finger vector tipping out of the image plane (forward) and leaning within it (sideways).
+    forwardTiltAngle = np.arctan2(-wristToMiddle[..., 2], np.hypot(wristToMiddle[..., 0], wristToMiddle[..., 1]))
+    sidewaysTiltAngle = np.arcsin(np.clip(wristToMiddle[..., 0] / np.maximum(np.hypot(wristToMiddle[..., 0], wristToMiddle[..., 1]), 1e-12), -1, 1))
+        # Measured from the vertical either way up, like findTilt, which only looks at the horizontal part of the vector.
+    features["forwardTiltAngle"] = forwardTiltAngle
+    features["sidewaysTiltAngle"] = sidewaysTiltAngle
+    features["forwardTilt"] = roundLikePython(np.clip(forwardTiltAngle / (np.pi / 2), -1, 1), 2)
+    features["sidewaysTilt"] = roundLikePython(np.clip(sidewaysTiltAngle / (np.pi / 2), -1, 1), 4)
+
+    # Centers of mass
+    palmCenter = world[..., PALM_IDS, :].mean(axis=-2)
+    features["centerOfMassWithFingers"] = world.mean(axis=-2)
+    features["centerOfMassNoFingers"] = palmCenter
+
+    # Fingers: a finger is open when its tip is further from the palm center than its second knuckle, so a curled finger (tip folded
+    # back towards the palm) counts as closed whichever way the hand is turned. The thumb gets measured from the pinkie's base knuckle
+    # instead, since it folds across the palm rather than into it.
+    tips = world[..., TIP_IDS, :]
+    secondKnuckles = world[..., [tip - 2 for tip in TIP_IDS], :]
+    references = np.repeat(palmCenter[..., None, :], 5, axis=-2)
+    references[..., 0, :] = world[..., TIP_IDS[4] - 3, :]
+    secondKnuckles[..., 0, :] = world[..., TIP_IDS[0] - 1, :]
+        # The thumb's joint below the tip.
+    fingers = (np.linalg.norm(tips - references, axis=-1) > np.linalg.norm(secondKnuckles - references, axis=-1)).astype(int)
+    features["fingers"] = fingers
+
+    fourFingersOpen = fingers[..., 1:].sum(axis=-1)
+    allFingersOpen = fingers.sum(axis=-1)
+    handIsClosed = fourFingersOpen == 0
+    features["handState"] = np.where(handIsClosed, HAND_CLOSED,
+                                     np.where((0 < allFingersOpen) & (allFingersOpen < 5), HAND_PARTIALLY_OPEN, HAND_OPEN))
+    features["handIsClosed"] = handIsClosed
+
+    return features
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import bisect
+import threading
+import collections
+
+
+# Live telemetry for the hand tracker. Off by default: HandTrackingDynamic only records anything once enableMetrics() is called,
+# and when it's off every hook is a single `if self.metrics:` check.
+#
+#   metrics = detector.enableMetrics()
+#   metrics.startPeriodicDump("hand_metrics.prom", interval=5, format="prometheus")
+#   ...
+#   print(metrics.snapshot()["stages"]["model"]["p90Ms"])
+#
+# Stages recorded by the tracker: capture (HandPipeline), flip, motionGate (the motion check of the motionGate option), cvtColor,
+# model (model.roi when it only got the crop around the hand, predict on frames skipped with skipFrames), landmarks (reading them out of the results),
+# positions (findAndMark_Positions), feature.<name> for each value computed by HandAnalysisContext, and render.<what> for drawing
+# (render.landmarks, render.positions, render.markers, render.centerOfMass, render.annotate, render.hud and render.hudText for the
+# text overlay, see HandOverlay.py). A SessionRecorder adds record (queueing a frame on the tracking thread), record.encode and record.lag
+# (from queueing to written out), see HandSession.py.
+
+BUCKET_BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.0075, 0.01, 0.015, 0.02, 0.03, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0)
+    # Upper bounds (in seconds) of the latency histogram buckets, plus an implicit last bucket for anything slower.
+
+
+class LatencyHistogram:
+
+    def __init__(self, bounds=BUCKET_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def percentile(self, percent):
+        # Estimated from the buckets by interpolating linearly inside the bucket the percentile falls in.
+        if self.count == 0:
+            return 0.0
+        target = self.count * percent / 100
+        seen = 0
+        for index, bucketCount in enumerate(self.counts):
+            if bucketCount and seen + bucketCount >= target:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = min(self.bounds[index], self.maximum) if index < len(self.bounds) else self.maximum
+                lower = min(lower, upper)
+                return lower + (upper - lower) * (target - seen) / bucketCount
+            seen += bucketCount
+        return self.maximum
+
+    def summary(self):
+        return {"count": self.count,
+                "meanMs": self.total / self.count * 1000 if self.count else 0.0,
+                "p50Ms": self.percentile(50) * 1000,
+                "p90Ms": self.percentile(90) * 1000,
+                "p99Ms": self.percentile(99) * 1000,
+                "maxMs": self.maximum * 1000}
+
+
+class FpsCounter:
+    # Frame rate over a sliding window of the last `window` frames, instead of 1/(time since the last frame), which jumps around
+    # with every single slow or fast frame.
+
+    def __init__(self, window=30):
+        self._times = collections.deque(maxlen=window)
+
+    def tick(self, now=None):
+        # Call once per frame, returns the current frame rate.
+        self._times.append(time.perf_counter() if now is None else now)
+        return self.fps
+
+    @property
+    def fps(self):
+        if len(self._times) < 2 or self._times[-1] == self._times[0]:
+            return 0.0
+        return (len(self._times) - 1) / (self._times[-1] - self._times[0])
+
+
+class HandMetrics:
+
+    def __init__(self, fpsWindow=30):
+        self.stages = collections.OrderedDict()
+        self.frames = 0
+        self.framesWithHand = 0
+        self.handLostEvents = 0
+        self.handFoundEvents = 0
+        self.fpsCounter = FpsCounter(fpsWindow)
+        self.startTime = time.time()
+        self._handsLastFrame = 0
+        self._lock = threading.Lock()
+            # The pipeline records capture times on its own thread, so updates go through a lock.
+        self._dumpThread = None
+        self._dumpStop = threading.Event()
+
+    def __bool__(self):
+        return True
+            # So `if self.metrics:` works the same whether or not this object has recorded anything yet.
+
+    def observe(self, stage, start):
+        # Records the time since `start` (a time.perf_counter() value) for stage and returns the current time,
+        # so consecutive stages can be chained: start = metrics.observe("flip", start).
+        now = time.perf_counter()
+        self.recordLatency(stage, now - start)
+        return now
+
+    def recordLatency(self, stage, seconds):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def recordDetection(self, handCount):
+        # Called once per processed frame with the number of hands found. Counts the frame, ticks the FPS counter and
+        # records a hand lost/found event whenever the hand count drops to or rises from zero.
+        with self._lock:
+            self.frames += 1
+            if handCount:
+                self.framesWithHand += 1
+            if handCount and not self._handsLastFrame:
+                self.handFoundEvents += 1
+            elif not handCount and self._handsLastFrame:
+                self.handLostEvents += 1
+            self._handsLastFrame = handCount
+            self.fpsCounter.tick()
+
+    def snapshot(self):
+        # Pull API: everything recorded so far as plain dicts/numbers.
+        with self._lock:
+            return {"time": time.time(),
+                    "uptime": time.time() - self.startTime,
+                    "frames": self.frames,
+                    "framesWithHand": self.framesWithHand,
+                    "detectionRate": self.framesWithHand / self.frames if self.frames else 0.0,
+                    "handLostEvents": self.handLostEvents,
+                    "handFoundEvents": self.handFoundEvents,
+                    "fps": self.fpsCounter.fps,
+                    "stages": {stage: histogram.summary() for stage, histogram in self.stages.items()}}
+
+    def prometheusText(self):
+        # Same data in the Prometheus text exposition format.
+        lines = ["# TYPE hand_stage_latency_seconds histogram"]
+        with self._lock:
+            for stage, histogram in self.stages.items():
+                cumulative = 0
+                for bound, bucketCount in zip(histogram.bounds + (float("inf"),), histogram.counts):
+                    cumulative += bucketCount
+                    lines.append('hand_stage_latency_seconds_bucket{stage="%s",le="%s"} %d' % (stage, "+Inf" if bound == float("inf") else repr(bound), cumulative))
+                lines.append('hand_stage_latency_seconds_sum{stage="%s"} %r' % (stage, histogram.total))
+                lines.append('hand_stage_latency_seconds_count{stage="%s"} %d' % (stage, histogram.count))
+            lines += ["# TYPE hand_frames_total counter", "hand_frames_total %d" % self.frames,
+                      "# TYPE hand_frames_with_hand_total counter", "hand_frames_with_hand_total %d" % self.framesWithHand,
+                      "# TYPE hand_lost_total counter", "hand_lost_total %d" % self.handLostEvents,
+                      "# TYPE hand_found_total counter", "hand_found_total %d" % self.handFoundEvents,
+                      "# TYPE hand_fps gauge", "hand_fps %r" % self.fpsCounter.fps]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path, format="jsonl"):
+        # jsonl appends one snapshot per line, prometheus rewrites the file (atomically, so a scraper never reads half of it).
+        if format == "jsonl":
+            with open(path, "a") as file:
+                file.write(json.dumps(self.snapshot()) + "\n")
+        elif format == "prometheus":
+            temporaryPath = path + ".tmp"
+            with open(temporaryPath, "w") as file:
+                file.write(self.prometheusText())
+            os.replace(temporaryPath, path)
+        else:
+            raise ValueError("Unknown metrics format " + repr(format))
+
+    def startPeriodicDump(self, path, interval=10.0, format="jsonl"):
+        self.stopPeriodicDump()
+        self._dumpStop.clear()
+
+        def dumpLoop():
+            while not self._dumpStop.wait(interval):
+                self.dump(path, format)
+
+        self._dumpThread = threading.Thread(target=dumpLoop, name="HandMetrics-dump", daemon=True)
+        self._dumpThread.start()
+
+    def stopPeriodicDump(self):
+        if self._dumpThread is not None:
+            self._dumpStop.set()
+            self._dumpThread.join()
+            self._dumpThread = None
@@ -0,0 +1,88 @@
+import numpy as np
+
+from HandStartup import lazyImport
+
+cv2 = lazyImport("cv2")
+
+
+# Motion gating for skipping the model on frames where nothing changed (see the motionGate option of HandTrackingDynamic).
+# Every frame gets shrunk to a tiny grayscale thumbnail and compared with the thumbnail of the last frame the model ran on.
+# If neither the area around the hands nor the frame as a whole changed by more than a threshold, the model's last results still hold
+# and get reused as they are. That covers a hand being held still and, most of all, nobody being there at all, where running the model
+# every frame just burns CPU on an empty picture.
+#
+# Around the hands, the change is measured as the mean absolute change in gray level (0-255) per thumbnail pixel. Over the whole frame it's
+# the fraction of thumbnail pixels that changed by more than pixelThreshold gray levels, since a hand coming in only covers a few percent
+# of the frame and would vanish in a mean. Both after taking out the average change of the thumbnail, so the camera adjusting its
+# exposure doesn't count as motion.
+
+
+class MotionGate:
+
+    def __init__(self, threshold=4.0, frameThreshold=0.005, pixelThreshold=10, refresh=30, size=(96, 54)):
+        # threshold: mean change around the hands (the box the last results' landmarks span, with some margin) that counts as motion.
+        # frameThreshold: fraction of the frame that has to change (by more than pixelThreshold) to count as motion, e.g. a hand coming in.
+        # refresh: the model runs at least every refresh frames whatever the thumbnails say (None = never forced).
+        # size: (width, height) of the thumbnail.
+        self.threshold = threshold
+        self.frameThreshold = frameThreshold
+        self.pixelThreshold = pixelThreshold
+        self.refresh = refresh
+        self.size = size
+
+        width, height = size
+        self._halfway = np.empty((height * 2, width * 2, 3), np.uint8)
+        self._small = np.empty((height, width, 3), np.uint8)
+        self._thumbnail = np.empty((height, width), np.uint8)
+        self._reference = np.empty((height, width), np.uint8)
+        self._difference = np.empty((height, width), np.int16)
+        self._hasReference = False
+        self.framesSinceRefresh = 0
+
+        self.changedFraction = 0.0
+        self.regionEnergy = 0.0
+            # Last frame's changes over the whole frame and around the hands.
+        self.skippedFrames = 0
+        self.modelFrames = 0
+
+    def reset(self):
+        # Forgets the reference, so the next frame goes through the model.
+        self._hasReference = False
+
+    def shouldRun(self, frame, box=None):
+        # True if the model has to run on frame, which then becomes the new reference. False if it looks like the reference frame.
+        # box: (x0, y0, x1, y1) pixel box around the last results' hands, None when there weren't any.
+        width, height = self.size
+        cv2.resize(frame, (width * 2, height * 2), dst=self._halfway, interpolation=cv2.INTER_LINEAR)
+        cv2.resize(self._halfway, self.size, dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._thumbnail)
+            # Straight down with INTER_AREA would average every pixel of the frame but costs milliseconds on a 1080p frame. Sampling down
+            # to twice the size first and averaging from there costs a tenth of a millisecond and still evens out the sensor noise.
+
+        if self._hasReference and (self.refresh is None or self.framesSinceRefresh + 1 < self.refresh):
+            difference = np.subtract(self._thumbnail, self._reference, out=self._difference, dtype=np.int16)
+            difference -= np.int16(difference.mean())
+                # Take out the overall brightness change.
+            np.abs(difference, out=difference)
+            self.changedFraction = np.count_nonzero(difference > self.pixelThreshold) / difference.size
+
+            self.regionEnergy = 0.0
+            if box is not None:
+                frameHeight, frameWidth = frame.shape[:2]
+                x0, y0, x1, y1 = box
+                region = difference[y0 * height // frameHeight:-(-y1 * height // frameHeight), x0 * width // frameWidth:-(-x1 * width // frameWidth)]
+                    # The box in thumbnail pixels, rounded outwards.
+                if region.size:
+                    self.regionEnergy = float(region.mean())
+
+            if self.changedFraction <= self.frameThreshold and self.regionEnergy <= self.threshold:
+                self.framesSinceRefresh += 1
+                self.skippedFrames += 1
+                return False
+
+        self._reference, self._thumbnail = self._thumbnail, self._reference
+            # This frame is the new reference. Swapped rather than copied, the old reference's buffer gets the next thumbnail.
+        self._hasReference = True
+        self.framesSinceRefresh = 0
+        self.modelFrames += 1
+        return True
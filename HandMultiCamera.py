@@ -0,0 +1,278 @@
+import os
+import time
+import heapq
+import queue
+import argparse
+import tempfile
+import multiprocessing
+import numpy as np
+import cv2
+
+from HandRecog import HandTrackingDynamic
+from HandPipeline import HandPipeline
+
+
+# Runs the hand tracker on several cameras/videos at once. Every source gets its own worker process with its own capture + model
+# (a HandPipeline inside, so the camera read and the model still overlap), so the models don't fight over the GIL and each camera
+# keeps its own frame rate. The workers only send back the analyze() results, not the frames, and the parent merges them into one
+# stream ordered by capture time.
+#
+#   runner = MultiCameraRunner([0, 1, "session.mp4"])
+#   for item in runner:
+#       item["timestamp"], item["source"], item["frameIndex"], item["hands"]
+#
+# From the command line (cameras are given by index, anything else is a video file):
+#   python HandMultiCamera.py 0 1 2
+#   python HandMultiCamera.py --discover
+#   python HandMultiCamera.py --smoke-check [video ...]     (runs two sources end to end, fails unless every one of them delivers results)
+
+
+def discoverCameras(maxIndex=8):
+    # Camera indices that open and deliver a frame, checking 0 to maxIndex - 1.
+    cameras = []
+    for index in range(maxIndex):
+        capture = cv2.VideoCapture(index)
+        if capture.isOpened() and capture.read()[0]:
+            cameras.append(index)
+        capture.release()
+    return cameras
+
+
+class TimestampedCapture:
+    # Wraps a VideoCapture so every frame comes out with the time it was read, (timestamp, frameIndex, frame).
+    # The timestamp is taken right when the camera hands the frame over, before any queueing, so frames from different cameras can be
+    # put in the right order afterwards.
+
+    def __init__(self, capture):
+        self.capture = capture
+        self.frameIndex = 0
+
+    def read(self):
+        ret, frame = self.capture.read()
+        if not ret:
+            return ret, None
+        item = (time.time(), self.frameIndex, frame)
+        self.frameIndex += 1
+        return ret, item
+
+    def release(self):
+        self.capture.release()
+
+
+def _sourceWorker(sourceId, source, trackerOptions, frameSize, outputQueue, stopEvent):
+    # Runs in its own process: capture, model and analysis for one source. Puts ("result", sourceId, timestamp, frameIndex, hands)
+    # on outputQueue for every frame, then ("done", sourceId, error) at the end.
+    error = None
+    try:
+        capture = cv2.VideoCapture(source)
+        if not capture.isOpened():
+            raise IOError("Cannot open source " + repr(source))
+        if frameSize is not None and isinstance(source, int):
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, frameSize[0])
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, frameSize[1])
+
+        detector = HandTrackingDynamic(**trackerOptions)
+
+        def process(item):
+            timestamp, frameIndex, frame = item
+            frame, results = detector.detectHands(frame)
+            return timestamp, frameIndex, frame, results
+
+        live = isinstance(source, int)
+        pipeline = HandPipeline(TimestampedCapture(capture), process, dropFrames=live)
+            # Cameras drop frames the model can't keep up with, video files get every frame analyzed.
+        for timestamp, frameIndex, frame, results in pipeline:
+            if stopEvent.is_set():
+                break
+            detector.loadResults(results)
+            item = ("result", sourceId, timestamp, frameIndex, detector.analyze(frame))
+            if live:
+                try:
+                    outputQueue.put_nowait(item)
+                except queue.Full:
+                    pass
+                        # The parent isn't keeping up: drop this frame rather than let the queue (and the memory) grow.
+            else:
+                while not stopEvent.is_set():
+                    try:
+                        outputQueue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                            # A video file waits for the parent instead, so every frame gets through. The timeout only lets stop() end it.
+    except Exception as exception:
+        error = repr(exception)
+    finally:
+        outputQueue.put(("done", sourceId, error))
+
+
+class MultiCameraRunner:
+
+    def __init__(self, sources, maxDelay=0.1, queueSize=256, frameSize=None, **trackerOptions):
+        # sources: camera indices and/or video file paths, one worker process each.
+        # maxDelay: how long (seconds) a result may wait here for the other sources before it gets sent out anyway. Results are normally
+        #           held until every running source has delivered something at least as new, so a stalled camera only delays
+        #           the stream by this much.
+        # queueSize: results waiting to be merged. When it's full cameras drop their new ones, video files wait for room.
+        # frameSize: optional (width, height) to ask the cameras for.
+        # trackerOptions: passed to HandTrackingDynamic in every worker (maxHands, roi, skipFrames...).
+        self.sources = list(sources)
+        self.maxDelay = maxDelay
+        self.frameSize = frameSize
+        self.trackerOptions = trackerOptions
+
+        self._context = multiprocessing.get_context("spawn")
+            # Fresh processes instead of forks, so no camera or model state (or the threads behind them) gets copied over.
+        self._queue = self._context.Queue(queueSize)
+        self._stopEvent = self._context.Event()
+        self._processes = []
+
+        self.errors = {}
+        self.frames = {sourceId: 0 for sourceId in range(len(self.sources))}
+        self._firstTimestamp = {}
+        self._lastTimestamp = {}
+
+    def start(self):
+        if self._processes:
+            return self
+        for sourceId, source in enumerate(self.sources):
+            process = self._context.Process(target=_sourceWorker, name="HandMultiCamera-" + str(sourceId), daemon=True,
+                                            args=(sourceId, source, self.trackerOptions, self.frameSize, self._queue, self._stopEvent))
+            process.start()
+            self._processes.append(process)
+        return self
+
+    def stop(self):
+        self._stopEvent.set()
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+    def __iter__(self):
+        # Yields {"timestamp", "source", "frameIndex", "hands"} dicts in timestamp order. source is the index into sources,
+        # hands is the list from HandTrackingDynamic.analyze.
+        self.start()
+        running = set(range(len(self.sources)))
+        latest = {sourceId: float("-inf") for sourceId in running}
+        pending = []
+        sequence = 0
+            # Tie breaker for the heap so equal timestamps never end up comparing the rest of the entries.
+
+        try:
+            while running or pending:
+                try:
+                    message = self._queue.get(timeout=0.01)
+                except queue.Empty:
+                    message = None
+
+                if message is not None and message[0] == "result":
+                    _, sourceId, timestamp, frameIndex, hands = message
+                    heapq.heappush(pending, (timestamp, sequence, time.time(), {"timestamp": timestamp, "source": sourceId,
+                                                                                "frameIndex": frameIndex, "hands": hands}))
+                    sequence += 1
+                    latest[sourceId] = timestamp
+                    self._count(sourceId, timestamp)
+                elif message is not None:
+                    _, sourceId, error = message
+                    running.discard(sourceId)
+                    if error is not None:
+                        self.errors[sourceId] = error
+
+                watermark = min(latest[sourceId] for sourceId in running) if running else float("inf")
+                    # Every running source sends its frames in order, so nothing older than this can still arrive.
+                now = time.time()
+                while pending and (pending[0][0] <= watermark or now - pending[0][2] > self.maxDelay):
+                    yield heapq.heappop(pending)[3]
+                        # The delay counts from when the result got here, the time the model took is already behind it.
+        finally:
+            self.stop()
+
+    def _count(self, sourceId, timestamp):
+        self.frames[sourceId] += 1
+        self._firstTimestamp.setdefault(sourceId, timestamp)
+        self._lastTimestamp[sourceId] = timestamp
+
+    def stats(self):
+        # Frames received and the analyzed frame rate for every source, plus the error it stopped with, if any.
+        stats = {}
+        for sourceId, source in enumerate(self.sources):
+            frames = self.frames[sourceId]
+            duration = self._lastTimestamp.get(sourceId, 0) - self._firstTimestamp.get(sourceId, 0)
+            stats[sourceId] = {"source": source, "frames": frames,
+                               "fps": (frames - 1) / duration if frames > 1 and duration > 0 else 0.0,
+                               "error": self.errors.get(sourceId)}
+        return stats
+
+
+def writeTestVideo(path, frameCount=30, frameSize=(320, 240), fps=30):
+    # A short generated video (a moving square, no hands) for smokeCheck when no real recording is at hand.
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, frameSize)
+    if not writer.isOpened():
+        raise IOError("Cannot open " + path + " for writing")
+    frame = np.zeros((frameSize[1], frameSize[0], 3), np.uint8)
+    for index in range(frameCount):
+        frame[...] = 40
+        x = index * (frameSize[0] - 40) // max(1, frameCount - 1)
+        frame[100:140, x:x + 40] = 220
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def smokeCheck(videos=None, **trackerOptions):
+    # Runs the runner end to end on video files, two sources when only one video is given (or a generated one when none is), and
+    # raises unless every source delivered at least one result and none of them stopped with an error. Returns runner.stats().
+    with tempfile.TemporaryDirectory() as folder:
+        if not videos:
+            videos = [writeTestVideo(os.path.join(folder, "smoke.avi"))]
+        sources = list(videos) * 2 if len(videos) == 1 else list(videos)
+        runner = MultiCameraRunner(sources, **trackerOptions)
+        results = sum(1 for _ in runner)
+        stats = runner.stats()
+
+    failed = {sourceId: sourceStats for sourceId, sourceStats in stats.items() if sourceStats["frames"] == 0 or sourceStats["error"]}
+    if failed or results == 0:
+        raise RuntimeError("Multi-camera smoke check failed, {} results in total, failing sources: {}".format(results, failed))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run hand tracking on several cameras/videos at once, one process each.")
+    parser.add_argument("sources", nargs="*", help="camera indices and/or video files")
+    parser.add_argument("--discover", action="store_true", help="use every camera that can be opened")
+    parser.add_argument("--smoke-check", action="store_true", help="run the given video files (or a generated one) end to end and "
+                                                                       "fail unless every source delivers results")
+    parser.add_argument("--max-hands", type=int, default=2)
+    parser.add_argument("--width", type=int, default=None)
+    parser.add_argument("--height", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.smoke_check:
+        for sourceId, stats in smokeCheck(args.sources, maxHands=args.max_hands).items():
+            print(sourceId, stats)
+        print("smoke check passed")
+        return
+
+    sources = [int(source) if source.isdigit() else source for source in args.sources]
+    if args.discover:
+        sources += [camera for camera in discoverCameras() if camera not in sources]
+    if not sources:
+        parser.error("no sources given and no cameras found")
+
+    frameSize = (args.width, args.height) if args.width and args.height else None
+    runner = MultiCameraRunner(sources, frameSize=frameSize, maxHands=args.max_hands)
+    try:
+        for item in runner:
+            print("{:.3f}  source {}  frame {}  ".format(item["timestamp"], item["source"], item["frameIndex"]) +
+                  "  ".join(hand["handedness"] + " " + hand["handMsg"] + " " + str(hand["fingers"]) for hand in item["hands"]))
+    except KeyboardInterrupt:
+        runner.stop()
+
+    for sourceId, stats in runner.stats().items():
+        print(sourceId, stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import time
+import socket
+import struct
+import numpy as np
+
+from HandGeometry import LANDMARK_COUNT, handednessCode, fingerMask
+
+
+# Streams every frame's hand results over UDP in a fixed binary layout, for remote consumers that can't wait on JSON or TCP.
+#
+# Datagram: an 8 byte header (magic, format version, hand slots per record, number of records) followed by that many records.
+# Record (little endian, packed, see recordDtype):
+#   sequence      uint32                    frame counter of the publisher, so the receiver can spot lost packets
+#   timestamp     float64                   seconds (time.time() by default)
+#   handCount     uint8
+#   then for every hand slot (maxHands of them, empty ones zeroed with handedness -1):
+#   handedness    int8                      index into HANDEDNESS_LABELS
+#   handState     int8                      index into HAND_MESSAGES
+#   fingerMask    uint8                     bit i set = finger i open (thumb is bit 0)
+#   rotation, forwardTilt, sidewaysTilt     float32
+#   landmarks     float32 x 21 x 3          mediapipe's normalized coordinates
+# When frames come in faster than batchInterval, several records share one datagram (as many as fit in maxPacketSize).
+#
+# Sending (features from HandTrackingDynamic.findAllHands):
+#   publisher = HandPublisher("192.168.1.20", 5005)
+#   publisher.publish(detector.findAllHands(frame))
+# Receiving:
+#   receiver = HandReceiver(port=5005)
+#   records = receiver.receive()      # structured array, records["hands"]["landmarks"] is (N, maxHands, 21, 3)
+
+MAGIC = b"HN"
+VERSION = 1
+HEADER = struct.Struct("<2sBBHxx")
+    # magic, version, maxHands, record count, padding up to 8 bytes.
+
+
+def handDtype():
+    return np.dtype([("handedness", "i1"),
+                     ("handState", "i1"),
+                     ("fingerMask", "u1"),
+                     ("rotation", "<f4"),
+                     ("forwardTilt", "<f4"),
+                     ("sidewaysTilt", "<f4"),
+                     ("landmarks", "<f4", (LANDMARK_COUNT, 3))])
+
+
+def recordDtype(maxHands):
+    return np.dtype([("sequence", "<u4"),
+                     ("timestamp", "<f8"),
+                     ("handCount", "u1"),
+                     ("hands", handDtype(), (maxHands,))])
+
+
+def decodePacket(data, expectedMaxHands=None):
+    # Structured array (recordDtype) of the records in one datagram. A read-only view of data, nothing gets copied or unpacked.
+    magic, version, maxHands, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a hand state packet")
+    if version != VERSION:
+        raise ValueError("Unsupported packet version " + str(version))
+    if expectedMaxHands is not None and maxHands != expectedMaxHands:
+        raise ValueError("Packet has " + str(maxHands) + " hand slots, expected " + str(expectedMaxHands))
+    return np.frombuffer(data, dtype=recordDtype(maxHands), count=count, offset=HEADER.size)
+
+
+def writeRecord(record, features, sequence, timestamp):
+    # Fills one recordDtype record (in place) from the dict HandTrackingDynamic.findAllHands returns. Hands beyond the record's slots are left out.
+    hands = record["hands"]
+    handCount = min(len(features["handedness"]), len(hands))
+
+    record["sequence"] = sequence & 0xFFFFFFFF
+    record["timestamp"] = timestamp
+    record["handCount"] = handCount
+    hands.fill(0)
+    hands["handedness"] = -1
+    if handCount:
+        hands["handedness"][:handCount] = [handednessCode(label) for label in features["handedness"][:handCount]]
+        hands["handState"][:handCount] = features["handState"][:handCount]
+        hands["fingerMask"][:handCount] = fingerMask(features["fingers"][:handCount])
+        hands["rotation"][:handCount] = features["rotation"][:handCount]
+        hands["forwardTilt"][:handCount] = features["forwardTilt"][:handCount]
+        hands["sidewaysTilt"][:handCount] = features["sidewaysTilt"][:handCount]
+        hands["landmarks"][:handCount] = features["normalized"][:handCount]
+
+
+class HandPublisher:
+
+    def __init__(self, host, port, maxHands=2, batchInterval=0.005, maxPacketSize=1400, sock=None):
+        # batchInterval: frames published less than this long (seconds) after the last datagram wait to be sent together with the next ones,
+        #                0 sends every frame straight away. At low frame rates every frame still goes out immediately.
+        # maxPacketSize: upper limit for one datagram. The default stays under a typical network MTU so packets don't get fragmented.
+        self.address = (host, port)
+        self.maxHands = maxHands
+        self.batchInterval = batchInterval
+        self.dtype = recordDtype(maxHands)
+        self.batchSize = max(1, (maxPacketSize - HEADER.size) // self.dtype.itemsize)
+        self.socket = sock if sock is not None else socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+        self._buffer = bytearray(HEADER.size + self.batchSize * self.dtype.itemsize)
+        self._records = np.frombuffer(self._buffer, dtype=self.dtype, count=self.batchSize, offset=HEADER.size)
+            # The records get written straight into the datagram buffer, which is reused for every packet.
+        self._pending = 0
+        self._batchStart = 0.0
+        self._lastSend = float("-inf")
+
+        self.sequence = 0
+        self.packetsSent = 0
+        self.recordsSent = 0
+
+    def publish(self, features, timestamp=None):
+        # features: the dict from HandTrackingDynamic.findAllHands (arrays with one entry per hand). Hands beyond maxHands are left out.
+        now = time.time()
+        writeRecord(self._records[self._pending], features, self.sequence, now if timestamp is None else timestamp)
+
+        self.sequence += 1
+        if self._pending == 0:
+            self._batchStart = now
+        self._pending += 1
+
+        if (self._pending == self.batchSize or now - self._lastSend >= self.batchInterval
+                or now - self._batchStart >= self.batchInterval):
+            self.flush()
+
+    def flush(self):
+        # Sends whatever is waiting for a batch.
+        if self._pending == 0:
+            return
+        HEADER.pack_into(self._buffer, 0, MAGIC, VERSION, self.maxHands, self._pending)
+        self.socket.sendto(memoryview(self._buffer)[:HEADER.size + self._pending * self.dtype.itemsize], self.address)
+        self.packetsSent += 1
+        self.recordsSent += self._pending
+        self._pending = 0
+        self._lastSend = time.time()
+
+    def close(self):
+        self.flush()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class HandReceiver:
+
+    def __init__(self, host="0.0.0.0", port=5005, maxHands=None, bufferSize=65536):
+        # port=0 picks a free port, see address. maxHands, if given, rejects packets with a different number of hand slots.
+        self.maxHands = maxHands
+        self.bufferSize = bufferSize
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+
+        self.lastSequence = None
+        self.packetsReceived = 0
+        self.recordsReceived = 0
+        self.lost = 0
+        self.outOfOrder = 0
+
+    @property
+    def address(self):
+        return self.socket.getsockname()
+
+    def receive(self, timeout=None):
+        # Waits for the next datagram and returns its records (see recordDtype), or None if nothing arrived within timeout.
+        # Every field is a NumPy view, e.g. records["hands"]["rotation"] is (N, maxHands) and records["hands"]["landmarks"] (N, maxHands, 21, 3).
+        self.socket.settimeout(timeout)
+        try:
+            data, _ = self.socket.recvfrom(self.bufferSize)
+        except socket.timeout:
+            return None
+
+        records = decodePacket(data, self.maxHands)
+        self.packetsReceived += 1
+        self.recordsReceived += len(records)
+        if len(records):
+            self._trackSequence(int(records["sequence"][0]), int(records["sequence"][-1]))
+        return records
+
+    def _trackSequence(self, first, last):
+        if self.lastSequence is not None:
+            gap = (first - self.lastSequence - 1) & 0xFFFFFFFF
+            if gap >= 0x80000000:
+                self.outOfOrder += 1
+                    # Older than what already came in (the difference wrapped around).
+                return
+            self.lost += gap
+        self.lastSequence = last
+
+    def __iter__(self):
+        # Yields the records of every datagram as it arrives, forever (or until the socket gets closed).
+        while True:
+            try:
+                records = self.receive()
+            except OSError:
+                return
+            yield records
+
+    def stats(self):
+        return {"packets": self.packetsReceived, "records": self.recordsReceived, "lost": self.lost, "outOfOrder": self.outOfOrder}
+
+    def close(self):
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
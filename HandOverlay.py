@@ -0,0 +1,155 @@
+import time
+import numpy as np
+
+from HandStartup import lazyImport
+
+cv2 = lazyImport("cv2")
+
+
+# Drawing helpers for the on-screen display, kept cheap so showing the results never holds up the tracking.
+#
+# HudOverlay is the text in the corner (FPS, finger states, rotation...). Instead of putText-ing every line onto the full frame every
+# frame, each line gets rendered once into a small image of its own (colors + alpha), and only again when that line actually changes,
+# so the FPS ticking over doesn't re-render the six lines around it. Each frame those images just get alpha blended onto the small boxes
+# of the frame they cover, the rest is never touched.
+#
+# DisplayRate decides which frames get shown at all: the tracker can run at 60 FPS while the window only refreshes at, say, 30.
+#
+#   hud = HudOverlay()
+#   display = DisplayRate(30)
+#   ...
+#   if display.due():
+#       hud.update([("FPS: " + str(int(fps)), (5, 30), HUD_GREEN, 1.2, 2)])
+#       cv2.imshow("Hands", hud.draw(frame))
+
+MARKER_COLORS = {
+    # color name: (lineColor, dotColor) for drawMarkers, bright line and darker dots (BGR).
+    "red":     ((74, 26, 200), (37, 13, 100)),
+    "green":   ((50, 200, 50), (25, 120, 25)),
+    "blue":    ((200, 74, 26), (100, 37, 13)),
+    "magenta": ((200, 50, 200), (100, 25, 100)),
+    "cyan":    ((255, 255, 0), (125, 125, 0)),
+    "yellow":  ((0, 255, 255), (0, 125, 125)),
+}
+
+HUD_GREEN = (0, 255, 0)
+HUD_RED = (74, 26, 255)
+
+
+class HudOverlay:
+
+    def __init__(self, font=None, opacity=1.0, background=(0, 0, 0), backgroundOpacity=0.0, padding=4, metrics=None):
+        # opacity: of the text, 1 looks the same as putText straight onto the frame.
+        # background/backgroundOpacity: optional shaded box behind the text to make it readable on bright frames (0 = no box).
+        # metrics: optional HandMetrics, records the time spent as render.hud (drawing) and render.hudText (re-rendering changed lines).
+        self.font = cv2.FONT_HERSHEY_PLAIN if font is None else font
+        self.opacity = opacity
+        self.background = background
+        self.backgroundOpacity = backgroundOpacity
+        self.padding = padding
+        self.metrics = metrics
+
+        self._lines = []
+        self._rendered = []
+            # Per line, its (x0, y0, inverseAlpha, weighted, blended). Drawing a line is frame * inverseAlpha + weighted over its box,
+            # both worked out when the line gets rendered, as 8 bit images so the blend runs on OpenCV's vectorized uint8 arithmetic,
+            # one multiply and one add per pixel (into blended, reused every frame).
+        self._backgroundBox = None
+        self.renders = 0
+            # Lines rendered so far.
+
+    def update(self, lines):
+        # lines: (text, (x, y), color, fontScale, thickness) tuples, positioned the way putText takes them (x, y is the bottom left of
+        # the text). Re-renders only the lines that differ from the last call. Returns True if any did.
+        lines = list(lines)
+        if lines == self._lines:
+            return False
+        if self.metrics: start = time.perf_counter()
+
+        rendered = []
+        for index, line in enumerate(lines):
+            if index < len(self._lines) and self._lines[index] == line:
+                rendered.append(self._rendered[index])
+            else:
+                rendered.append(self._renderLine(line))
+                self.renders += 1
+        self._lines = lines
+        self._rendered = rendered
+
+        self._backgroundBox = None
+        if rendered and self.backgroundOpacity > 0:
+            self._backgroundBox = (min(entry[0] for entry in rendered), min(entry[1] for entry in rendered),
+                                   max(entry[0] + entry[3].shape[1] for entry in rendered), max(entry[1] + entry[3].shape[0] for entry in rendered))
+                # One box behind all the lines, so the shading doesn't get darker where two lines' boxes overlap.
+
+        if self.metrics: self.metrics.observe("render.hudText", start)
+        return True
+
+    def _renderLine(self, line):
+        text, (x, y), color, fontScale, thickness = line
+        (width, height), baseline = cv2.getTextSize(text, self.font, fontScale, thickness)
+        x0 = max(0, x - self.padding)
+        y0 = max(0, y - height - thickness - self.padding)
+        x1 = x + width + thickness + self.padding
+        y1 = y + baseline + thickness + self.padding
+            # Everything the text can touch, so nothing gets cut off.
+
+        coverage = np.zeros((y1 - y0, x1 - x0), np.uint8)
+        cv2.putText(coverage, text, (x - x0, y - y0), self.font, fontScale, 255, thickness)
+            # putText antialiases the edges, so the mask holds how much of each pixel the text covers, not just where it is.
+        if self.opacity != 1:
+            coverage = cv2.convertScaleAbs(coverage, alpha=self.opacity)
+
+        inverse = cv2.bitwise_not(coverage)
+        inverseAlpha = cv2.merge((inverse, inverse, inverse))
+        weighted = cv2.merge([cv2.convertScaleAbs(coverage, alpha=channel / 255) for channel in color])
+            # The text color times its alpha, one channel at a time (OpenCV's multiply by a per-channel scalar is several times slower).
+        return (x0, y0, inverseAlpha, weighted, np.empty_like(weighted))
+
+    def draw(self, frame):
+        # Puts the overlay on frame (in place) and returns it.
+        if not self._rendered:
+            return frame
+        if self.metrics: start = time.perf_counter()
+
+        if self._backgroundBox is not None:
+            x0, y0, x1, y1 = self._backgroundBox
+            region = frame[y0:y1, x0:x1]
+            if region.size:
+                alpha = self.backgroundOpacity
+                shaded = cv2.convertScaleAbs(region, alpha=1 - alpha)
+                region[...] = cv2.add(shaded, tuple(channel * alpha for channel in self.background) + (0,))
+
+        for x0, y0, inverseAlpha, weighted, blended in self._rendered:
+            h, w = weighted.shape[:2]
+            h, w = min(h, frame.shape[0] - y0), min(w, frame.shape[1] - x0)
+                # Clipped to the frame, in case the text runs off the edge.
+            if h > 0 and w > 0:
+                region = frame[y0:y0 + h, x0:x0 + w]
+                blended = cv2.multiply(region, inverseAlpha[:h, :w], dst=blended[:h, :w], scale=1 / 255)
+                region[...] = cv2.add(blended, weighted[:h, :w], dst=blended)
+                    # region is a view with the frame's row stride, which OpenCV doesn't write into in place, hence the copy back.
+
+        if self.metrics: self.metrics.observe("render.hud", start)
+        return frame
+
+
+class DisplayRate:
+    # Tells the display loop when it's time to show a frame again, so it refreshes at most fps times a second however fast
+    # the frames come in. fps=None (or 0) shows every frame.
+
+    def __init__(self, fps=30):
+        self.interval = 1.0 / fps if fps else 0.0
+        self._next = float("-inf")
+        self.shown = 0
+        self.skipped = 0
+
+    def due(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if now < self._next:
+            self.skipped += 1
+            return False
+        self._next = (self._next if now - self._next < self.interval else now) + self.interval
+            # Keeps a steady rhythm, but after a stall starts over from now instead of showing a burst of frames to catch up.
+        self.shown += 1
+        return True
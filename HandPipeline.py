@@ -0,0 +1,267 @@
+import time
+import threading
+import collections
+import numpy as np
+from HandStartup import lazyImport
+
+cv2 = lazyImport("cv2")
+
+
+# Runs camera capture, model inference and whatever consumes the results (drawing, imshow...) on separate threads so
+# the camera wait doesn't add to the inference time and vice versa. The stages are linked by small queues that throw away
+# the OLDEST item when full, so the model always works on the newest frame instead of falling further and further behind.
+#
+# Typical use (see main() in HandRecog.py):
+#   pipeline = HandPipeline(cap, detector.detectHands)
+#   for frame, results in pipeline:
+#       ...draw and show...
+
+
+class LatestQueue:
+    # Bounded queue where put() never blocks: if the queue is full, the oldest item gets dropped to make room.
+    # With dropOldest=False it's a plain blocking queue instead (put waits for room), for sources like video files where every frame counts.
+
+    def __init__(self, maxsize=1, dropOldest=True, onDrop=None):
+        self.maxsize = maxsize
+        self.dropOldest = dropOldest
+        self.onDrop = onDrop
+            # Called with every item that gets dropped, e.g. to give its frame buffer back to a FramePool.
+        self._items = collections.deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+        self.total = 0
+            # total counts every item put in, dropped counts the ones thrown away before anybody got them.
+
+    def put(self, item):
+        with self._condition:
+            while not self.dropOldest and len(self._items) >= self.maxsize and not self._closed:
+                self._condition.wait()
+            if len(self._items) >= self.maxsize:
+                droppedItem = self._items.popleft()
+                self.dropped += 1
+                if self.onDrop is not None:
+                    self.onDrop(droppedItem)
+            self._items.append(item)
+            self.total += 1
+            self._condition.notify_all()
+
+    def get(self, timeout=None):
+        # Returns the next item, or None once the queue is closed and empty (or the timeout runs out).
+        with self._condition:
+            if not self._items and not self._closed:
+                self._condition.wait(timeout)
+            if self._items:
+                item = self._items.popleft()
+                self._condition.notify_all()
+                    # Wakes up a put() waiting for room.
+                return item
+            return None
+
+    def close(self):
+        # Marks the end of the stream. Anything already queued can still be read.
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed and not self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
+class FramePool:
+    # Frame buffers that get reused instead of allocating a new array for every frame. acquire() hands out a free buffer of the
+    # requested shape (allocating one only when none is free) and release() gives it back once nobody uses that frame anymore.
+
+    def __init__(self):
+        self._free = []
+        self._lock = threading.Lock()
+        self.allocated = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        with self._lock:
+            while self._free:
+                buffer = self._free.pop()
+                if buffer.shape == shape and buffer.dtype == dtype:
+                    return buffer
+                    # Otherwise the frame size changed, and the old buffer is simply let go.
+            self.allocated += 1
+        return np.empty(shape, dtype)
+
+    def release(self, buffer):
+        with self._lock:
+            self._free.append(buffer)
+
+
+class ScratchBuffer:
+    # One block of memory reused for a temporary image whose size can change from frame to frame (e.g. the color converted crop
+    # that goes to the model). view() returns a contiguous array of the requested shape on top of it, growing it only when needed.
+
+    def __init__(self, dtype=np.uint8):
+        self._storage = np.empty(0, dtype)
+
+    def view(self, shape):
+        size = int(np.prod(shape))
+        if size > self._storage.size:
+            self._storage = np.empty(size, self._storage.dtype)
+        return self._storage[:size].reshape(shape)
+
+
+class HandPipeline:
+
+    def __init__(self, source, process, captureQueueSize=1, resultQueueSize=2, metrics=None, dropFrames=True, reuseFrames=False):
+        # source: an opened cv2.VideoCapture, or anything cv2.VideoCapture accepts (camera index, video file path).
+        # process: function run on the inference thread for every frame that makes it through, e.g. detector.detectHands.
+        #          Whatever it returns is what the consumer gets. It should not touch state the consumer also reads.
+        # captureQueueSize: frames waiting for the model. 1 means the model only ever sees the newest frame.
+        # resultQueueSize: processed frames waiting for the consumer, oldest ones get dropped if the consumer is slower.
+        # metrics: optional HandMetrics (see HandMetrics.py) to record the camera read time into, as the "capture" stage.
+        # dropFrames: False makes every stage wait for the next one instead of dropping frames, e.g. to go through every frame of a video file.
+        # reuseFrames: read camera frames into a pool of reused buffers instead of a new array every frame (only for cv2.VideoCapture sources).
+        #              A frame (and anything process returned that points into it) is only valid until the consumer reads the next item,
+        #              after that its buffer gets filled with a new frame. So copy what you want to keep.
+
+        if hasattr(source, "read"):
+            self.capture = source
+        else:
+            self.capture = cv2.VideoCapture(source)
+        self.process = process
+        self.metrics = metrics
+
+        self.framePool = FramePool() if reuseFrames and isinstance(self.capture, cv2.VideoCapture) else None
+        self._frameShape = None
+        self._consumedFrame = None
+
+        pooled = self.framePool is not None
+        self.frameQueue = LatestQueue(captureQueueSize, dropFrames, onDrop=self._releaseFrame if pooled else None)
+        self.resultQueue = LatestQueue(resultQueueSize, dropFrames, onDrop=self._releaseResult if pooled else None)
+            # The result queue holds (frame, result) pairs, so the frame's buffer can be given back once the result is done with.
+        self.capturedFrames = 0
+        self.processedFrames = 0
+        self.consumedFrames = 0
+
+        self._captureSize = None
+            # (width, height) the capture thread switches the camera to before its next read, see setCaptureSize.
+        self._stopEvent = threading.Event()
+        self._threads = []
+        self.error = None
+            # If the capture or the process function raises, the exception is saved here and the pipeline shuts down.
+
+    def start(self):
+        if self._threads:
+            return self
+        self._threads = [threading.Thread(target=self._captureLoop, name="HandPipeline-capture", daemon=True),
+                         threading.Thread(target=self._inferenceLoop, name="HandPipeline-inference", daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._stopEvent.set()
+        self.frameQueue.close()
+        self.resultQueue.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self.capture.release()
+
+    def setCaptureSize(self, width, height):
+        # Asks for a different camera resolution (e.g. from HandAutoTune.py). The capture thread makes the change itself before its next read,
+        # so the capture never gets touched from two threads at once.
+        self._captureSize = (width, height)
+
+    def _captureLoop(self):
+        try:
+            while not self._stopEvent.is_set():
+                if self._captureSize is not None:
+                    width, height = self._captureSize
+                    self._captureSize = None
+                    self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                    self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+                if self.metrics: start = time.perf_counter()
+                if self.framePool is not None and self._frameShape is not None:
+                    buffer = self.framePool.acquire(self._frameShape)
+                    ret, frame = self.capture.read(buffer)
+                        # Decodes straight into the reused buffer.
+                    if frame is not buffer:
+                        self.framePool.release(buffer)
+                else:
+                    ret, frame = self.capture.read()
+                if self.metrics: self.metrics.observe("capture", start)
+                if not ret:
+                    break
+                        # End of the video file, or the camera went away.
+                if self.framePool is not None:
+                    self._frameShape = frame.shape
+                        # Only pooled cv2.VideoCapture reads give ndarrays for sure, other sources can hand out anything (e.g. the
+                        # (timestamp, frameIndex, frame) tuples of HandMultiCamera.py).
+                self.capturedFrames += 1
+                self.frameQueue.put(frame)
+        except Exception as error:
+            self.error = error
+                # Closing the frame queue below ends the stream, read() raises the error once the frames already captured are through.
+        finally:
+            self.frameQueue.close()
+
+    def _inferenceLoop(self):
+        try:
+            while not self._stopEvent.is_set():
+                frame = self.frameQueue.get(timeout=0.1)
+                if frame is None:
+                    if self.frameQueue.closed:
+                        break
+                    continue
+                self.resultQueue.put((frame, self.process(frame)))
+                self.processedFrames += 1
+        except Exception as error:
+            self.error = error
+            self._stopEvent.set()
+        finally:
+            self.resultQueue.close()
+
+    def read(self, timeout=None):
+        # Next processed item for the consumer, or None when the stream has ended.
+        while True:
+            item = self.resultQueue.get(timeout=0.1 if timeout is None else timeout)
+            if item is not None:
+                self.consumedFrames += 1
+                frame, result = item
+                if self.framePool is not None:
+                    if self._consumedFrame is not None:
+                        self.framePool.release(self._consumedFrame)
+                            # The consumer has moved on from the previous frame, so its buffer can be filled again.
+                    self._consumedFrame = frame
+                return result
+            if self.resultQueue.closed or timeout is not None:
+                if self.error is not None:
+                    raise self.error
+                return None
+
+    def __iter__(self):
+        self.start()
+        try:
+            while True:
+                item = self.read()
+                if item is None:
+                    return
+                yield item
+        finally:
+            self.stop()
+
+    def _releaseFrame(self, frame):
+        self.framePool.release(frame)
+
+    def _releaseResult(self, item):
+        self.framePool.release(item[0])
+
+    def stats(self):
+        # Per-stage counters: how many frames each stage produced, how many are waiting in its output queue and how many were dropped.
+        return {
+            "capture": {"frames": self.capturedFrames, "queueDepth": len(self.frameQueue), "dropped": self.frameQueue.dropped},
+            "inference": {"frames": self.processedFrames, "queueDepth": len(self.resultQueue), "dropped": self.resultQueue.dropped},
+            "consumer": {"frames": self.consumedFrames},
+            "framesAllocated": self.framePool.allocated if self.framePool is not None else None,
+        }
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+# Landmark prediction for skipping the model on some frames (see the skipFrames option of HandTrackingDynamic).
+# Hands barely move between two consecutive camera frames, so after a model run the next few frames can be predicted by moving every
+# landmark along its recent velocity (a constant velocity filter) instead of running the model again. How many frames get predicted
+# in a row adapts to how fast the hands are moving: a still hand gets predicted for up to maxSkip frames, a fast one gets the model every frame.
+#
+# Everything here works on (H, 21, 3) arrays of mediapipe's normalized landmarks and counts time in frames.
+
+
+class LandmarkPredictor:
+
+    def __init__(self, maxSkip=3, tolerance=0.1, motionThreshold=0.15, smoothing=0.5):
+        self.maxSkip = maxSkip
+            # Most frames predicted in a row before the model has to run again.
+        self.tolerance = tolerance
+            # How far (in hand sizes) the hands may move while being predicted. The number of frames predicted is tolerance / speed.
+        self.motionThreshold = motionThreshold
+            # Speed (hand sizes per frame) above which the model runs every frame.
+        self.smoothing = smoothing
+            # Weight of the newest measured velocity against the previous estimate, 1 = no smoothing.
+        self.predictedFrames = 0
+        self.measuredFrames = 0
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.velocity = None
+        self.handedness = None
+        self.framesSinceMeasurement = 0
+        self.interval = 1
+            # Frames from one model run to the next, 1 = every frame.
+        self.speed = 0.0
+
+    def shouldPredict(self):
+        # True when the next frame can be predicted instead of going through the model.
+        return self.velocity is not None and self.framesSinceMeasurement + 1 < self.interval
+
+    def predict(self):
+        # Landmarks for the next frame, (H, 21, 3).
+        self.framesSinceMeasurement += 1
+        self.predictedFrames += 1
+        return self.position + self.velocity * self.framesSinceMeasurement
+
+    def update(self, normalized, handedness):
+        # Feeds in what the model found on this frame and works out how many of the next frames can be predicted.
+        self.measuredFrames += 1
+        normalized = np.asarray(normalized, dtype=np.float64)
+        handedness = list(handedness)
+
+        if len(normalized) == 0:
+            self.reset()
+            return
+
+        elapsed = self.framesSinceMeasurement + 1
+        if self.position is not None and self.position.shape == normalized.shape and self.handedness == handedness:
+            measuredVelocity = (normalized - self.position) / elapsed
+            if self.velocity is None:
+                self.velocity = measuredVelocity
+            else:
+                self.velocity = self.smoothing * measuredVelocity + (1 - self.smoothing) * self.velocity
+        else:
+            self.velocity = None
+                # New or different hands, there's no velocity to predict with until the next measurement.
+
+        self.position = normalized
+        self.handedness = handedness
+        self.framesSinceMeasurement = 0
+        self.interval = self._interval(normalized)
+
+    def _interval(self, normalized):
+        if self.velocity is None:
+            self.speed = 0.0
+            return 1
+
+        handSize = np.ptp(normalized[..., :2], axis=1).max(axis=-1)
+        movement = np.linalg.norm(self.velocity[..., :2], axis=-1).max(axis=-1)
+        self.speed = float((movement / np.maximum(handSize, 1e-6)).max())
+            # Fastest moving landmark of the fastest hand, in hand sizes per frame, so it means the same whether the hand is near or far.
+
+        if self.speed > self.motionThreshold:
+            return 1
+        if self.speed == 0:
+            return self.maxSkip + 1
+        return int(min(max(self.tolerance / self.speed, 1), self.maxSkip + 1))
@@ -1,12 +1,32 @@
-import cv2
-import mediapipe as mp
 import time
-import math as math
+import argparse
+import copy
+import math
+import numpy as np
+from HandPipeline import HandPipeline, ScratchBuffer
+from HandAsync import HandStream
+from HandState import HandState
+from HandMetrics import HandMetrics, FpsCounter
+from HandPrediction import LandmarkPredictor
+from HandMotion import MotionGate
+from HandGeometry import LANDMARK_COUNT, X, Y_DRAW, normalizedToPixels, landmarkRows, boundingBox, regionOfInterest, pairGeometry, handFeatures, worldFeatures, fingerMask, HAND_MESSAGES
+from HandStartup import lazyImport, recordStartup, printStartupReport
+from HandOverlay import HudOverlay, DisplayRate, MARKER_COLORS, HUD_GREEN, HUD_RED
+from HandAutoTune import AutoTuner
+from HandSession import SessionRecorder
+
+cv2 = lazyImport("cv2")
+mp = lazyImport("mediapipe")
+    # Only actually imported the first time they're used (see HandStartup.py), so the analysis can be imported and used without them.
 
 
 class HandTrackingDynamic:
-    def __init__(self, mode=False, maxHands=2, detectionCon=0.5, trackCon=0.5):     
+    def __init__(self, mode=False, maxHands=2, detectionCon=0.5, trackCon=0.5, landmarkArray=False,
+                 roi=False, roiMargin=0.5, roiMaxSize=None, roiRefresh=30, skipFrames=0, inPlace=False, mirrorLandmarks=False,
+                 motionGate=False, motionThreshold=4.0, motionRefresh=30, modelComplexity=1, maxInputSize=None, inferenceStride=1):     
             # custom constructor made for objects of the HandTrackingDynamic class. The four parameters are attributes which are set to defaults as shown within the parantheses. 
+        self._options = {name: value for name, value in locals().items() if name != "self"}
+            # The constructor arguments, for building trackers set up the same way (see stream). 
         self.__mode__   =  mode                                                     
         self.__maxHands__   =  maxHands                                             
         self.__detectionCon__   =   detectionCon
@@ -16,33 +36,467 @@ class HandTrackingDynamic:
        
         self.tipIds = [4, 8, 12, 16, 20]
             # this attribute serves to tell us which landmarks (out of the 21) are the finger tips. 
-                                                        
-        self.handsMp = mp.solutions.hands
-                # Assigns the hand detection AI model from mediapipe wiht given confidence paramters to attribute handsMp                                         
-        self.hands = self.handsMp.Hands()
-        self.mpDraw= mp.solutions.drawing_utils
-            # these three come from the mediapipe library mostly. As a reminder, the mediapipe library is a pre-trained computer vision AI model. 
+
+        self.landmarkArray = landmarkArray
+            # When True, findAndMark_Positions returns the landmarks as a (21, 5) NumPy array instead of the lmsList list of lists.
+        self._lmsRows = []
+        self._lmsBuffer = np.zeros((LANDMARK_COUNT + 2, 5))
+        self._lmsBufferFilled = False
+        self._handedness = None
+            # The current hand's landmarks are kept as lmsList's [id, cx, cy, cz, cyDraw] rows, which is what the single hand methods below
+            # read (for one hand plain Python beats NumPy). _lmsBuffer is allocated once and only filled from them when someone asks for
+            # an array: lmsArray is a view of its first 21 rows, derivedPoints of the last 2, the centers of mass (ids 21 and 22), kept out of
+            # lmsArray/lmsList but in the same buffer so distances to them can be computed together with the landmarks (see definePairs).
+        self._frameHeight = 0
+        self.results = None
+        self._hands = None
+        self._worldHands = None
+        self.context = HandAnalysisContext(self)
+            # Per-frame cache of everything derived from the landmarks (orientation, rotation, tilt...). 
+        self.metrics = None
+            # Latency/detection telemetry, off unless enableMetrics is called (see HandMetrics.py). 
+
+        self.roi = roi
+        self.roiMargin = roiMargin
+        self.roiMaxSize = roiMaxSize
+        self.roiRefresh = roiRefresh
+            # Region of interest mode: once a hand is found, the model only gets the part of the frame around where the hands were last frame
+            # (roiMargin times the hand size added on every side), downscaled so its longer side is at most roiMaxSize pixels if that's set.
+            # The landmarks get mapped back to full frame coordinates, so nothing else changes. The full frame is searched again when the
+            # hands are lost, and every roiRefresh frames anyway (None = never) so a hand entering somewhere else still gets picked up. 
+            # The crops go through a model of their own (cropHands), the full frames through the usual one. The crop only moves once the hands
+            # get within roiMargin / 2 of its edge (or shrink to less than half of it), so in between the crop model tracks the hand from frame
+            # to frame like the full frame one does, instead of searching the whole crop for a palm every frame. 
+        self._roiBox = None
+        self._roiFramesLeft = 0
+        self.roiStats = {"roiFrames": 0, "fullFrames": 0, "fallbacks": 0}
+            # roiFrames: frames the model only saw the crop, fullFrames: frames it saw everything, fallbacks: crops that lost the hand. 
+
+        self.predictor = LandmarkPredictor(maxSkip=skipFrames) if skipFrames else None
+            # Frame skipping: with skipFrames > 0 the model can be skipped for up to that many frames in a row, with the landmarks predicted
+            # from their recent velocity instead (see HandPrediction.py). The slower the hands move, the more frames get skipped. 
+        self._lastMeasured = None
+        self.predicted = False
+            # True when the current frame's landmarks were predicted rather than found by the model. 
+        self.motionGate = MotionGate(threshold=motionThreshold, refresh=motionRefresh) if motionGate else None
+            # Motion gating: frames that hardly differ from the last one the model ran on (tiny grayscale thumbnails compared, around the
+            # hands and over the whole frame, see HandMotion.py) get the last results again instead of a model run, and the model
+            # runs at least every motionRefresh frames. Mostly for when nobody is in front of the camera, or the hand is held still. 
+        self._lastResults = None
+        self._motionBox = None
+        self.reused = False
+            # True when the current frame's results are the previous frame's, reused because nothing moved (or see inferenceStride). 
+        self.modelComplexity = modelComplexity
+        self.maxInputSize = maxInputSize
+        self.inferenceStride = inferenceStride
+        self._framesUntilModel = 0
+            # modelComplexity: mediapipe's model_complexity, 0 is the lighter, less accurate model. 
+            # maxInputSize: when the whole frame goes to the model, it gets downscaled so its longer side is at most this many pixels first
+            #          (None = full size). Landmarks come back normalized, so nothing else notices. 
+            # inferenceStride: the model (or prediction) only runs on every inferenceStride-th frame, the ones in between reuse its results. 
+            # HandAutoTune.py turns these (and maxHands) at runtime to hold a frame rate, see reconfigure. 
+        self._frameShape = None
+            # Shape of the last frame detectHands got. When it changes (e.g. HandAutoTune.py lowered the camera resolution), everything
+            # carried over from earlier frames is in the old frame's pixels and gets dropped, see _resetTracking. 
+        self.inPlace = inPlace
+        self.mirrorLandmarks = mirrorLandmarks
+            # inPlace: detectHands mirrors the frame it's given in place instead of making a mirrored copy. Only for frames nobody else
+            #          needs unmirrored, e.g. the ones a HandPipeline(reuseFrames=True) reads from the camera. 
+            # mirrorLandmarks: don't mirror the pixels at all, run the model on the frame as it is and mirror the landmarks (and handedness)
+            #          afterwards. Saves the flip when nothing gets displayed, but the frame detectHands returns isn't mirrored then,
+            #          so the landmarks won't line up with it when drawn. The results match the flipped frame's closely, not exactly,
+            #          since the model doesn't see the exact same image. 
+        self._rgbBuffer = ScratchBuffer()
+        self._resizeBuffer = ScratchBuffer()
+            # Reused for the color converted (and downscaled) image that goes to the model, instead of a new one every frame. 
+        self._streams = {}
+            # Running async streams by source (see stream below). 
+
+        self._model = None
+        self._cropModel = None
+        self._firstInference = True
+        self._videoInput = None
+            # Shape of the image the (video mode) model got last, None when its last image wasn't a full frame. Its tracking only carries
+            # over to the next full frame if that's the same geometry, otherwise it gets reset first (see detectHands). 
+        self._cropInput = None
+            # Same for the crop model: the crop box and shape it got last. 
+        self._videoTracking = False
+        self._cropTracking = False
+            # Whether each model found hands in its last image, i.e. has anything to carry over at all. A model that isn't tracking
+            # anything doesn't need a reset, which restarts its whole graph (~25 ms). 
+            # The mediapipe model (hands below) is only built the first time it's needed, or by warmUp. 
+
+    @property
+    def handsMp(self):
+        return mp.solutions.hands
+                # The hand detection AI model from mediapipe, the hands property below builds it with the given confidence parameters.
+
+    @property
+    def mpDraw(self):
+        return mp.solutions.drawing_utils
+            # these come from the mediapipe library mostly. As a reminder, the mediapipe library is a pre-trained computer vision AI model. 
+
+    @property
+    def hands(self):
+        if self._model is None:
+            handsMp = self.handsMp
+                # Imports mediapipe if it isn't yet, which gets timed on its own. 
+            start = time.perf_counter()
+            self._model = handsMp.Hands(static_image_mode=self.__mode__, max_num_hands=self.__maxHands__, model_complexity=self.modelComplexity,
+                                             min_detection_confidence=self.__detectionCon__, min_tracking_confidence=self.__trackCon__)
+            recordStartup("model", time.perf_counter() - start)
+                # Building the mediapipe graph takes a while, so it's recorded in the startup report (see HandStartup.py). 
+        return self._model
+
+    @hands.setter
+    def hands(self, model):
+        self._model = model
+
+    @property
+    def cropHands(self):
+        # The model the ROI crops go through (see roi), built the first time a crop needs it. A model of its own because a video mode
+        # model carries its hand tracking from call to call in the previous image's coordinates: the full frames and the crops would
+        # keep throwing each other's off. It gets reset whenever the crop box moves (see _detectInRegionOfInterest). 
+        if self._cropModel is None:
+            handsMp = self.handsMp
+            start = time.perf_counter()
+            self._cropModel = handsMp.Hands(static_image_mode=self.__mode__, max_num_hands=self.__maxHands__, model_complexity=self.modelComplexity,
+                                                 min_detection_confidence=self.__detectionCon__, min_tracking_confidence=self.__trackCon__)
+            recordStartup("cropModel", time.perf_counter() - start)
+        return self._cropModel
+
+    @cropHands.setter
+    def cropHands(self, model):
+        self._cropModel = model
+
+    def reconfigure(self, maxHands=None, modelComplexity=None):
+        # Changes the settings the model gets built with. The current model is closed and a new one gets built on the next frame. 
+        if maxHands is not None:
+            self.__maxHands__ = maxHands
+        if modelComplexity is not None:
+            self.modelComplexity = modelComplexity
+        for model in (self._model, self._cropModel):
+            if model is not None and hasattr(model, "close"):
+                model.close()
+        self._model = None
+        self._cropModel = None
+        self._videoInput = None
+        self._cropInput = None
+        self._videoTracking = self._cropTracking = False
+        self._lastResults = None
+            # Don't hand out the old model's results in place of the new one's. 
+
+    @property
+    def maxHands(self):
+        return self.__maxHands__
+
+    def warmUp(self, frameShape=(480, 640), iterations=2):
+        # Builds the model and runs it on a blank frame of frameShape (height, width) a few times, so the first real frame doesn't pay for
+        # setting everything up. Call it right at startup, before the camera frames start coming in. Returns the tracker. 
+        start = time.perf_counter()
+        frame = np.zeros(tuple(frameShape) + (3,), dtype=np.uint8)
+        for _ in range(iterations):
+            self._runModel(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgbBuffer.view(frame.shape)))
+        if hasattr(self.hands, "reset"):
+            self.hands.reset()
+        if self.roi:
+            self.cropHands.process(self._rgbBuffer.view((96, 96, 3)))
+                # The crop model too, it's a graph of its own. 
+        recordStartup("warmUp", time.perf_counter() - start)
+        return self
+
+    def _runModel(self, imgRGB):
+        if self._firstInference:
+            model = self.hands
+            start = time.perf_counter()
+            results = model.process(imgRGB)
+            recordStartup("firstInference", time.perf_counter() - start)
+            self._firstInference = False
+            return results
+        return (self._model if self._model is not None else self.hands).process(imgRGB)
+            # The model may have been closed for a rebuild (see reconfigure). 
 
     # A quick note about the coordinate system: (0,0) is intially located at the TOP RIGHT of the screen and the x and y values respectively get higher as go to the left and down. 
     # Not sure why the coordinate system is like this, it just is. 
     # The flip function applied to the frame in the drawHandLandmarks method below flips the x axis. 
     # For consistenty and convenience, we will also flip the y axis below to make (0,0 the bottom left)
 
-    def processAndCorrectView(self, frame): 
+    def enableMetrics(self, metrics=None):
+        # Turns on the instrumentation hooks and returns the HandMetrics object they record into (a new one unless you pass your own). 
+        self.metrics = metrics if metrics is not None else HandMetrics()
+        return self.metrics
 
-        frame = cv2.flip(frame, 1)
-            #flips frame to match user's hands.
+    def disableMetrics(self):
+        self.metrics = None
+
+    def processAndCorrectView(self, frame): 
 
-        imgRGB = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(imgRGB)
-            # Changes color scheme, runs the model on the image.
-            # Reasoning for this color switch is that mediapipe uses RGB while cv2 operates on BGR, so you need to change it.
+        frame, results = self.detectHands(frame)
+        self.loadResults(results)
         
         return frame
+
+    def detectHands(self, frame):
+        # Same as processAndCorrectView, but hands the results back instead of storing them on the tracker. 
+        # This is the part that can safely run on another thread (see HandPipeline.py), since it doesn't touch anything the analysis methods read. 
+
+        metrics = self.metrics
+        if metrics: start = time.perf_counter()
+
+        if not self.mirrorLandmarks:
+            frame = cv2.flip(frame, 1, dst=frame if self.inPlace else None)
+                #flips frame to match user's hands.
+            if metrics: start = metrics.observe("flip", start)
+
+        if frame.shape != self._frameShape:
+            if self._frameShape is not None:
+                self._resetTracking()
+            self._frameShape = frame.shape
+
+        if self._framesUntilModel > 0 and self._lastResults is not None:
+            self._framesUntilModel -= 1
+            return frame, self._lastResults
+                # In between two inferenceStride frames. 
+        self._framesUntilModel = self.inferenceStride - 1
+
+        if self.motionGate is not None:
+            if not self.motionGate.shouldRun(frame, self._motionBox) and self._lastResults is not None:
+                if metrics: metrics.observe("motionGate", start)
+                return frame, self._lastResults
+                    # Nothing moved, the last results (and everything worked out from them) still hold. 
+            if metrics: start = metrics.observe("motionGate", start)
+
+        if self.predictor is not None and self.predictor.shouldPredict():
+            results = PredictedResults(self._lastMeasured, self.predictor.predict())
+            normalized = extractHands(results)[0]
+            if self.roi:
+                self._updateRegionOfInterest(normalized, frame)
+                    # Keep the crop following the hand, so it's still in the right place when the model runs again. 
+            if self.motionGate is not None:
+                self._updateMotionGate(normalized, frame)
+            if metrics: metrics.observe("predict", start)
+            self._lastResults = results
+            return frame, results
+
+        results = None
+        if self.roi:
+            results = self._detectInRegionOfInterest(frame)
+                # None when there was no crop to use or the hand got lost in it, then the whole frame gets searched as usual. 
+            if results is None and metrics: start = time.perf_counter()
+
+        if results is None:
+            modelInput = frame
+            if self.maxInputSize and max(frame.shape[:2]) > self.maxInputSize:
+                scale = self.maxInputSize / max(frame.shape[:2])
+                scaledWidth, scaledHeight = max(1, round(frame.shape[1] * scale)), max(1, round(frame.shape[0] * scale))
+                modelInput = cv2.resize(frame, (scaledWidth, scaledHeight), dst=self._resizeBuffer.view((scaledHeight, scaledWidth, 3)),
+                                        interpolation=cv2.INTER_AREA)
+            imgRGB = cv2.cvtColor(modelInput, cv2.COLOR_BGR2RGB, dst=self._rgbBuffer.view(modelInput.shape))
+            if metrics: start = metrics.observe("cvtColor", start)
+            if imgRGB.shape != self._videoInput and self._videoTracking and hasattr(self._model, "reset"):
+                self._model.reset()
+                    # The last image was a crop, or a different size: the tracking the model carried over would be in the wrong place. 
+            self._videoInput = imgRGB.shape
+            results = self._runModel(imgRGB)
+            self._videoTracking = bool(results.multi_hand_landmarks)
+            if metrics: metrics.observe("model", start)
+                # Changes color scheme, runs the model on the image.
+                # Reasoning for this color switch is that mediapipe uses RGB while cv2 operates on BGR, so you need to change it.
+            if self.roi:
+                self.roiStats["fullFrames"] += 1
+                self._roiFramesLeft = self.roiRefresh
+
+        if self.mirrorLandmarks:
+            mirrorResults(results)
+
+        if self.roi or self.predictor is not None or self.motionGate is not None:
+            normalized, handedness = extractHands(results)
+            if self.roi:
+                self._updateRegionOfInterest(normalized, frame)
+            if self.predictor is not None:
+                self.predictor.update(normalized, handedness)
+                self._lastMeasured = results
+            if self.motionGate is not None:
+                self._updateMotionGate(normalized, frame)
+
+        self._lastResults = results
+        return frame, results
+
+    def _detectInRegionOfInterest(self, frame):
+        # Runs the model on the crop around last frame's hands. Returns the results (in full frame coordinates), or None if the full frame
+        # should be searched instead. 
+        if self._roiBox is None or (self.roiRefresh is not None and self._roiFramesLeft <= 0):
+            return None
+        metrics = self.metrics
+        if metrics: start = time.perf_counter()
+
+        h, w = frame.shape[:2]
+        x0, y0, x1, y1 = self._roiBox
+        x0, y0, x1, y1 = max(0, x0), max(0, y0), min(w, x1), min(h, y1)
+        if x1 <= x0 or y1 <= y0:
+            self._roiBox = None
+            return None
+                # Clamped to the frame, in case the box came from a bigger one. 
+        crop = frame[y0:y1, x0:x1]
+            # A view, nothing gets copied until the color conversion, which now only touches the crop. 
+        cropWidth, cropHeight = x1 - x0, y1 - y0
+        if self.roiMaxSize and max(cropWidth, cropHeight) > self.roiMaxSize:
+            scale = self.roiMaxSize / max(cropWidth, cropHeight)
+            scaledWidth, scaledHeight = max(1, round(cropWidth * scale)), max(1, round(cropHeight * scale))
+            crop = cv2.resize(crop, (scaledWidth, scaledHeight), dst=self._resizeBuffer.view((scaledHeight, scaledWidth, 3)), interpolation=cv2.INTER_AREA)
+                # The hand model works on small images anyway, so a big crop can be shrunk without losing anything. Landmarks come back
+                # normalized to the crop, so the scale doesn't matter for mapping them back. 
+        imgRGB = cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=self._rgbBuffer.view(crop.shape))
+        if metrics: start = metrics.observe("cvtColor", start)
+        cropInput = ((x0, y0, x1, y1), imgRGB.shape)
+        if cropInput != self._cropInput and self._cropTracking and hasattr(self.cropHands, "reset"):
+            self.cropHands.reset()
+                # The crop moved: the hand the model was tracking isn't where it thinks any more, it has to look for the palm again. 
+        self._cropInput = cropInput
+        results = self.cropHands.process(imgRGB)
+        self._cropTracking = bool(results.multi_hand_landmarks)
+        self._videoInput = None
+        if metrics: metrics.observe("model.roi", start)
+
+        if not results.multi_hand_landmarks:
+            self._roiBox = None
+            self.roiStats["fallbacks"] += 1
+            return None
+
+        remapResults(results, x0, y0, cropWidth, cropHeight, w, h)
+        self.roiStats["roiFrames"] += 1
+        self._roiFramesLeft -= 1
+        return results
+
+    def _resetTracking(self):
+        # Forgets everything detectHands carried over from earlier frames (crop box, motion reference, prediction, the model's own tracking). 
+        self._roiBox = None
+        self._motionBox = None
+        if self.motionGate is not None:
+            self.motionGate.reset()
+        if self.predictor is not None:
+            self.predictor.reset()
+        self._lastMeasured = None
+        self._lastResults = None
+        self._framesUntilModel = 0
+        self._videoInput = None
+        self._cropInput = None
+            # The models get reset before their next image, if they were tracking anything. 
+
+    def _updateRegionOfInterest(self, normalized, frame):
+        box = self._frameBox(normalized, frame, self.roiMargin)
+        if box is not None and self._roiBox is not None:
+            inner = self._frameBox(normalized, frame, self.roiMargin / 2, minSize=0)
+            x0, y0, x1, y1 = self._roiBox
+            if inner is not None and inner[0] >= x0 and inner[1] >= y0 and inner[2] <= x1 and inner[3] <= y1 and 2 * (box[2] - box[0]) > x1 - x0:
+                return
+                    # Still well inside the current crop, which stays where it is so the crop model can keep tracking (see roi). 
+        self._roiBox = box
+
+    def _updateMotionGate(self, normalized, frame):
+        self._motionBox = self._frameBox(normalized, frame, 0.25, minSize=0)
+            # The area the gate watches closest, the hands plus a bit around them. 
+
+    def _frameBox(self, normalized, frame, margin, minSize=96):
+        # Pixel box (regionOfInterest) around the hands in the frame the model gets. 
+        h, w = frame.shape[:2]
+        if self.mirrorLandmarks:
+            normalized = normalized.copy()
+            normalized[..., 0] = 1 - normalized[..., 0]
+                # The landmarks are mirrored but the frame the model sees isn't. 
+        return regionOfInterest(normalized, w, h, margin, minSize)
+
+    async def stream(self, source=0, queueSize=2, includeFrame=True):
+        # asyncio version of the main loop: `async for result in detector.stream(0):` gets one dict per processed frame,
+        # {"timestamp", "frameIndex", "frame", "hands" (the analyze() list), "predicted"}, without ever blocking the event loop.
+        # Calling it again with the same source while it's running adds another subscriber to the same capture and model.
+        # A subscriber that falls behind loses its oldest results (it keeps at most queueSize). See HandAsync.py. 
+        # Every source gets a tracker (and model) of its own, set up like this one, since everything the tracker carries from frame to frame
+        # (the model's own tracking, the ROI crop, prediction, motion gate...) only makes sense for one camera. This tracker itself is left alone. 
+        stream = self._streams.get(source)
+        if stream is None:
+            stream = self._streams[source] = HandStream(self._streamTracker(), source, includeFrame, self._streams)
+                # Only registered once the stream actually gets iterated, a stream() nobody iterates doesn't start or keep anything. 
+        results = stream.subscribe(queueSize)
+        try:
+            async for result in results:
+                yield result
+        finally:
+            await results.aclose()
+
+    def _streamTracker(self):
+        tracker = HandTrackingDynamic(**self._options)
+        tracker.metrics = self.metrics
+        return tracker
+
+    def loadResults(self, results):
+        # Makes results (from detectHands) the current frame's results for all the drawing/analysis methods below. 
+        self.reused = results is not None and results is self._results
+        if not self.reused:
+            self.results = results
+            self.predicted = isinstance(results, PredictedResults)
+            self._clearPositions()
+                # The same results again (see motionGate) keep the landmark arrays already stacked from them. 
+        self.context.invalidate()
+        if self.metrics:
+            self.metrics.recordDetection(len(results.multi_hand_landmarks) if results is not None and results.multi_hand_landmarks else 0)
+
+    @property
+    def results(self):
+        return self._results
+
+    @results.setter
+    def results(self, results):
+        self._results = results
+        self._hands = None
+        self._worldHands = None
+            # New results, so the landmark arrays stacked from the old ones are out of date. 
+
+    def loadLandmarks(self, normalized, handedness=None, world=None):
+        # Same as loadResults, but from landmark arrays instead of mediapipe's results, e.g. a recorded session (see HandRecording.py). 
+        # normalized: (H, 21, 3) mediapipe 0-1 coordinates, handedness: H "Left"/"Right" labels, world: optional (H, 21, 3) metric landmarks.
+        # Everything except drawHandLandmarks (which needs mediapipe's own objects) works the same after this. 
+        self.results = None
+        self.predicted = False
+            # Setting results clears the stacked landmarks, so set them right after. 
+        self._hands = (np.asarray(normalized, dtype=np.float64).reshape(-1, LANDMARK_COUNT, 3),
+                       list(handedness) if handedness is not None else ["Right"] * len(normalized))
+        self._worldHands = np.asarray(world, dtype=np.float64).reshape(-1, LANDMARK_COUNT, 3) if world is not None else None
+        self._clearPositions()
+        self.context.invalidate()
+        if self.metrics:
+            self.metrics.recordDetection(len(self._hands[0]))
+
+    def _clearPositions(self):
+        self._lmsRows = []
+        self._lmsBufferFilled = False
+            # The pixel landmarks belong to the previous frame, findAndMark_Positions fills them in again for this one.
+
+    def _requireHand(self):
+        # The find methods below all work on the hand findAndMark_Positions found. Without one they'd read whatever the last hand left
+        # in the landmark buffer, so they raise instead, like indexing the empty lmsList always did.
+        if not self._lmsRows:
+            raise IndexError("No hand landmarks for the current frame, findAndMark_Positions didn't find a hand")
+
+    def stackHands(self):
+        # (normalized, handedness) for every hand in the current frame: a (H, 21, 3) array of mediapipe's 0-1 coordinates and a list of
+        # H "Left"/"Right" labels. Read out of the results once per frame and then reused. 
+        if self._hands is None:
+            if self.metrics: start = time.perf_counter()
+            self._hands = extractHands(self.results)
+            if self.metrics: self.metrics.observe("landmarks", start)
+        return self._hands
+
+    def stackWorldLandmarks(self):
+        # (H, 21, 3) array of the metric world landmarks (multi_hand_world_landmarks) of every hand in the current frame. 
+        if self._worldHands is None:
+            self._worldHands = extractWorldLandmarks(self.results)
+        return self._worldHands
     
     def drawHandLandmarks(self, frame, draw=True):  
+        if self.metrics: start = time.perf_counter()
         
-        if self.results.multi_hand_landmarks: 
+        if self.results is not None and self.results.multi_hand_landmarks: 
             # if there is a hand on screen, then...
             for handLms in self.results.multi_hand_landmarks:
                 # for each each set of landmark lists corresponding to each detected hand...
@@ -50,98 +504,231 @@ class HandTrackingDynamic:
                     self.mpDraw.draw_landmarks(frame, handLms,self.handsMp.HAND_CONNECTIONS)
                     # draw the red dots at each knuckle/wrist detected and interconnecting white lines.
 
+        if self.metrics: self.metrics.observe("render.landmarks", start)
         return frame
 
     def findAndMark_Positions( self, frame, handNo=0, draw=True):
-        xList = []
-        yList = []
-        zList = []
         bbox =  []
-        self.lmsList = []
-
-        if self.results.multi_hand_landmarks:
-            myHand = self.results.multi_hand_landmarks[handNo]
-                # because the handNo parameter is set to 0 by default, this variable refers to ONLY the first hand detected
-            for id, lm in enumerate(myHand.landmark):
-                # for each landmark on the detected hand...
-                h, w, c = frame.shape
-                    # the .shape method from the mediapipe library assigns the height and width of the screen, in pixels. c is color channel. 
-                
-                z = lm.z
-                zScaled = z * 10 * -1
-                #Scales the Z value so that it falls roughly within the 0-1 range as opposed to whatever arbitary value it uses now. 
-                # If these values continue to be unpredicatable and you keep needing to adjust coefficients, use some pre-built mapping function. 
-                
-                def clamp(z, zMin, zMax):
-                    return max(min(zMax, z), zMin)
-                #Prevents z value from going outside of a set range, 0 to 1 in this case. 
-                
-                cz = (2 * w) - (clamp(zScaled, 0, 1) * (2 * w))
-                #sets cz to pixel values by first ensuring the 0 - 1 range and then multiplying by twice the width of the screen, which is approximately the max distance from the screen the hand will relistically move away. 
-                #Also makes it such that cz increases with distance from the camera instead of decreasing. 
-                #Unlike cx and cy (below), cz is very much relative. Z will increase/decrease based on comparison to position of other landmarks, even if objective z location didnt change. 
-
-                cx, cy = int(lm.x * w), int(lm.y * h)
-                    # the raxnge of the coordinate values of each landmark gets converted into the possible range of pixel values instead of the arbitrary 0-1 range. 
-
-                xList.append(cx)
-                yList.append(cy)
-                zList.append(cz)
-
-                cyDraw = cy
-                #Defines seperate y coordinates specifically for drawing because the flip applied below flips the orientation of drawings if used as is.
-
-                cy = int((1 - lm.y) * h) 
-                #Flips the y axis to go from bottom to top as described earlier, causing (0,0) to be at the bottom right.
-                self.lmsList.append([id, cx, cy, cz, cyDraw])
-
-                
-                if draw:
-                    # As shown in paramater declaration above, by default, draw = true. 
-                    cv2.circle(frame,  (cx, cyDraw), 5, (255, 0, 255), cv2.FILLED)
-                        # Draw purple circles on each landmark, overtop the normal red ones.
-                
+        self._clearPositions()
+        self.context.invalidate()
+            # Forget the previous frame's landmarks and everything derived from them. The list view gets rebuilt from the array only if someone asks for it.
+
+        if self.metrics: start = time.perf_counter()
+        hand, handedness = self._selectHand(handNo)
+
+        if hand is not None:
+            self._handedness = handedness
+            h, w = frameSize(frame)
+                # the height and width of the screen, in pixels.
+            self._frameHeight = h
+
+            self._lmsRows = landmarkRows(hand, w, h)
+                # Converts the 21 landmarks to pixel values: x and y get scaled to the screen, z gets scaled/clamped to a pixel-ish distance
+                # and y gets flipped so (0,0) is at the bottom. cyDraw keeps the unflipped y for drawing.
+                # See normalizedToPixels in HandGeometry.py for the details of each conversion.
+
+            xList = [row[1] for row in self._lmsRows]
+            yList = [row[4] for row in self._lmsRows]
             xmin, xmax = min(xList), max(xList)
             ymin, ymax = min(yList), max(yList)
             bbox = xmin, ymin, xmax, ymax
-                #No need to flip values in xList and yList for rectangle, works as is. 
+                #No need to flip values for rectangle, works as is.
+            if self.metrics: start = self.metrics.observe("positions", start)
 
-                #print( "Hands Keypoint")
-                #print(bbox)
             if draw:
+                # As shown in paramater declaration above, by default, draw = true.
+                for _, cx, _, _, cyDraw in self._lmsRows:
+                    cv2.circle(frame,  (cx, cyDraw), 5, (255, 0, 255), cv2.FILLED)
+                        # Draw purple circles on each landmark, overtop the normal red ones.
                 cv2.rectangle(frame, (xmin - 20, ymin - 20), (xmax + 20, ymax + 20), (0, 200 , 0), 2)
-                # draw a green rectangle that is 20 pixels larger than the hand in all four directions. 
-                
+                # draw a green rectangle that is 20 pixels larger than the hand in all four directions.
+                if self.metrics: self.metrics.observe("render.positions", start)
 
+        if self.landmarkArray:
+            return (self.lmsArray if self._lmsRows else self._lmsBuffer[:0]), bbox
+                # Note this is a view of the preallocated buffer, it gets overwritten on the next frame. Copy it if you need to keep it.
         return self.lmsList, bbox
+
+    def _selectHand(self, handNo):
+        # (landmarks, handedness) of hand handNo, the landmarks as (x, y, z) tuples, or (None, None) when there's no such hand.
+        # Read straight from mediapipe's results when the hands haven't been stacked into an array anyway (findAndMark_Positions only
+        # needs the one hand), otherwise from the stacked arrays (stackHands, or loadLandmarks which has no results).
+        if self._hands is None and self.results is not None:
+            detectedHands = self.results.multi_hand_landmarks or []
+            if handNo >= len(detectedHands):
+                return None, None
+            multiHandedness = self.results.multi_handedness or []
+            handedness = multiHandedness[handNo].classification[0].label if handNo < len(multiHandedness) else None
+            return [(lm.x, lm.y, lm.z) for lm in detectedHands[handNo].landmark], handedness
+                # because the handNo parameter is set to 0 by default, this refers to ONLY the first hand detected
+
+        normalizedHands, handedness = self.stackHands()
+        if handNo >= len(normalizedHands):
+            return None, None
+        return normalizedHands[handNo].tolist(), handedness[handNo] if handNo < len(handedness) else None
     
+    def findAllHands(self, frame):
+        # Multi-hand mode: analyzes every detected hand at once instead of just multi_hand_landmarks[handNo].
+        # All hands get stacked into one array and everything findOrientation, findRotation, findTilt, findAndMarkCenterOfMass and
+        # findFingersOpen compute is done for all of them in one vectorized pass (handFeatures in HandGeometry.py). 
+        # Returns a dict of arrays with one entry per hand along the first axis (see handFeatures for the keys), plus:
+        #   normalized (H, 21, 3): mediapipe's 0-1 landmark coordinates
+        #   landmarks (H, 21, 5):  pixel rows like lmsArray
+        #   handedness (H):        "Left" or "Right" for each hand, from multi_handedness
+        #   predicted:             True if the landmarks were predicted instead of found by the model this frame (see skipFrames)
+        # Nothing gets drawn and the single hand state (lmsArray, lmsList...) isn't touched. frame can also just be its (height, width).
+
+        h, w = frameSize(frame)
+        normalized, handedness = self.stackHands()
+        landmarks = normalizedToPixels(normalized, w, h)
+
+        features = handFeatures(landmarks, h)
+        features["normalized"] = normalized
+        features["landmarks"] = landmarks
+        features["handedness"] = handedness
+        features["predicted"] = self.predicted
+
+        return features
+
+    def findAllHandsWorld(self):
+        # Metric version of findAllHands: the same features, but worked out in 3D from mediapipe's world landmarks (meters) instead of the
+        # pixel landmarks (worldFeatures in HandGeometry.py). Nothing depends on the frame size, so the results stay the same at any
+        # capture/model resolution and no frame is needed. Returns a dict of arrays with one entry per hand (see worldFeatures for the keys), plus:
+        #   world (H, 21, 3):  the world landmarks
+        #   handedness (H), predicted: same as findAllHands
+        # On predicted frames (see skipFrames) the world landmarks are the last measured ones, so these values hold still until the next model run.
+
+        world = self.stackWorldLandmarks()
+        _, handedness = self.stackHands()
+        handedness = handedness[:len(world)]
+
+        features = worldFeatures(world, handedness)
+        features["world"] = world
+        features["handedness"] = handedness
+        features["predicted"] = self.predicted
+
+        return features
+
+    def analyze(self, frame):
+        # Headless analysis: everything about every detected hand, with no drawing at all. frame is only used for its size and is never modified. 
+        # Returns a list with one dict per hand:
+        #   handedness, landmarks ((21, 5) pixel rows like lmsArray), normalized ((21, 3) mediapipe coordinates), bbox,
+        #   handIsUpright, thumbOnLeft, rotation, forwardTilt, sidewaysTilt, centerOfMassWithFingers, centerOfMassNoFingers,
+        #   fingers, handMsg, handIsClosed, predicted (True when the landmarks were predicted, see skipFrames)
+        # The values are the same ones the find methods return. Use annotate() to draw a result when you do want to see it.
+
+        features = self.findAllHands(frame)
+        hands = []
+
+        for handNo, handedness in enumerate(features["handedness"]):
+            landmarks = features["landmarks"][handNo]
+            hands.append({
+                "handedness": handedness,
+                "landmarks": landmarks,
+                "normalized": features["normalized"][handNo],
+                "bbox": boundingBox(landmarks),
+                "handIsUpright": bool(features["handIsUpright"][handNo]),
+                "thumbOnLeft": bool(features["thumbOnLeft"][handNo]),
+                "rotation": float(features["rotation"][handNo]),
+                "forwardTilt": float(features["forwardTilt"][handNo]),
+                "sidewaysTilt": float(features["sidewaysTilt"][handNo]),
+                "centerOfMassWithFingers": features["centerOfMassWithFingers"][handNo].astype(int).tolist(),
+                "centerOfMassNoFingers": features["centerOfMassNoFingers"][handNo].astype(int).tolist(),
+                "fingers": features["fingers"][handNo].tolist(),
+                "handMsg": HAND_MESSAGES[features["handState"][handNo]],
+                "handIsClosed": bool(features["handIsClosed"][handNo]),
+                "predicted": features["predicted"],
+            })
+
+        return hands
+
+    def annotate(self, frame, hands):
+        # Optional drawing stage for the results of analyze(). Draws the same things the find methods draw (skeleton, purple landmark dots,
+        # bounding box, orientation/rotation/tilt markers and the centers of mass) for every hand, straight from the results. 
+        if self.metrics: start = time.perf_counter()
+
+        for hand in hands:
+            landmarks = hand["landmarks"]
+            points = landmarks[:, [X, Y_DRAW]].astype(int).tolist()
+
+            for a, b in self.handsMp.HAND_CONNECTIONS:
+                cv2.line(frame, points[a], points[b], (224, 224, 224), 2)
+            for point in points:
+                cv2.circle(frame, point, 5, (255, 0, 255), cv2.FILLED)
+                # Skeleton in the same colors drawHandLandmarks uses, then the purple dots from findAndMark_Positions on top. 
+
+            xmin, ymin, xmax, ymax = hand["bbox"]
+            cv2.rectangle(frame, (xmin - 20, ymin - 20), (xmax + 20, ymax + 20), (0, 200 , 0), 2)
+
+            frame = self.drawMarkers(0, self.tipIds[2] - 3, "green", frame, landmarks=landmarks)
+            frame = self.drawMarkers(0, self.tipIds[0] - 3, "green", frame, landmarks=landmarks)
+            frame = self.drawMarkers(self.tipIds[1] - 3, self.tipIds[4] - 3, "red", frame, landmarks=landmarks)
+            frame = self.drawMarkers(0, self.tipIds[2] - 2, "blue", frame, landmarks=landmarks)
+                # Orientation (green), rotation (red) and tilt (blue) markers, same as markOrientation, findRotation and findTilt. 
+
+            centerOfMassWithFingers, centerOfMassNoFingers = hand["centerOfMassWithFingers"], hand["centerOfMassNoFingers"]
+            cv2.circle(frame, (centerOfMassWithFingers[1], centerOfMassWithFingers[4]), 5, (255,255,0), cv2.FILLED)
+            cv2.circle(frame, (centerOfMassNoFingers[1], centerOfMassNoFingers[4]), 5, (0,255,255), cv2.FILLED)
+
+        if self.metrics: self.metrics.observe("render.annotate", start)
+        return frame
 
-    def drawMarkers(self, p1, p2, color, frame, r=5, t=3):
-
-        if color == "red":
-            lineColor = (74,26,200)
-            dotColor = (37,13,100)
-        elif color == "green": 
-            lineColor = (50,200,50)
-            dotColor = (25,120,25)
-        elif color == "blue": 
-            lineColor = (200,74,26)
-            dotColor = (100,37,13)
-        elif color == "magenta":
-            lineColor = (200,50,200)
-            dotColor = (100,25,100)
-        elif color == "cyan":
-            lineColor = (255,255,0)
-            dotColor = (125,125,0)
-        elif color == "yellow":
-            lineColor = (0,255,255)
-            dotColor = (0,125,125)
-
-        x1, x2 = self.lmsList[p1][1], self.lmsList[p2][1]
+    @property
+    def lmsList(self):
+        # The current hand's landmarks as a list of lists ([id, cx, cy, cz, cyDraw] per landmark), empty when there's no hand.
+        return self._lmsRows
+
+    @property
+    def lmsArray(self):
+        # The same landmarks as a (21, 5) view of the preallocated buffer, filled from lmsList the first time it's asked for each frame.
+        self._fillBuffer()
+        return self._lmsBuffer[:LANDMARK_COUNT]
+
+    @property
+    def derivedPoints(self):
+        # The centers of mass (ids 21 and 22) as a (2, 5) view of the same buffer, right after the landmarks. Worked out for the current
+        # frame when they haven't been yet, so they never belong to an earlier one.
+        self._lmsBuffer[LANDMARK_COUNT:] = self.context.centerOfMass
+        return self._lmsBuffer[LANDMARK_COUNT:]
+
+    def _fillBuffer(self, ids=()):
+        # The landmark buffer, filled for the current frame. If any of ids is a center of mass (21, 22), those rows get filled in too.
+        if not self._lmsBufferFilled and self._lmsRows:
+            self._lmsBuffer[:LANDMARK_COUNT] = self._lmsRows
+            self._lmsBufferFilled = True
+        if any(id >= LANDMARK_COUNT for id in ids):
+            self._lmsBuffer[LANDMARK_COUNT:] = self.context.centerOfMass
+        return self._lmsBuffer
+
+    def _distanceXY(self, p1, p2):
+        # Just the XY distance of defineDistanceAndOrientation, for the callers that need nothing else.
+        first, second = self._row(p1), self._row(p2)
+        return math.hypot(second[1] - first[1], second[2] - first[2])
+
+    def _row(self, p):
+        # Row p of the current hand as [id, cx, cy, cz, cyDraw]: a landmark, or one of the centers of mass (21 and 22), which get worked out
+        # for this frame the first time they're needed instead of being read from wherever the last frame left them.
+        if p >= LANDMARK_COUNT:
+            return self.context.centerOfMass[p - LANDMARK_COUNT]
+        return self._lmsRows[p]
+
+    def drawMarkers(self, p1, p2, color, frame, r=5, t=3, landmarks=None):
+            # landmarks: optional (N, 5) landmark array to draw from (e.g. a hand from analyze()), defaults to the current frame's landmarks.
+        if landmarks is None:
+            self._requireHand()
+            first, second = self._row(p1), self._row(p2)
+        else:
+            first, second = landmarks[p1].tolist(), landmarks[p2].tolist()
+        if self.metrics: start = time.perf_counter()
+
+        lineColor, dotColor = MARKER_COLORS[color]
+            # Bright line color and darker dot color, see HandOverlay.py. 
+
+        x1, x2 = int(first[1]), int(second[1])
             #Assigns the x coords of the first and second target landmart to x1 and x2, respectively.
         xMid = (x1+x2)//2  
 
-        y1Draw, y2Draw = self.lmsList[p1][4], self.lmsList[p2][4]
+        y1Draw, y2Draw = int(first[4]), int(second[4])
         yMidDraw = (y1Draw + y2Draw)//2
 
         cv2.line(frame,(x1, y1Draw),(x2, y2Draw) ,(lineColor), t)
@@ -152,15 +739,18 @@ class HandTrackingDynamic:
             # Draws dark colored circles on each target landmark + midpoint. Made midpoint circle smaller. 
             # 74,26,200 is a bright rose red color in case you want to use that.
 
+        if self.metrics: self.metrics.observe("render.markers", start)
         return frame
 
 
     def defineDistanceAndOrientation(self, p1, p2):
-         
-        x1 , y1, z1 = self.lmsList[p1][1:4]
+        self._requireHand()
+        x1 , y1, z1 = self._row(p1)[1:4]
             #Assigns the x and y coords of the first target landmart to x1 and y1. 
-        x2, y2, z2 = self.lmsList[p2][1:4]
+        x2, y2, z2 = self._row(p2)[1:4]
             #Assigns the x and y coords of the second  target landmart to x2 and y2. 
+            # Plain math on purpose: for one pair it's several times faster than setting up pairGeometry's arrays (HandGeometry.py), which
+            # gives the same values. For many pairs (or many hands) at once use definePairs or pairGeometry instead.
         xDist, yDist, zDist = (x2-x1), (y2-y1), (z2-z1)
             #assigns the difference between x and y coords to xDist and yDist, respectively. 
         xMid , yMid, zMid = (x1+x2)//2 , (y1 + y2)//2, (z1 + z2)//2
@@ -188,8 +778,6 @@ class HandTrackingDynamic:
         uprightnessZY = math.sin(angleZY)
             #Takes the sine of this angle to determine how upright the chosen section is. 
         
-        #print(xDist, yDist, angle, uprightnessXY) 
-        
         return  [absoluteDistXY, absoluteDistXZ, absoluteDistZY, absoluteDist3D], \
                 [horizontalnessXY, horizontalnessXZ, horizontalnessZY], \
                 [uprightnessXY,uprightnessXZ,uprightnessZY], \
@@ -197,11 +785,23 @@ class HandTrackingDynamic:
                     #Explicit line breaks used to condense return statement. 
                     #Might need to create a graphic for XY, XZ and ZY at some point. 
 
+    def definePairs(self, pairs):
+        # Batched version of defineDistanceAndOrientation: pairs is a list of (p1, p2) tuples and the result is the four pairGeometry arrays,
+        # with one row per pair in the same order. Worth it for many pairs, for one or two defineDistanceAndOrientation is cheaper. 
+        self._requireHand()
+        firstIds, secondIds = zip(*pairs)
+
+        return pairGeometry(self._fillBuffer(firstIds + secondIds), list(firstIds), list(secondIds))
+
     def findOrientation(self):
+        return self.context.orientation
+            # Cached for the current frame, see HandAnalysisContext below. 
+
+    def _computeOrientation(self):
 
         _, handHorizontalOrientation, _, _ = self.defineDistanceAndOrientation(self.tipIds[0] - 3, 0)
+        handHorizontalOrientationXY = handHorizontalOrientation[0]
                 # Measures the horizontalnessXY from the first landmark along the thumb to the wrist. 
-        handHorizontalOrientationXY = handHorizontalOrientation[0]    
 
         if handHorizontalOrientationXY > 0: 
             thumbOnLeft = True
@@ -210,8 +810,8 @@ class HandTrackingDynamic:
             #This if statement solves the issue of not being able to distinguish between left and right hand being up as well as if a hand is flipped. 
 
         _, _, handVerticalOrientation, _ = self.defineDistanceAndOrientation(0, self.tipIds[2] - 3)
-            # Measures the verticality from the wrist to the first knuckle of the middle finger. 
         handVerticalOrientationXY = handVerticalOrientation[0]
+            # Measures the verticality from the wrist to the first knuckle of the middle finger. 
 
         if handVerticalOrientationXY > 0: 
             handIsUpright = True
@@ -230,14 +830,25 @@ class HandTrackingDynamic:
         return frame 
     
 
-    def findRotation(self, frame): 
-        pointerBaseKnuckleZ, pinkieBaseKnuckleZ, WristZ = self.lmsList[self.tipIds[1] - 3][3], self.lmsList[self.tipIds[4] - 3][3], self.lmsList[0][3]
+    def findRotation(self, frame=None): 
+        rotation, maxPalmLength = self.context.rotation
+        if frame is not None:
+            frame = self.drawMarkers(self.tipIds[1] - 3, self.tipIds[4] - 3, "red", frame)
+                # Drawing is optional, leave frame out to just get the numbers. Same for findTilt and findAndMarkCenterOfMass below. 
+
+        return rotation, maxPalmLength
 
+    def _computePalmLength(self):
         palmLength, _, _, _ = self.defineDistanceAndOrientation(self.tipIds[1] - 3, self.tipIds[4] - 3)
-        palmLengthXY = palmLength[0]
+            # XY distance between the pointer and pinkie base knuckles.
+        return palmLength[0]
+
+    def _computeRotation(self): 
+        pointerBaseKnuckleZ, pinkieBaseKnuckleZ, WristZ = self._lmsRows[self.tipIds[1] - 3][3], self._lmsRows[self.tipIds[4] - 3][3], self._lmsRows[0][3]
+
+        palmLengthXY = self.context.palmLength
             # Retrieves information about z coords of target knuckles as well as distance in between.
         _, thumbOnLeft = self.findOrientation()
-        frame = self.drawMarkers(self.tipIds[1] - 3, self.tipIds[4] - 3, "red", frame)
 
         bufferAndScalingFactor = 0.05
             #A value from 0-1 which determines how much the hand needs to be rotated from the starting position to activate rotation tracking and also how senstive the rotation is past this buffer point.
@@ -282,8 +893,15 @@ class HandTrackingDynamic:
         return rotation, maxPalmLength
     
 
-    def findTilt(self, frame):
-        wristZ, middleFingerSecondKnuckleZ = self.lmsList[0][3], self.lmsList[self.tipIds[2] - 2][3]
+    def findTilt(self, frame=None):
+        forwardTilt, sidewaysTilt = self.context.tilt
+        if frame is not None:
+            frame = self.drawMarkers(0, self.tipIds[2] - 2, "blue", frame)
+
+        return forwardTilt, sidewaysTilt
+
+    def _computeTilt(self):
+        wristZ, middleFingerSecondKnuckleZ = self._lmsRows[0][3], self._lmsRows[self.tipIds[2] - 2][3]
         wristToMiddleFingerSecondKnuckleDist, wristToMiddleFingerSecondKnuckleHortizontalness, _, _ = self.defineDistanceAndOrientation(0, 9)
             # Measures horizontalness from the wrist to the first landmark along the pointer finger.
             # Very similar approach to calculating rotation. 
@@ -356,130 +974,102 @@ class HandTrackingDynamic:
             #Clamps sidewaysTilt to be in the 0 - 1 range. 
         sidewaysTilt = round(sidewaysTilt, 4)
 
-        frame = self.drawMarkers(0, self.tipIds[2] - 2, "blue", frame)
-
         return forwardTilt, sidewaysTilt
 
 
-    def findAndMarkCenterOfMass(self, frame):
+    def findAndMarkCenterOfMass(self, frame=None):
+        centerOfMassWithFingers, centerOfMassNoFingers = self.context.centerOfMass
+
+        if frame is not None:
+            if self.metrics: start = time.perf_counter()
+            frame = cv2.circle(frame, (centerOfMassWithFingers[1], centerOfMassWithFingers[4]), 5, (255,255,0), cv2.FILLED)
+            frame = cv2.circle(frame, (centerOfMassNoFingers[1], centerOfMassNoFingers[4]), 5, (0,255,255), cv2.FILLED)
+            if self.metrics: self.metrics.observe("render.centerOfMass", start)
+
+        return centerOfMassWithFingers, centerOfMassNoFingers
+
+    def _computeCenterOfMass(self):
         
-        def avgDimension(targetList,targetDimension):
-            targetValues = []
-            sum = 0
-            average = 0
-            
-            for i, _ in enumerate(targetList):
-                if targetDimension == "x":
-                    targetValues.append(targetList[i][1])
-                elif targetDimension == "y":
-                    targetValues.append(targetList[i][2])
-                elif targetDimension == "z":
-                    targetValues.append(targetList[i][3])
-
-            for i, _ in enumerate(targetValues):
-                sum += targetValues[i]
-            
-            average = int(sum/len(targetValues))
-                
-            return average
+        def avgDimension(targetRows, targetColumn):
+            return int(sum(row[targetColumn] for row in targetRows)/len(targetRows))
+                # Python's sum adds the values in the same order as the old loop did, so the truncated average is identical. 
     
-        lastIDofLmsList = len(self.lmsList) - 1
-        nextLmsListIDAvailable = lastIDofLmsList + 1
+        nextLmsListIDAvailable = LANDMARK_COUNT
         #Identifies the next id available in the lmsList.
 
-        h, _, _ = frame.shape
+        h = self._frameHeight
         
-        centerOfMassWithFingersX = avgDimension(self.lmsList, "x")
+        centerOfMassWithFingersX = avgDimension(self._lmsRows, 1)
             #Average of x components for ALL landmarks.
-        centerOfMassWithFingersY = avgDimension(self.lmsList, "y")
+        centerOfMassWithFingersY = avgDimension(self._lmsRows, 2)
             #Average of Y components for ALL landmarks.
-        centerOfMassWithFingersZ = avgDimension(self.lmsList, "z")
+        centerOfMassWithFingersZ = avgDimension(self._lmsRows, 3)
             #Average of z components for ALL landmarks.
         centerOfMassWithFingersYDraw = (h - centerOfMassWithFingersY)
         centerOfMassWithFingers = [nextLmsListIDAvailable, centerOfMassWithFingersX, centerOfMassWithFingersY, centerOfMassWithFingersZ, centerOfMassWithFingersYDraw]
 
-        baseKnuckleList = self.lmsList[1:17:4]
-        baseKnuckleList.append(self.lmsList[0])
-        completeNoFingersList = baseKnuckleList
+        completeNoFingersList = self._lmsRows[1:17:4] + [self._lmsRows[0]]
+            # All base knuckles followed by the wrist.
 
-        centerOfMassNoFingersX = avgDimension(completeNoFingersList, "x")
+        centerOfMassNoFingersX = avgDimension(completeNoFingersList, 1)
             #Average of X components for all base knuckle landmarks and wrist.
-        centerOfMassNoFingersY = avgDimension(completeNoFingersList, "y")
+        centerOfMassNoFingersY = avgDimension(completeNoFingersList, 2)
             #Average of Y components for all base knuckle landmarks and wrist.
-        centerOfMassNoFingersZ = avgDimension(completeNoFingersList, "z")
+        centerOfMassNoFingersZ = avgDimension(completeNoFingersList, 3)
             #Average of Z components for all base knuckle landmarks and wrist.
         centerOfMassNoFingersYDraw = (h - centerOfMassNoFingersY)
         centerOfMassNoFingers = [nextLmsListIDAvailable + 1, centerOfMassNoFingersX, centerOfMassNoFingersY, centerOfMassNoFingersZ, centerOfMassNoFingersYDraw]
-        
-        self.lmsList.append(centerOfMassWithFingers)
-        self.lmsList.append(centerOfMassNoFingers)
-
-        frame = cv2.circle(frame, (centerOfMassWithFingersX, centerOfMassWithFingersYDraw), 5, (255,255,0), cv2.FILLED)
-        frame = cv2.circle(frame, (centerOfMassNoFingersX, centerOfMassNoFingersYDraw), 5, (0,255,255), cv2.FILLED)
-
-            #Adds the centers of mass to the lmsList as landmarks with ID 21 and 22.
-
-
-
-                #cy = int((1 - lm.y) * h) 
-                #cyDraw = cy
-                #Defines seperate y coordinates specifically for drawing because the flip applied below flips the orientation of drawings if used as is.
-
-                
-                #Flips the y axis to go from bottom to top as described earlier, causing (0,0) to be at the bottom right.
-                #self.lmsList.append([id, cx, cy, cz, cyDraw])
+            # The centers of mass are ID 21 and 22 (see _row and derivedPoints), next to the landmarks but not part of lmsArray/lmsList.
 
         return centerOfMassWithFingers, centerOfMassNoFingers
 
 
     def findFingersOpen(self):
-        fingers=[]
+        return self.context.fingersOpen
+
+    def _computeFingersOpen(self):
+        self.context.centerOfMass
+            # The finger checks compare against the centers of mass (rows 21 and 22), so make sure they exist for this frame. 
         handIsUpright, _ = self.findOrientation()
-        wristZ, middleFingerBaseKnuckleZ = self.lmsList[0][3], self.lmsList[self.tipIds[2] - 3][3]
+        wristZ, middleFingerBaseKnuckleZ = self._lmsRows[0][3], self._lmsRows[self.tipIds[2] - 3][3]
        
+        centerIds = []
+        tipIds = []
+        comparisonIds = []
+            # Every center of mass / finger pair this method needs gets collected first, then the ten XY distances are computed together. 
+
         if handIsUpright:
-            centerOfMassttoThumbTipDistance, _ , _ , _ = self.defineDistanceAndOrientation(22, self.tipIds[0])
-            centerOfMassttoThumbComparisonKnuckleDistance, _ , _ , _ = self.defineDistanceAndOrientation(22, self.tipIds[0] - 2)
+            centerIds.append(22)
+            comparisonIds.append(self.tipIds[0] - 2)
                 #When hand is upright, use center of mass with fingers as the point of comparison. 
-
         else: 
-            centerOfMassttoThumbTipDistance, _ , _ , _ = self.defineDistanceAndOrientation(21, self.tipIds[0])
-            centerOfMassttoThumbComparisonKnuckleDistance, _ , _ , _ = self.defineDistanceAndOrientation(21, self.tipIds[0] - 1)    
+            centerIds.append(21)
+            comparisonIds.append(self.tipIds[0] - 1)
                 #When the hand isn't upright, the detection works better when the point of comparison is center of mass without fingers. 
-
-        centerOfMassttoThumbTipDistanceXY = abs(centerOfMassttoThumbTipDistance[0])
-                #measures XY distance from center of mass to finger tip. 
-        centerOfMassttoThumbComparisonKnuckleDistanceXY = abs(centerOfMassttoThumbComparisonKnuckleDistance[0])
-                #measures XY distance from center of mass to landmark 1 step below thumb tip.
-            
-        if centerOfMassttoThumbComparisonKnuckleDistanceXY > centerOfMassttoThumbTipDistanceXY:
-                #The moment the finger tip to center of mass distance is smaller than the center of mass to second knuckle distance, finger is closed. 
-            fingers.append(0)
-        else:
-            fingers.append(1)
+        tipIds.append(self.tipIds[0])
 
         for id, _ in enumerate(self.tipIds[1:5]):
             id += 1
                 #accounts for count starting at 0 instead of 1. 
             if (handIsUpright and middleFingerBaseKnuckleZ > wristZ) or not(handIsUpright):
-                centerOfMassttoFingerTipDistance, _ , _ , _ = self.defineDistanceAndOrientation(22, self.tipIds[id])
-                centerOfMassttoFingerComparisonKnuckleDistance, _ , _ , _ = self.defineDistanceAndOrientation(22, self.tipIds[id] - 2)
+                centerIds.append(22)
+                comparisonIds.append(self.tipIds[id] - 2)
                     #When hand is upright and not forwared tilted OR downright, use center of mass (without fingers) VS. second knuckles as the point of comparison. 
             else: 
-                centerOfMassttoFingerTipDistance, _ , _ , _ = self.defineDistanceAndOrientation(21, self.tipIds[id])
-                centerOfMassttoFingerComparisonKnuckleDistance, _ , _ , _ = self.defineDistanceAndOrientation(21, self.tipIds[id]  - 3)    
+                centerIds.append(21)
+                comparisonIds.append(self.tipIds[id] - 3)
                     #When the hand is upright and tilted forard, the detection works better when the point of comparison is center of mass (with fingers) VS. base kunckles. 
+            tipIds.append(self.tipIds[id])
 
-            centerOfMassttoFingerTipDistanceXY = abs(centerOfMassttoFingerTipDistance[0])
-                    #measures XY distance from center of mass to finger tip. 
-            centerOfMassttoFingerComparisonKnuckleDistanceXY = abs(centerOfMassttoFingerComparisonKnuckleDistance[0])
-                    #measures XY distance from center of mass to landmark 1 step below thumb tip.
-             
-            if centerOfMassttoFingerComparisonKnuckleDistanceXY > centerOfMassttoFingerTipDistanceXY:
-                    #The moment the finger tip to center of mass distance is smaller than the center of mass to second knuckle distance, finger is closed. 
-                fingers.append(0)
-            else:
-                fingers.append(1)
+        distancesXY = [self._distanceXY(centerId, pointId) for centerId, pointId in zip(centerIds + centerIds, tipIds + comparisonIds)]
+        centerOfMassttoFingerTipDistanceXY = distancesXY[:5]
+                #measures XY distance from center of mass to each finger tip. 
+        centerOfMassttoFingerComparisonKnuckleDistanceXY = distancesXY[5:]
+                #measures XY distance from center of mass to the comparison knuckle of each finger.
+
+        fingers = [0 if comparisonDistance > tipDistance else 1
+                   for tipDistance, comparisonDistance in zip(centerOfMassttoFingerTipDistanceXY, centerOfMassttoFingerComparisonKnuckleDistanceXY)]
+                #The moment the finger tip to center of mass distance is smaller than the center of mass to comparison knuckle distance, finger is closed (0). 
     
         if sum(fingers[1:5]) == 0:
             handisClosed = True
@@ -499,27 +1089,164 @@ class HandTrackingDynamic:
         return fingers, handMsg, handisClosed
 
     def completeInfo(self):
-        landmarkCoordinates = self.lmsList
-        centerOfMassWithFingers, centerOfMassNoFingers = self.findAndMarkCenterOfMass()
-        handIsUpright, thumbOnLeft = self.findOrientation()
-        rotation, _ = self.findRotation()
-        forwardTilt, sidewaysTilt = self.findTilt()
-        fingers, handMsg, handisClosed = self.findFingersOpen()
-
-        return landmarkCoordinates, centerOfMassWithFingers, centerOfMassNoFingers, handIsUpright, thumbOnLeft, rotation, forwardTilt, sidewaysTilt, fingers, handMsg, handisClosed
+        # Everything about the current hand as a HandState (see HandState.py): named fields, landmarks and centers of mass as views of the
+        # landmark buffer, fingers as a bitmask. HandState.astuple() gives the old 11-tuple if you still need it. 
+        self.context.centerOfMass
+        handIsUpright, thumbOnLeft = self.context.orientation
+        rotation, _ = self.context.rotation
+        forwardTilt, sidewaysTilt = self.context.tilt
+        fingers, handMsg, _ = self.context.fingersOpen
+            # Reads straight from the per-frame cache, so nothing gets recomputed (or drawn) if the find methods already ran this frame. 
+
+        return HandState(self.lmsArray, self.derivedPoints, self._handedness, handIsUpright, thumbOnLeft, rotation, forwardTilt, sidewaysTilt,
+                         int(fingerMask(fingers)), HAND_MESSAGES.index(handMsg), self.predicted)
     
 
+def frameSize(frame):
+    # (height, width) of a frame, or of a (height, width[, channels]) shape tuple for when there's no actual image (headless/replay). 
+    shape = frame.shape if hasattr(frame, "shape") else frame
+    return shape[0], shape[1]
+
+
+def extractHands(results):
+    # Pulls every detected hand out of mediapipe's results: a (H, 21, 3) array of normalized landmarks and a list of H handedness labels. 
+    detectedHands = results.multi_hand_landmarks if results is not None and results.multi_hand_landmarks else []
+    normalized = np.array([[(lm.x, lm.y, lm.z) for lm in hand.landmark] for hand in detectedHands], dtype=np.float64)
+    handedness = [hand.classification[0].label for hand in results.multi_handedness] if detectedHands and results.multi_handedness else []
+
+    return normalized.reshape(len(detectedHands), LANDMARK_COUNT, 3), handedness
+
+
+def remapResults(results, x0, y0, cropWidth, cropHeight, frameWidth, frameHeight):
+    # Moves the landmarks in mediapipe's results from coordinates normalized to a crop (starting at pixel x0, y0) to coordinates normalized
+    # to the full frame, in place. z is on the same scale as x, so it gets scaled like x. World landmarks don't depend on the image and stay as they are. 
+    for handLms in results.multi_hand_landmarks:
+        for lm in handLms.landmark:
+            lm.x = (lm.x * cropWidth + x0) / frameWidth
+            lm.y = (lm.y * cropHeight + y0) / frameHeight
+            lm.z = lm.z * cropWidth / frameWidth
+
+
+def mirrorResults(results):
+    # Mirrors mediapipe's results horizontally in place, to what they'd be for the flipped frame: x becomes 1 - x (world x changes sign)
+    # and Left/Right get swapped. 
+    if not results.multi_hand_landmarks:
+        return
+    for handLms in results.multi_hand_landmarks:
+        for lm in handLms.landmark:
+            lm.x = 1 - lm.x
+    for handLms in results.multi_hand_world_landmarks or []:
+        for lm in handLms.landmark:
+            lm.x = -lm.x
+    for handedness in results.multi_handedness or []:
+        for classification in handedness.classification:
+            classification.label = MIRRORED_HANDEDNESS.get(classification.label, classification.label)
+            classification.index = 1 - classification.index
+
+
+MIRRORED_HANDEDNESS = {"Left": "Right", "Right": "Left"}
+
+
+class PredictedResults:
+    # Stands in for mediapipe's results on frames where the landmarks were predicted (see HandPrediction.py) instead of found by the model.
+    # Built from a copy of the last real results with the landmark coordinates replaced, so everything that reads results
+    # (drawHandLandmarks included) works the same. Handedness and world landmarks are the last measured ones. 
+    predicted = True
+
+    def __init__(self, measured, normalized):
+        self.multi_hand_landmarks = copy.deepcopy(measured.multi_hand_landmarks)
+        self.multi_handedness = measured.multi_handedness
+        self.multi_hand_world_landmarks = measured.multi_hand_world_landmarks
+        for handLms, points in zip(self.multi_hand_landmarks, normalized.tolist()):
+            for lm, (x, y, z) in zip(handLms.landmark, points):
+                lm.x, lm.y, lm.z = x, y, z
+
+
+def extractWorldLandmarks(results):
+    # (H, 21, 3) array of the metric world landmarks (in meters, centered on the hand) from mediapipe's results. 
+    worldHands = results.multi_hand_world_landmarks if results is not None and results.multi_hand_world_landmarks else []
+    world = np.array([[(lm.x, lm.y, lm.z) for lm in hand.landmark] for hand in worldHands], dtype=np.float64)
+
+    return world.reshape(len(worldHands), LANDMARK_COUNT, 3)
+
+
+class HandAnalysisContext:
+    # Lazily computes and caches the values derived from the current frame's landmarks. 
+    # findRotation, findTilt and findFingersOpen all need the orientation, and completeInfo asks for it again, so without this
+    # the same math got redone several times per frame. Now each value is computed the first time it's read and reused until
+    # the tracker moves on to a new frame (processAndCorrectView or findAndMark_Positions call invalidate). 
+    # Values that nobody reads are never computed. 
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+        self._values = {}
+
+    def invalidate(self):
+        self._values.clear()
+
+    def _lazy(self, name, compute):
+        if name not in self._values:
+            self.tracker._requireHand()
+            metrics = self.tracker.metrics
+            if metrics: start = time.perf_counter()
+            self._values[name] = compute()
+            if metrics: metrics.observe("feature." + name, start)
+                # Note nested values (e.g. rotation needs orientation) include the time of whatever they computed first. 
+        return self._values[name]
+
+    @property
+    def orientation(self):
+        return self._lazy("orientation", self.tracker._computeOrientation)
+            # (handIsUpright, thumbOnLeft)
+
+    @property
+    def palmLength(self):
+        return self._lazy("palmLength", self.tracker._computePalmLength)
+
+    @property
+    def centerOfMass(self):
+        return self._lazy("centerOfMass", self.tracker._computeCenterOfMass)
+            # (centerOfMassWithFingers, centerOfMassNoFingers)
+
+    @property
+    def rotation(self):
+        return self._lazy("rotation", self.tracker._computeRotation)
+            # (rotation, maxPalmLength)
+
+    @property
+    def tilt(self):
+        return self._lazy("tilt", self.tracker._computeTilt)
+            # (forwardTilt, sidewaysTilt)
+
+    @property
+    def fingersOpen(self):
+        return self._lazy("fingersOpen", self.tracker._computeFingersOpen)
+            # (fingers, handMsg, handisClosed)
+
+
 def main():
+        parser = argparse.ArgumentParser(description="Hand tracking demo on the first camera. The speed-ups below are all off unless asked for.")
+        parser.add_argument("record", nargs="?", default=None, help="video file to record the window to, the landmarks go in a .hands file next to it")
+        parser.add_argument("--roi", action="store_true", help="once a hand is found, only run the model on the part of the frame around it")
+        parser.add_argument("--roi-max-size", type=int, default=480, help="longest side the ROI crop gets scaled down to (with --roi)")
+        parser.add_argument("--skip-frames", type=int, default=0, help="while the hand moves slowly, predict up to this many frames in a row instead of running the model")
+        parser.add_argument("--reuse-frames", action="store_true", help="read camera frames into reused buffers and mirror them in place")
+        parser.add_argument("--motion-gate", action="store_true", help="reuse the last results while nothing in front of the camera moves")
+        parser.add_argument("--auto-tune", type=int, default=None, metavar="FPS", help="lower the model's cost (input size, complexity, hands, stride, camera resolution) as needed to hold this frame rate")
+        args = parser.parse_args()
         
-        ctime = 0
-        ptime = 0
-        #Setting values for important variables for later. 
+        fpsCounter = FpsCounter()
+        #Frame rate averaged over the last 30 frames, see HandMetrics.py. 
 
         cap = cv2.VideoCapture(0)
         #Takes video input from the first deteted camera. 
         
-        detector = HandTrackingDynamic()
+        detector = HandTrackingDynamic(landmarkArray=True, roi=args.roi, roiMaxSize=args.roi_max_size if args.roi else None,
+                                       skipFrames=args.skip_frames, inPlace=args.reuse_frames, motionGate=args.motion_gate)
             # This declares detector to be an object of the HandTrackingDyanmic class, which gives it access to all the functions (methods) above.
+            # --roi: once a hand is found, only the part of the 1080p frame around it goes through the model (see the constructor).
+            # --skip-frames: while the hand moves slowly, up to that many frames in a row get predicted instead of running the model.
+            # --motion-gate: while nothing in front of the camera moves (or nobody is there), the last results get reused instead. 
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
 
@@ -527,67 +1254,86 @@ def main():
             print("Cannot open camera")
             exit()
 
-        while True:
-            ret, frame = cap.read()
-                #take camera input
-
-            frame = detector.processAndCorrectView(frame)
-                #process camera input and flip view
-            frame = detector.drawHandLandmarks(frame)
-                #draw intial landmark drawings
-            lmsList = detector.findAndMark_Positions(frame)
-                #Determine pixel positions and do secondary landmark drawing.
-
-            ctime = time.time()
-            fps = 1/(ctime-ptime)
-            ptime = ctime
-                #ctime is the time at which the loop was last ran. ptime stores the previous ctime. 
-                #Hence, the FPS actually refers to how often landmark (knuckle) locations are calculated per second. 
+        detector.warmUp((1080, 1920))
+        printStartupReport()
+            # Gets the model ready before the first camera frame, and shows where the startup time went. 
+
+        tuner = None
+        if args.auto_tune:
+            tuner = AutoTuner(detector, targetFps=args.auto_tune, minInputSize=320, maxStride=2, captureSizes=[(1920, 1080), (1280, 720), (640, 480)])
+                # Holds the frame rate on whatever machine this runs on: when the frames take too long, the model input gets smaller, then the model
+                # lighter, then fewer hands, then the model skips every other frame, then the camera resolution goes down (and back up when
+                # there's time to spare). Every change gets printed, see HandAutoTune.py. 
+
+        pipeline = HandPipeline(cap, tuner.detectHands if tuner is not None else detector.detectHands, metrics=detector.metrics, reuseFrames=args.reuse_frames)
+            # Camera input and the model (flip view + hand detection) run on their own threads, see HandPipeline.py. 
+            # This loop only gets the newest processed frame, so a slow camera no longer adds to the model's time and vice versa. 
+            # With --reuse-frames, frames are read into reused buffers and mirrored in place (inPlace above), so nothing gets allocated per frame. 
+        if tuner is not None:
+            tuner.capture = pipeline
+                # Camera resolution changes go through the pipeline's capture thread. 
+
+        hud = HudOverlay(metrics=detector.metrics)
+            # The text in the corner only gets re-rendered when what it says changes, and then copied onto the frame, see HandOverlay.py. 
+        display = DisplayRate(30)
+            # The window refreshes at most 30 times a second. Tracking keeps running on every frame in between, drawing only happens for the ones that get shown. 
+        recorder = SessionRecorder(args.record, fps=30, metrics=detector.metrics) if args.record else None
+            # python HandRecog.py session.mp4 records what the window shows, plus the landmarks in session.hands next to it (see HandSession.py). 
+            # The encoding runs on its own thread, when it can't keep up frames get dropped from the recording rather than slowing the tracking down. 
+
+        for frame, results in pipeline:
+            detector.loadResults(results)
+                #use this frame's model results for everything below
+            hands = detector.analyze(frame)
+                #Every value the find methods work out (rotation, tilt, fingers...) for every hand, without drawing anything. 
+
+            fps = fpsCounter.tick()
+                #Averaged over a window of frames instead of just the time since the last one, so the number doesn't jump around every frame. 
+                #The FPS actually refers to how often landmark (knuckle) locations are calculated per second. 
+
+            if not display.due():
+                continue
+                #Not time to refresh the window yet, go straight on to the next frame. 
+
+            frame = detector.annotate(frame, hands)
+                #Skeleton, landmark dots, bounding box, orientation/rotation/tilt markers and centers of mass. 
 
             fontSize = 1.2
             fontThickness = 2
 
-            cv2.putText(frame, ("FPS: " + str(int(fps))), (5,30), cv2.FONT_HERSHEY_PLAIN, fontSize, (0,255,0), fontThickness)
-                #On screen FPS counter. Second argument is text to be displayed, third is location and the rest is font/color/formatting.
-
-            if len(lmsList[0]) != 0:
-                # This if statement is necessary because without it, the program kills itself when your hand isn't on screen lol. 
-                frame = detector.markOrientation(frame)
-                rotation, _ = detector.findRotation(frame)
-                forwardTilt, sidewaysTilt = detector.findTilt(frame)
-                centerOfMassWithFingers, centerOfMassNoFingers = detector.findAndMarkCenterOfMass(frame)
-                fingers, handMsg, _ = detector.findFingersOpen()
-
-                #print(detector.lmsList[0][3]*5e5)
-                #print("Fingers Open: ", fingers, (sum(fingers[0:5])), "  ", verticalDistance, handHorizontalOrientation, handVerticalOrientation, horizontalDistance, maxDistance, rotation)
-                    # Output finger states and other info to console
-                
-                cv2.putText(frame, ("Fingers Open: " + str(fingers) + " " + str(sum(fingers[0:5])) + "  Hand is " + handMsg), (5,60), cv2.FONT_HERSHEY_PLAIN, fontSize, (0,255,0), fontThickness)
-                    #On-screen hand status. 
-                cv2.putText(frame, ("Rotation: " + str(rotation)), (5,90), cv2.FONT_HERSHEY_PLAIN, fontSize, (0,255,0), fontThickness)
-                cv2.putText(frame, ("Forward Tilt: " + str(forwardTilt) + "  Sideways Tilt:" + str(sidewaysTilt)), (5,120), cv2.FONT_HERSHEY_PLAIN, fontSize, (0,255,0), fontThickness)
-                cv2.putText(frame, ("Center of Mass:"), (5,160), cv2.FONT_HERSHEY_PLAIN, fontSize, (0,255,0), fontThickness)
-                cv2.putText(frame, ("  With Fingers: " + str(centerOfMassWithFingers[1:])), (5,190), cv2.FONT_HERSHEY_PLAIN, fontSize, (0,255,0), fontThickness)
-                cv2.putText(frame, ("  Without Fingers: " + str(centerOfMassNoFingers[1:])), (5,220), cv2.FONT_HERSHEY_PLAIN, fontSize, (0,255,0), fontThickness)
-
+            lines = [("FPS: " + str(int(fps)), (5,30), HUD_GREEN, fontSize, fontThickness)]
+                #On screen FPS counter. Text to be displayed, location, color, font size and thickness (same as putText takes them). 
+
+            if hands:
+                hand = hands[0]
+                fingers = hand["fingers"]
+                lines += [
+                    ("Fingers Open: " + str(fingers) + " " + str(sum(fingers[0:5])) + "  Hand is " + hand["handMsg"], (5,60), HUD_GREEN, fontSize, fontThickness),
+                        #On-screen hand status. 
+                    ("Rotation: {:.2f}".format(hand["rotation"]), (5,90), HUD_GREEN, fontSize, fontThickness),
+                    ("Forward Tilt: {:.2f}  Sideways Tilt: {:.2f}".format(hand["forwardTilt"], hand["sidewaysTilt"]), (5,120), HUD_GREEN, fontSize, fontThickness),
+                        #Rounded to 2 decimals, all the digits after that just flicker and make the text re-render every frame. 
+                    ("Center of Mass:", (5,160), HUD_GREEN, fontSize, fontThickness),
+                    ("  With Fingers: " + str(hand["centerOfMassWithFingers"][1:]), (5,190), HUD_GREEN, fontSize, fontThickness),
+                    ("  Without Fingers: " + str(hand["centerOfMassNoFingers"][1:]), (5,220), HUD_GREEN, fontSize, fontThickness),
+                ]
             else: 
-                cv2.putText(frame, ("Awaiting Hand..."), (5,70), cv2.FONT_HERSHEY_PLAIN, 2, (74,26,255), 2)
-                    #On screen FPS counter. Second argument is text to be displayed, third is location and the rest is font/color/formatting.
-            
-            #if len(lmsList)!=0:
-                #print(lmsList[0])
-                    #This is a print used for debugging, commenented out for now.  
+                lines.append(("Awaiting Hand...", (5,70), HUD_RED, 2, 2))
+
+            hud.update(lines)
+            cv2.imshow('Hand Movement Interpreter', hud.draw(frame))
+                #Opens a window with the name Hand Movement Interpreter and displays the result of running the above code on the camera input. 
+            if recorder is not None:
+                recorder.record(frame, *detector.stackHands())
 
             if cv2.waitKey(1) == ord('x'):
                 break
                     #break condition: if x is pressed, stops loop
- 
-            #gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                #Creates a greyscale version of the camera output. It doesn't get used. 
-            
-           
-            cv2.imshow('Hand Movement Interpreter', frame)
-                #Opens a window with the name Hand Movement Interpreter and displays the result of running the above code on the camera input. 
+
+        if recorder is not None:
+            recorder.close()
+            print(recorder.stats())
+                #Writes out the frames still waiting for the encoder, then shows how many got dropped and how far behind the encoder was. 
 
 if __name__ == "__main__":
             main()
@@ -1,5 +1,6 @@
 import mediapipe as mp
 import cv2
+from HandPipeline import HandPipeline, ScratchBuffer
 
 mp_drawing = mp.solutions.drawing_utils
 mp_hands = mp.solutions.hands
@@ -7,18 +8,22 @@ mp_hands = mp.solutions.hands
 capture = cv2.VideoCapture(0)
     # note to self: find out if there's a feature in the cv2 library that detects the amount of cameras.
     # Maybe everything from here down can be placed into a for loop that iterates with each camera input? 
+    # (HandMultiCamera.py does this now: one process per camera, see discoverCameras there for finding them.)
+
+rgb_buffer = ScratchBuffer()
+
+def detect(frame):
+    image = cv2.flip(frame, 1, dst=frame)
+    detected_image = hands.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=rgb_buffer.view(image.shape)))
+    # orients the camera input (in place, the pipeline's frame buffers get reused), changes color scheme into a reused buffer, runs the model on the image.
+    # Reasoning for this color switch is that mediapipe uses RGB while cv2 operates on BGR, so you need to change it temporarily. 
+    # The BGR frame is kept for display, so there's no need to convert the RGB copy back. 
+    return image, detected_image
 
 with mp_hands.Hands(min_detection_confidence=0.8, min_tracking_confidence=0.5) as hands: 
     # Assigns the hand detection AI model from mediapipe wiht given confidence paramters to keyword hands. 
-    while capture.isOpened():
-        ret, frame = capture.read()
-        # assigns ret to the boolean of whether or not cam is recoding and frame to the actual image data
-        frame = cv2.flip(frame, 1)
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        detected_image = hands.process(image)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        # orients the camera input, changes color scheme, runs the model on the image, reverse color scheme change.
-        # Reasoning for this color switch is that mediapipe uses RGB while cv2 operates on BGR, so you need to change it temporarily. 
+    for image, detected_image in HandPipeline(capture, detect, reuseFrames=True):
+        # The camera is read on one thread and detect() runs on another (see HandPipeline.py), this loop just gets the newest result. 
 
         hands_list =  detected_image.multi_hand_landmarks
         if hands_list:                                    
@@ -47,6 +52,7 @@ with mp_hands.Hands(min_detection_confidence=0.8, min_tracking_confidence=0.5) a
 
                     # Similar algorithm as above, main difference is that metric is used. 
                     # insert algorithm to be used on each hand here? Interconnect with wireless tranmission protocool. 
+                    # (HandNetwork.py streams the per-hand results over UDP.)
 
 
 
@@ -0,0 +1,197 @@
+import os
+import struct
+import time
+import numpy as np
+
+from HandRecog import extractHands, extractWorldLandmarks
+from HandGeometry import LANDMARK_COUNT, HANDEDNESS_LABELS, handednessCode, landmarkFeatures, worldFeatures
+
+
+# Compact binary recording of hand landmarks, and a memory-mapped reader to replay them without a camera or the model.
+#
+# File layout: a 16 byte header (magic, format version, number of hand slots) followed by fixed-width records, one per frame:
+#   timestamp   float64                     seconds (time.time() by default)
+#   handCount   uint8                       number of hands detected
+#   handedness  int8 x maxHands             index into HANDEDNESS_LABELS, -1 for an empty slot
+#   normalized  float32 x maxHands x 21 x 3 mediapipe's 0-1 landmarks (multi_hand_landmarks)
+#   world       float32 x maxHands x 21 x 3 metric landmarks in meters (multi_hand_world_landmarks)
+# Every record has the same size, so the file can be mapped straight into a NumPy structured array.
+#
+# Recording:
+#   with LandmarkRecorder("session.hands") as recorder:
+#       ... recorder.writeResults(detector.results) every frame ...
+# Replaying through the analysis:
+#   replay = LandmarkReplay("session.hands")
+#   for hands in replay.analyze(detector, (1080, 1920)): ...
+# or, for a whole recording at once (e.g. to train on):
+#   features = replay.features((1080, 1920))
+
+MAGIC = b"HANDRC"
+VERSION = 1
+HEADER = struct.Struct("<6sHH6x")
+    # magic, version, maxHands, padding up to 16 bytes.
+
+
+def recordDtype(maxHands):
+    return np.dtype([("timestamp", "<f8"),
+                     ("handCount", "u1"),
+                     ("handedness", "i1", (maxHands,)),
+                     ("normalized", "<f4", (maxHands, LANDMARK_COUNT, 3)),
+                     ("world", "<f4", (maxHands, LANDMARK_COUNT, 3))])
+
+
+class LandmarkRecorder:
+
+    def __init__(self, path, maxHands=2, append=False):
+        # append=True adds to an existing recording (which must have the same maxHands) instead of starting a new one.
+        self.path = path
+        self.maxHands = maxHands
+        self.dtype = recordDtype(maxHands)
+        self._record = np.zeros(1, dtype=self.dtype)
+            # One record, reused for every frame, so writing doesn't allocate anything.
+        self.framesWritten = 0
+
+        if append and os.path.exists(path) and os.path.getsize(path) >= HEADER.size:
+            readHeader(path, maxHands)
+            self._file = open(path, "ab")
+        else:
+            self._file = open(path, "wb")
+            self._file.write(HEADER.pack(MAGIC, VERSION, maxHands))
+
+    def write(self, normalized, handedness=(), world=None, timestamp=None):
+        # normalized / world: (H, 21, 3) arrays (world may be None), handedness: H "Left"/"Right" labels.
+        # Hands beyond maxHands are dropped, empty slots are zeroed with handedness -1.
+        record = self._record[0]
+        handCount = min(len(normalized), self.maxHands)
+
+        record["timestamp"] = time.time() if timestamp is None else timestamp
+        record["handCount"] = handCount
+        record["handedness"] = -1
+        record["normalized"] = 0
+        record["world"] = 0
+        for slot, label in enumerate(list(handedness)[:handCount]):
+            record["handedness"][slot] = handednessCode(label)
+        record["normalized"][:handCount] = normalized[:handCount]
+        if world is not None and len(world):
+            record["world"][:min(handCount, len(world))] = world[:handCount]
+
+        self._file.write(self._record.tobytes())
+        self.framesWritten += 1
+
+    def writeResults(self, results, timestamp=None):
+        # Records straight from mediapipe's results (e.g. detector.results after processAndCorrectView).
+        normalized, handedness = extractHands(results)
+        self.write(normalized, handedness, extractWorldLandmarks(results), timestamp)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def readHeader(path, expectedMaxHands=None):
+    with open(path, "rb") as file:
+        magic, version, maxHands = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(str(path) + " is not a hand landmark recording")
+    if version != VERSION:
+        raise ValueError("Unsupported recording version " + str(version))
+    if expectedMaxHands is not None and maxHands != expectedMaxHands:
+        raise ValueError("Recording has " + str(maxHands) + " hand slots, expected " + str(expectedMaxHands))
+    return maxHands
+
+
+class LandmarkReplay:
+    # Memory-maps a recording. Every field below is a zero-copy NumPy view of the file, so opening even a huge recording is instant
+    # and only the parts that actually get read are loaded from disk.
+
+    def __init__(self, path):
+        self.path = path
+        self.maxHands = readHeader(path)
+        self.dtype = recordDtype(self.maxHands)
+
+        frameCount = (os.path.getsize(path) - HEADER.size) // self.dtype.itemsize
+            # A partly written last record (e.g. the recorder got killed mid-write) is ignored.
+        if frameCount > 0:
+            self.records = np.memmap(path, dtype=self.dtype, mode="r", offset=HEADER.size, shape=(frameCount,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    @property
+    def handCount(self):
+        return self.records["handCount"]
+
+    @property
+    def handedness(self):
+        return self.records["handedness"]
+
+    @property
+    def normalized(self):
+        return self.records["normalized"]
+            # (frames, maxHands, 21, 3)
+
+    @property
+    def world(self):
+        return self.records["world"]
+
+    def frame(self, index):
+        # (normalized, handedness labels, world) of the hands actually present in one frame, ready for tracker.loadLandmarks.
+        record = self.records[index]
+        handCount = int(record["handCount"])
+        handedness = [HANDEDNESS_LABELS[code] if code >= 0 else None for code in record["handedness"][:handCount].tolist()]
+        return record["normalized"][:handCount], handedness, record["world"][:handCount]
+
+    def features(self, frameShape, start=0, stop=None):
+        # Every value analyze() gives, for every recorded hand at once (see landmarkFeatures), without going through a tracker frame by frame.
+        # frameShape is the (height, width) to analyze at. Returns a dict of arrays with one entry per hand, plus frameIndex and
+        # handedness (index into HANDEDNESS_LABELS) saying which frame and which hand each entry is.
+        records = self.records[start:stop]
+        present = np.arange(self.maxHands) < records["handCount"][:, None]
+            # Slots past handCount are empty.
+        frameIndex, _ = np.nonzero(present)
+
+        features = landmarkFeatures(records["normalized"][present], frameShape[1], frameShape[0])
+        features["frameIndex"] = frameIndex + start
+        features["handedness"] = records["handedness"][present]
+        return features
+
+    def worldFeatures(self, start=0, stop=None):
+        # Same as features, but the metric ones from the recorded world landmarks (see worldFeatures in HandGeometry.py), no frame size needed.
+        records = self.records[start:stop]
+        present = np.arange(self.maxHands) < records["handCount"][:, None]
+        frameIndex, _ = np.nonzero(present)
+
+        handedness = records["handedness"][present]
+        features = worldFeatures(records["world"][present], handedness)
+        features["frameIndex"] = frameIndex + start
+        features["handedness"] = handedness
+        return features
+
+    def replay(self, tracker, start=0, stop=None):
+        # Loads each recorded frame into the tracker in turn (see HandTrackingDynamic.loadLandmarks) and yields the frame index,
+        # so the normal analysis methods (findAndMark_Positions, findRotation, analyze...) can run on it like on a live frame.
+        for index in range(start, len(self) if stop is None else min(stop, len(self))):
+            tracker.loadLandmarks(*self.frame(index))
+            yield index
+
+    def analyze(self, tracker, frameShape, start=0, stop=None):
+        # Shortcut for the common case: yields tracker.analyze() for every recorded frame. frameShape is the (height, width) to analyze at.
+        for _ in self.replay(tracker, start, stop):
+            yield tracker.analyze(frameShape)
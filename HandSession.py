@@ -0,0 +1,166 @@
+import time
+import threading
+
+from HandStartup import lazyImport
+from HandPipeline import LatestQueue, FramePool
+from HandMetrics import LatencyHistogram
+
+cv2 = lazyImport("cv2")
+HandRecording = lazyImport("HandRecording")
+    # Lazy so HandRecog can import this module without importing HandRecording (which imports HandRecog) in the middle of its own import.
+
+
+# Records a session, the annotated video plus a landmark recording next to it, without putting the encoding on the tracking path.
+#
+# record() only copies the frame into a reused buffer and queues it along with the frame's hands. A background thread does the rest:
+# encodes the frame into the video (cv2.VideoWriter) and writes the hands into the sidecar, a LandmarkRecorder file (see HandRecording.py).
+# Frame i of the video and record i of the sidecar always belong together, a frame dropped from the queue takes its hands with it, and the
+# sidecar's timestamps say when each frame was recorded, so the video can be lined up with real time even at a varying frame rate.
+#
+# When the encoder falls behind, policy decides what happens once the queue is full:
+#   "drop"   the oldest queued frame is thrown away, record() never waits, tracking never slows down (the default)
+#   "block"  record() waits for room, no frame is lost but the tracking loop runs at the encoder's pace
+# Either way stats() reports how far behind the encoder is (lag: time from record() to the frame being written) and what was dropped.
+#
+#   recorder = SessionRecorder("session.mp4", fps=30)
+#   ...
+#   normalized, handedness = detector.stackHands()
+#   recorder.record(frame, normalized, handedness)
+#   ...
+#   recorder.close()
+#   print(recorder.stats())
+
+POLICIES = ("drop", "block")
+
+
+class SessionRecorder:
+
+    def __init__(self, videoPath, sidecarPath=None, fps=30, fourcc="mp4v", maxHands=2, queueSize=8, policy="drop", metrics=None):
+        # sidecarPath: where the landmarks go, defaults to videoPath with its extension replaced by .hands. False records the video only.
+        # fps: the frame rate written into the video file. Record at about this rate (e.g. the frames a DisplayRate lets through) so the video
+        #      plays at the real speed, the sidecar's timestamps are exact whatever the rate.
+        # queueSize: frames that can wait for the encoder, every one of them a copy of a frame in memory.
+        # metrics: optional HandMetrics, records record (the time record() takes on the tracking thread), record.encode and record.lag.
+        if policy not in POLICIES:
+            raise ValueError("policy must be one of " + ", ".join(POLICIES) + ", not " + repr(policy))
+        self.videoPath = videoPath
+        self.sidecarPath = videoPath.rsplit(".", 1)[0] + ".hands" if sidecarPath is None else sidecarPath
+        self.fps = fps
+        self.fourcc = fourcc
+        self.maxHands = maxHands
+        self.policy = policy
+        self.metrics = metrics
+
+        self.framePool = FramePool()
+        self.queue = LatestQueue(queueSize, dropOldest=policy == "drop", onDrop=self._releaseItem)
+        self._writer = None
+        self._frameSize = None
+            # (width, height) of the video, set by the first frame. Later frames of another size (e.g. after HandAutoTune.py changed the
+            # camera resolution) get scaled to it, a video file can't change size halfway.
+        self._sidecar = HandRecording.LandmarkRecorder(self.sidecarPath, maxHands) if self.sidecarPath else None
+
+        self.framesRecorded = 0
+        self.framesWritten = 0
+        self.blockedTime = 0.0
+            # Seconds record() spent waiting for room in the queue (only with the "block" policy).
+        self.lag = LatencyHistogram()
+        self.encodeTime = LatencyHistogram()
+        self.error = None
+            # If encoding fails, the exception is saved here and raised by the next record() or close().
+
+        self._thread = threading.Thread(target=self._writeLoop, name="SessionRecorder", daemon=True)
+        self._thread.start()
+
+    def record(self, frame, normalized=(), handedness=(), world=None, timestamp=None):
+        # Queues frame (copied, so the caller can reuse it straight away) and its hands: (H, 21, 3) normalized landmarks, H handedness
+        # labels and optionally the world landmarks, as stackHands/stackWorldLandmarks give them. Returns True if it got queued
+        # without waiting or dropping an older frame.
+        if self.error is not None:
+            raise self.error
+        start = time.perf_counter()
+
+        buffer = self.framePool.acquire(frame.shape, frame.dtype)
+        buffer[...] = frame
+        item = (buffer, normalized, handedness, world, time.time() if timestamp is None else timestamp, start)
+        dropped = self.queue.dropped
+        queueStart = time.perf_counter()
+        self.queue.put(item)
+        self.framesRecorded += 1
+
+        now = time.perf_counter()
+        if self.policy == "block":
+            self.blockedTime += now - queueStart
+        if self.metrics: self.metrics.recordLatency("record", now - start)
+        return self.queue.dropped == dropped
+
+    def _writeLoop(self):
+        try:
+            while True:
+                item = self.queue.get(timeout=0.1)
+                if item is None:
+                    if self.queue.closed:
+                        break
+                    continue
+                self._write(*item)
+        except Exception as error:
+            self.error = error
+            self.queue.close()
+                # Unblocks a record() waiting for room, it raises the error next time.
+        finally:
+            if self._writer is not None:
+                self._writer.release()
+            if self._sidecar is not None:
+                self._sidecar.close()
+
+    def _write(self, frame, normalized, handedness, world, timestamp, queuedAt):
+        start = time.perf_counter()
+        try:
+            if self._writer is None:
+                self._frameSize = (frame.shape[1], frame.shape[0])
+                self._writer = cv2.VideoWriter(self.videoPath, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, self._frameSize)
+                if not self._writer.isOpened():
+                    raise OSError("Cannot open " + str(self.videoPath) + " for writing with codec " + repr(self.fourcc))
+            if (frame.shape[1], frame.shape[0]) != self._frameSize:
+                self._writer.write(cv2.resize(frame, self._frameSize, interpolation=cv2.INTER_AREA))
+            else:
+                self._writer.write(frame)
+            if self._sidecar is not None:
+                self._sidecar.write(normalized, handedness, world, timestamp)
+        finally:
+            self.framePool.release(frame)
+
+        now = time.perf_counter()
+        self.framesWritten += 1
+        self.encodeTime.add(now - start)
+        self.lag.add(now - queuedAt)
+        if self.metrics:
+            self.metrics.recordLatency("record.encode", now - start)
+            self.metrics.recordLatency("record.lag", now - queuedAt)
+
+    def _releaseItem(self, item):
+        self.framePool.release(item[0])
+
+    def stats(self):
+        # dropped: frames thrown away because the encoder fell behind, queueDepth: frames waiting for it right now,
+        # lag: how long frames waited from record() until they were written, encode: time spent writing each one.
+        return {"policy": self.policy,
+                "recorded": self.framesRecorded,
+                "written": self.framesWritten,
+                "dropped": self.queue.dropped,
+                "queueDepth": len(self.queue),
+                "blockedMs": self.blockedTime * 1000,
+                "lag": self.lag.summary(),
+                "encode": self.encodeTime.summary()}
+
+    def close(self):
+        # Writes out whatever is still queued and closes the files.
+        self.queue.close()
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,345 @@
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+
+from HandRecog import HandTrackingDynamic
+from HandNetwork import recordDtype, writeRecord
+from HandStartup import lazyImport
+
+cv2 = lazyImport("cv2")
+
+
+# Shared-memory transport for running capture and inference in separate processes, without pickling frames through a Queue.
+#
+# SharedRing is a fixed set of preallocated slots (all the same shape and dtype) in one block of shared memory, plus a small header
+# with a sequence number and state for every slot. Writers copy (or decode) into a free slot and publish it, readers get the slot
+# as a NumPy view of the shared memory, zero-copy, and release it when they're done. A slot that a reader is holding is never
+# written to, so a view can't change under the reader; the writer takes another slot instead, and only if every slot is busy
+# does it drop the new item (an overrun). Readers either take the newest item (frames: older ones are skipped) or the oldest one
+# (results: every item in order, as long as the ring doesn't fill up).
+#
+# SharedMemoryRunner puts it together: one capture process writes camera frames into a frame ring, one or more inference processes
+# (each with its own HandTrackingDynamic) take the newest frame, and the results come back through a small result ring holding
+# HandNetwork records (see recordDtype there).
+#
+#   runner = SharedMemoryRunner(0, workers=2)
+#   for record in runner:
+#       record["sequence"], record["timestamp"], record["handCount"], record["hands"]["rotation"]
+#   print(runner.stats())
+
+EMPTY, WRITING, READY, READ = range(4)
+    # Slot states.
+
+NEWEST, OLDEST = "newest", "oldest"
+    # Which item read() takes.
+
+_NEXT, _WRITTEN, _READ, _SKIPPED, _DROPPED, _OVERRUNS, _REUSES = range(7)
+    # Next sequence number and the counters in the header, see stats().
+_COUNTERS = 7
+
+
+class SharedRing:
+
+    def __init__(self, shape, dtype=np.uint8, slots=4, context=None):
+        # shape/dtype: of one item (e.g. (1080, 1920, 3) uint8 frames, or () with a structured dtype for records).
+        # slots: how many items fit. Readers hold at most slots - 1 of them at once and the writer still finds one to write into.
+        # context: the multiprocessing context the processes using this ring get started from (for the lock), default spawn.
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        self._condition = (context or multiprocessing.get_context("spawn")).Condition()
+        self._memory = shared_memory.SharedMemory(create=True, size=self._layout())
+        self._owner = True
+        self._attach()
+        self._counters[:] = 0
+        self._slotSequence[:] = -1
+        self._slotState[:] = EMPTY
+        self._slotUsers[:] = 0
+        self._slotTime[:] = 0
+
+    def _layout(self):
+        self._itemSize = int(np.prod(self.shape, dtype=np.int64)) * self.dtype.itemsize
+        self._headerSize = 8 * (_COUNTERS + 4 * self.slots)
+        self._dataOffset = -(-self._headerSize // 64) * 64
+            # Items start on a cache line.
+        return self._dataOffset + self.slots * max(self._itemSize, 1)
+
+    def _attach(self):
+        self._layout()
+        buffer = self._memory.buf
+        header = np.ndarray((_COUNTERS + 4 * self.slots,), np.int64, buffer)
+        self._counters = header[:_COUNTERS]
+        self._slotSequence = header[_COUNTERS:_COUNTERS + self.slots]
+        self._slotState = header[_COUNTERS + self.slots:_COUNTERS + 2 * self.slots]
+        self._slotUsers = header[_COUNTERS + 2 * self.slots:_COUNTERS + 3 * self.slots]
+        self._slotTime = np.ndarray((self.slots,), np.float64, buffer, offset=8 * (_COUNTERS + 3 * self.slots))
+        self._items = np.ndarray((self.slots,) + self.shape, self.dtype, buffer, offset=self._dataOffset)
+            # All header fields only change while holding the condition's lock, the items themselves are written without it.
+
+    def __getstate__(self):
+        # Only the name and layout get pickled (e.g. when the ring is passed to a multiprocessing.Process), the other side attaches.
+        return {"name": self._memory.name, "shape": self.shape, "dtype": self.dtype, "slots": self.slots, "condition": self._condition}
+
+    def __setstate__(self, state):
+        self.shape, self.dtype, self.slots, self._condition = state["shape"], state["dtype"], state["slots"], state["condition"]
+        self._memory = shared_memory.SharedMemory(name=state["name"])
+        self._owner = False
+        self._attach()
+
+    def acquireWrite(self, overwrite=True, timeout=None):
+        # Reserves a slot to write the next item into. Returns (sequence, view), or None when every slot is being read or written
+        # (counted as an overrun, the item should just be dropped). Call publish(sequence) once the view is filled.
+        # overwrite=False never writes over an unread item, it waits (up to timeout seconds) for a reader to take one instead,
+        # for sources like video files where every item matters more than keeping up.
+        with self._condition:
+            if not overwrite and not self._condition.wait_for(
+                    lambda: ((self._slotUsers == 0) & ((self._slotState == EMPTY) | (self._slotState == READ))).any(), timeout):
+                return None
+                    # Still waiting on the readers, nothing got lost.
+            free = (self._slotUsers == 0) & (self._slotState != WRITING)
+            if not overwrite:
+                free &= self._slotState != READY
+            if not free.any():
+                self._counters[_OVERRUNS] += 1
+                return None
+            unread = free & (self._slotState == READY)
+            candidates = free & ~unread if (free & ~unread).any() else unread
+                # Empty or already read slots first, an unread item only gets written over when there's no other choice.
+            slot = int(np.flatnonzero(candidates)[np.argmin(self._slotSequence[candidates])])
+                # The oldest of them.
+            if self._slotState[slot] == READY:
+                self._counters[_DROPPED] += 1
+            if self._slotState[slot] != EMPTY:
+                self._counters[_REUSES] += 1
+            sequence = int(self._counters[_NEXT])
+            self._counters[_NEXT] += 1
+            self._slotSequence[slot] = sequence
+            self._slotState[slot] = WRITING
+        return sequence, self._items[slot, ...]
+
+    def publish(self, sequence, timestamp=None):
+        with self._condition:
+            slot = self._slotOf(sequence)
+            self._slotTime[slot] = time.time() if timestamp is None else timestamp
+            self._slotState[slot] = READY
+            self._counters[_WRITTEN] += 1
+            self._condition.notify_all()
+
+    def abandon(self, sequence):
+        # Gives back a slot from acquireWrite without publishing anything in it (e.g. the camera read failed).
+        with self._condition:
+            slot = self._slotOf(sequence)
+            self._slotState[slot] = EMPTY
+            self._slotSequence[slot] = -1
+            self._condition.notify_all()
+
+    def write(self, item, timestamp=None, overwrite=True, timeout=None):
+        # Copies item into the ring. Returns its sequence number, or None if it got dropped (see acquireWrite).
+        reserved = self.acquireWrite(overwrite, timeout)
+        if reserved is None:
+            return None
+        sequence, view = reserved
+        view[...] = item
+        self.publish(sequence, timestamp)
+        return sequence
+
+    def read(self, timeout=None, which=NEWEST):
+        # Waits for an item nobody has read yet and takes it. Returns (sequence, timestamp, view), or None after timeout seconds.
+        # which=NEWEST skips everything older than the newest item (they count as skipped), OLDEST takes them in order.
+        # The view stays valid (the writer won't touch that slot) until release(sequence).
+        with self._condition:
+            if not self._condition.wait_for(lambda: (self._slotState == READY).any(), timeout):
+                return None
+            ready = np.flatnonzero(self._slotState == READY)
+            sequences = self._slotSequence[ready]
+            slot = int(ready[np.argmax(sequences) if which == NEWEST else np.argmin(sequences)])
+            if which == NEWEST:
+                older = ready[sequences < self._slotSequence[slot]]
+                self._slotState[older] = READ
+                self._counters[_SKIPPED] += len(older)
+            self._slotState[slot] = READ
+            self._slotUsers[slot] += 1
+            self._counters[_READ] += 1
+            return int(self._slotSequence[slot]), float(self._slotTime[slot]), self._items[slot, ...]
+
+    def release(self, sequence):
+        with self._condition:
+            slot = self._slotOf(sequence)
+            self._slotUsers[slot] -= 1
+            self._condition.notify_all()
+
+    def _slotOf(self, sequence):
+        return int(np.flatnonzero(self._slotSequence == sequence)[0])
+
+    def stats(self):
+        # written/read: items that went in/out. skipped: never read because a newer one was read first. dropped: written over before
+        # anybody read them. overruns: items that couldn't be written at all because every slot was busy. reuses: writes into a slot
+        # that had held an item before. inUse: slots readers are holding right now.
+        with self._condition:
+            counters = self._counters.tolist()
+            inUse = int((self._slotUsers > 0).sum())
+        return {"written": counters[_WRITTEN], "read": counters[_READ], "skipped": counters[_SKIPPED], "dropped": counters[_DROPPED],
+                "overruns": counters[_OVERRUNS], "reuses": counters[_REUSES], "inUse": inUse, "slots": self.slots}
+
+    def close(self):
+        # Detaches this process from the ring, the process that created it also frees the shared memory.
+        self._items = self._counters = self._slotSequence = self._slotState = self._slotUsers = self._slotTime = None
+            # The views have to go before the memory can be closed.
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+
+def _captureProcess(source, frameSize, frames, stopEvent):
+    capture = cv2.VideoCapture(source)
+    if frameSize is not None:
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, frameSize[0])
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, frameSize[1])
+    overwrite = isinstance(source, int)
+        # Cameras write over frames the workers didn't get to, video files wait for them so every frame gets analyzed.
+    try:
+        while not stopEvent.is_set():
+            reserved = frames.acquireWrite(overwrite, timeout=0.1)
+            if reserved is None:
+                ret = capture.grab() if overwrite else True
+                    # Nowhere to put it, but the camera still has to be read or its own buffer fills up with old frames.
+            else:
+                sequence, view = reserved
+                ret, frame = capture.read(view)
+                    # Decodes straight into the shared slot.
+                if ret and frame is not view:
+                    view[...] = frame
+                        # The decoder couldn't write into the slot and made its own array instead.
+                if ret:
+                    frames.publish(sequence, time.time())
+                else:
+                    frames.abandon(sequence)
+            if not ret:
+                break
+    finally:
+        capture.release()
+        stopEvent.set()
+        frames.close()
+
+
+def _inferenceProcess(frames, results, which, live, trackerOptions, stopEvent, closeEvent):
+    detector = HandTrackingDynamic(**trackerOptions)
+    try:
+        while True:
+            item = frames.read(timeout=0.1, which=which)
+            if item is None:
+                if stopEvent.is_set():
+                    break
+                    # Capture is over and every frame it wrote has been taken.
+                continue
+            sequence, timestamp, frame = item
+            try:
+                processed, mpResults = detector.detectHands(frame)
+                detector.loadResults(mpResults)
+                features = detector.findAllHands(processed)
+            finally:
+                frames.release(sequence)
+                    # Done with the frame (findAllHands copies what it keeps), the capture process can have the slot back.
+
+            reserved = results.acquireWrite(live, timeout=0.1)
+            while reserved is None and not live and not closeEvent.is_set():
+                reserved = results.acquireWrite(live, timeout=0.1)
+                    # Same rule as the frame ring: a video file waits for the reader instead of writing over results it hasn't taken.
+                    # stopEvent can't end the wait (it's also set when the video runs out and the last results still have to go
+                    # out), closeEvent is only set once nobody reads the results any more.
+            if reserved is not None:
+                resultSequence, record = reserved
+                writeRecord(record, features, sequence, timestamp)
+                    # The record carries the frame's sequence and capture time, not its own.
+                results.publish(resultSequence, timestamp)
+    finally:
+        frames.close()
+        results.close()
+
+
+class SharedMemoryRunner:
+
+    def __init__(self, source=0, workers=1, frameSlots=None, resultSlots=16, maxHands=2, frameSize=None, frameShape=None, **trackerOptions):
+        # source: camera index or video file. workers: inference processes, each with its own model.
+        # frameSlots: size of the frame ring, default 2 per worker + 2 so every worker can hold one while the camera keeps writing.
+        # resultSlots: size of the result ring. frameSize: optional (width, height) to ask the camera for.
+        # frameShape: (height, width, 3) of the frames. Found out by reading one frame from the source when not given.
+        # trackerOptions: passed to HandTrackingDynamic in every worker. Note each worker only sees every workers-th frame, which
+        #                 the frame to frame tracking (roi, skipFrames) copes with but gets less out of.
+        self.source = source
+        self.workers = workers
+        self.frameSize = frameSize
+        self.trackerOptions = dict(trackerOptions, maxHands=maxHands)
+        self._context = multiprocessing.get_context("spawn")
+
+        if frameShape is None:
+            frameShape = self._probeFrameShape()
+        self.frames = SharedRing(frameShape, np.uint8, frameSlots or 2 * workers + 2, self._context)
+        self.results = SharedRing((), recordDtype(maxHands), resultSlots, self._context)
+        self._stopEvent = self._context.Event()
+            # Set when the capture is over, by the source running out or by stop().
+        self._closeEvent = self._context.Event()
+            # Set by stop() only, nothing reads the results after that.
+        self._processes = []
+
+    def _probeFrameShape(self):
+        capture = cv2.VideoCapture(self.source)
+        if self.frameSize is not None:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.frameSize[0])
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frameSize[1])
+        ret, frame = capture.read()
+        capture.release()
+        if not ret:
+            raise IOError("Cannot read from source " + repr(self.source))
+        return frame.shape
+
+    def start(self):
+        if self._processes:
+            return self
+        live = isinstance(self.source, int)
+        self._processes.append(self._context.Process(target=_captureProcess, name="HandShared-capture", daemon=True,
+                                                     args=(self.source, self.frameSize, self.frames, self._stopEvent)))
+        for worker in range(self.workers):
+            self._processes.append(self._context.Process(target=_inferenceProcess, name="HandShared-inference-" + str(worker), daemon=True,
+                                                         args=(self.frames, self.results, NEWEST if live else OLDEST, live,
+                                                               self.trackerOptions, self._stopEvent, self._closeEvent)))
+                # From a camera the workers always take the newest frame, from a video file every frame in order.
+        for process in self._processes:
+            process.start()
+        return self
+
+    def __iter__(self):
+        # Yields every result record (a copy, see recordDtype in HandNetwork.py) in the order they were finished, until the source
+        # runs out. With several workers that's only roughly frame order, record["sequence"] has the exact frame number.
+        self.start()
+        try:
+            while True:
+                item = self.results.read(timeout=0.1, which=OLDEST)
+                if item is None:
+                    if self._stopEvent.is_set() and not any(process.is_alive() for process in self._processes[1:]):
+                        return
+                    continue
+                sequence, _, record = item
+                record = record.copy()
+                self.results.release(sequence)
+                yield record
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stopEvent.set()
+        self._closeEvent.set()
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+    def stats(self):
+        return {"frames": self.frames.stats(), "results": self.results.stats()}
+
+    def close(self):
+        self.stop()
+        self.frames.close()
+        self.results.close()
@@ -0,0 +1,71 @@
+import sys
+import time
+import importlib
+
+
+# Startup helpers: lazy loading of the heavy modules (cv2, mediapipe) and a record of what startup cost.
+#
+# HandRecog and HandPipeline get cv2/mediapipe through lazyImport, so importing them is cheap and the real import only happens the first
+# time something actually uses the module. Code that only does the analysis (e.g. loadLandmarks + analyze on a recording) never pays for
+# mediapipe at all, and doesn't even need it installed.
+#
+# Every step that costs real time at startup gets recorded (imports, building the model, the first inference), see startupReport:
+#   detector = HandTrackingDynamic().warmUp((1080, 1920))
+#   printStartupReport()
+
+PROCESS_START = time.perf_counter()
+    # Roughly when the program started, as far as this code can tell (when this module was first imported).
+
+_startupTimes = {}
+
+
+def recordStartup(step, seconds):
+    # Records how long a startup step took. Only the first time counts, later calls for the same step are ignored.
+    _startupTimes.setdefault(step, seconds)
+
+
+def startupReport():
+    # Seconds spent on each startup step so far, in the order they happened, plus "sinceStart", the time since PROCESS_START.
+    report = dict(_startupTimes)
+    report["sinceStart"] = time.perf_counter() - PROCESS_START
+    return report
+
+
+def printStartupReport(report=None):
+    report = startupReport() if report is None else report
+    for step, seconds in report.items():
+        print("{:<24}{:>10.1f} ms".format(step, seconds * 1000))
+
+
+class LazyModule:
+    # Stands in for a module until one of its attributes is used, then imports it (timing the import as "import.<name>").
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            name = self.__dict__["_name"]
+            alreadyImported = name in sys.modules
+            start = time.perf_counter()
+            module = importlib.import_module(name)
+            if not alreadyImported:
+                recordStartup("import." + name, time.perf_counter() - start)
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attribute):
+        value = getattr(self._load(), attribute)
+        self.__dict__[attribute] = value
+            # Only called for attributes not found on the proxy itself, so from now on this one is a plain attribute lookup. The drawing code
+            # looks up cv2.circle, cv2.FILLED... dozens of times per frame, and going through here every time added up.
+        return value
+
+    def __repr__(self):
+        return "<lazy module " + repr(self.__dict__["_name"]) + (" (loaded)>" if self.__dict__["_module"] is not None else ">")
+
+
+def lazyImport(name):
+    return LazyModule(name)
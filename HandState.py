@@ -0,0 +1,115 @@
+import numpy as np
+
+from HandGeometry import LANDMARK_COUNT, HAND_MESSAGES, HAND_CLOSED, HANDEDNESS_LABELS, handednessCode, pixelsToList, unpackFingers
+
+
+# Everything HandTrackingDynamic.completeInfo knows about one hand in one frame, as named fields instead of an 11-tuple.
+# The landmarks and the two derived points (the centers of mass) are NumPy arrays kept apart from each other, the finger states are
+# a 5 bit mask and the hand message is stored as its index into HAND_MESSAGES, so building one allocates next to nothing.
+# Many states (e.g. a whole session) can be packed into one structured array with toStructuredArray for batch processing/saving.
+
+HAND_STATE_DTYPE = np.dtype([("handedness", "i1"),
+                             ("landmarks", "<f8", (LANDMARK_COUNT, 5)),
+                             ("derived", "<f8", (2, 5)),
+                             ("handIsUpright", "?"),
+                             ("thumbOnLeft", "?"),
+                             ("rotation", "<f8"),
+                             ("forwardTilt", "<f8"),
+                             ("sidewaysTilt", "<f8"),
+                             ("fingerMask", "u1"),
+                             ("handState", "i1"),
+                             ("predicted", "?")])
+
+
+class HandState:
+    __slots__ = ("landmarks", "derived", "handedness", "handIsUpright", "thumbOnLeft", "rotation", "forwardTilt", "sidewaysTilt",
+                 "fingerMask", "handState", "predicted")
+
+    def __init__(self, landmarks, derived, handedness, handIsUpright, thumbOnLeft, rotation, forwardTilt, sidewaysTilt,
+                 fingerMask, handState, predicted=False):
+        # landmarks: (21, 5) [id, cx, cy, cz, cyDraw] rows. From completeInfo this is a view of the tracker's buffer, which gets
+        #            overwritten on the next frame, so call copy() to keep a state around.
+        # derived:   (2, 5) rows for the center of mass with fingers (id 21) and without fingers (id 22), same columns.
+        # handedness: "Left", "Right" or None. fingerMask: bit i set = finger i open (thumb is bit 0). handState: index into HAND_MESSAGES.
+        self.landmarks = landmarks
+        self.derived = derived
+        self.handedness = handedness
+        self.handIsUpright = handIsUpright
+        self.thumbOnLeft = thumbOnLeft
+        self.rotation = rotation
+        self.forwardTilt = forwardTilt
+        self.sidewaysTilt = sidewaysTilt
+        self.fingerMask = fingerMask
+        self.handState = handState
+        self.predicted = predicted
+
+    @property
+    def centerOfMassWithFingers(self):
+        return self.derived[0]
+
+    @property
+    def centerOfMassNoFingers(self):
+        return self.derived[1]
+
+    @property
+    def fingers(self):
+        # Finger states as the [thumb, pointer, middle, ring, pinkie] 0/1 list findFingersOpen returns.
+        return unpackFingers(self.fingerMask).tolist()
+
+    @property
+    def handMsg(self):
+        return HAND_MESSAGES[self.handState]
+
+    @property
+    def handIsClosed(self):
+        return self.handState == HAND_CLOSED
+
+    def copy(self):
+        return HandState(self.landmarks.copy(), self.derived.copy(), self.handedness, self.handIsUpright, self.thumbOnLeft,
+                         self.rotation, self.forwardTilt, self.sidewaysTilt, self.fingerMask, self.handState, self.predicted)
+
+    def astuple(self):
+        # The old completeInfo 11-tuple, for code that still unpacks it. Builds the lists the tuple used to hold.
+        centerOfMassWithFingers, centerOfMassNoFingers = self.derived.astype(int).tolist()
+        return (pixelsToList(self.landmarks) + [centerOfMassWithFingers, centerOfMassNoFingers], centerOfMassWithFingers, centerOfMassNoFingers,
+                self.handIsUpright, self.thumbOnLeft, self.rotation, self.forwardTilt, self.sidewaysTilt, self.fingers, self.handMsg,
+                self.handIsClosed)
+
+    def toRecord(self, record):
+        # Writes this state into one element of a HAND_STATE_DTYPE array.
+        record["handedness"] = handednessCode(self.handedness)
+        record["landmarks"] = self.landmarks
+        record["derived"] = self.derived
+        record["handIsUpright"] = self.handIsUpright
+        record["thumbOnLeft"] = self.thumbOnLeft
+        record["rotation"] = self.rotation
+        record["forwardTilt"] = self.forwardTilt
+        record["sidewaysTilt"] = self.sidewaysTilt
+        record["fingerMask"] = self.fingerMask
+        record["handState"] = self.handState
+        record["predicted"] = self.predicted
+
+    @classmethod
+    def fromRecord(cls, record):
+        # State backed by one element of a HAND_STATE_DTYPE array (landmarks and derived stay views of it).
+        code = int(record["handedness"])
+        return cls(record["landmarks"], record["derived"], HANDEDNESS_LABELS[code] if code >= 0 else None, bool(record["handIsUpright"]),
+                   bool(record["thumbOnLeft"]), float(record["rotation"]), float(record["forwardTilt"]), float(record["sidewaysTilt"]),
+                   int(record["fingerMask"]), int(record["handState"]), bool(record["predicted"]))
+
+    def __repr__(self):
+        return ("HandState(" + str(self.handedness) + ", " + self.handMsg + ", fingers=" + str(self.fingers) + ", rotation=" + str(self.rotation) +
+                ", forwardTilt=" + str(self.forwardTilt) + ", sidewaysTilt=" + str(self.sidewaysTilt) + ")")
+
+
+def toStructuredArray(states, out=None):
+    # Packs a sequence of HandStates (e.g. one per frame) into a HAND_STATE_DTYPE array, reusing out if it's given and big enough.
+    if out is None or len(out) < len(states):
+        out = np.empty(len(states), dtype=HAND_STATE_DTYPE)
+    for record, state in zip(out, states):
+        state.toRecord(record)
+    return out[:len(states)]
+
+
+def fromStructuredArray(records):
+    return [HandState.fromRecord(record) for record in records]